@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "attendance.middleware.RequestTimingMiddleware",  # Query and timing metrics
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.security.SecurityMiddleware",
@@ -104,6 +105,18 @@ DATABASES = {
 }
 
 
+# Cache
+# Used for cached PIN authentication and failed attempt throttling. When running
+# several worker processes, use a shared backend (e.g. Redis or Memcached) so
+# that invalidation and attempt counts apply across processes.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -147,6 +160,9 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR)
 
+# Generated exports; kept out of MEDIA_ROOT, which is served without authentication
+EXPORT_ROOT = os.path.join(BASE_DIR, "private_exports")
+
 APPEND_SLASH = False
 
 AUTH_USER_MODEL = "attendance.CustomUser"
@@ -1,17 +1,16 @@
-import datetime
-
 from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group
-from django.utils import timezone
 from django.utils.html import format_html
 
+from .auth_cache import invalidate_cached_users
 from .forms import CustomUserCreationForm, TimeEntryForm
 from .models import LeaveType
-from .models import (AdminLog, Company, CustomUser, DayOverride, Department,
-                     Leave, Position, ScheduleGroup, TimeEntry, TimePreset)
-from .utils import get_day_code, log_admin_action
+from .models import (AdminLog, Company, CompanyAlias, CustomUser, DailyAttendanceSummary,
+                     DayOverride, Department, ExportJob, Leave, Position, ScheduleGroup,
+                     TimeEntry, TimePreset)
+from .utils import log_admin_action
 
 
 class TimeEntryInline(admin.TabularInline):
@@ -27,7 +26,9 @@ def deactivate_users(modeladmin, request, queryset):
     """
     Deactivates selected users.
     """
+    employee_ids = list(queryset.values_list("employee_id", flat=True))
     queryset.update(is_active=False)
+    invalidate_cached_users(employee_ids)
 
 
 deactivate_users.short_description = "Deactivate selected users"
@@ -37,7 +38,9 @@ def activate_users(modeladmin, request, queryset):
     """
     Activates selected users.
     """
+    employee_ids = list(queryset.values_list("employee_id", flat=True))
     queryset.update(is_active=True)
+    invalidate_cached_users(employee_ids)
 
 
 activate_users.short_description = "Activate selected users"
@@ -206,44 +209,14 @@ class TimeEntryAdmin(admin.ModelAdmin):
 
     def save_model(self, request, obj, form, change):
         """
-        Saves the model and calculates hours worked and lateness.
+        Saves the model and calculates hours worked.
+
+        Lateness is recalculated by TimeEntry.clean() as part of save().
         """
         if obj.time_in and obj.time_out:
             delta = obj.time_out - obj.time_in
             obj.hours_worked = round(delta.total_seconds() / 3600, 2)
 
-        if obj.time_in:
-            try:
-                time_in_local = obj.time_in
-                day_code = get_day_code(time_in_local)
-
-                preset = obj.user.get_schedule_for_day(day_code)
-                if preset:
-                    expected_start = preset.start_time
-                    grace_period = datetime.timedelta(minutes=preset.grace_period_minutes)
-
-                    naive_expected_time = datetime.datetime.combine(
-                        time_in_local.date(), expected_start
-                    )
-
-                    expected_start_dt = timezone.make_aware(naive_expected_time)
-                    expected_with_grace = expected_start_dt + grace_period
-
-                    if not timezone.is_aware(time_in_local):
-                        time_in_local = timezone.make_aware(time_in_local)
-
-                    obj.is_late = time_in_local > expected_with_grace
-
-                    time_diff = time_in_local - expected_start_dt
-                    obj.minutes_late = round(time_diff.total_seconds() / 60)
-                else:
-                    obj.is_late = False
-                    obj.minutes_late = 0
-            except Exception as e:
-                obj.is_late = False
-                obj.minutes_late = 0
-                print(f"Error calculating lateness: {e}")
-
         super().save_model(request, obj, form, change)
 
     def formatted_minutes_late(self, obj):
@@ -326,12 +299,21 @@ class TimeEntryAdmin(admin.ModelAdmin):
         js = ("admin/js/toggle_time_format.js",)
 
 
+class CompanyAliasInline(admin.TabularInline):
+    """
+    Inline admin interface for CompanyAlias model.
+    """
+    model = CompanyAlias
+    extra = 0
+
+
 class CompanyAdmin(admin.ModelAdmin):
     """
     Admin interface for Company model.
     """
-    search_fields = ["name"]
+    search_fields = ["name", "aliases__alias"]
     list_display = ("name",)
+    inlines = [CompanyAliasInline]
 
 
 class DepartmentAdmin(admin.ModelAdmin):
@@ -450,6 +432,81 @@ class AdminLogAdmin(admin.ModelAdmin):
         return super().changeform_view(request, object_id, form_url, extra_context)
 
 
+class DailyAttendanceSummaryAdmin(admin.ModelAdmin):
+    """
+    Read-only admin interface for DailyAttendanceSummary model.
+
+    Rows are maintained automatically; use the rebuild_attendance_summary
+    command to regenerate them.
+    """
+    list_display = (
+        'date',
+        'company',
+        'department',
+        'present_count',
+        'late_count',
+        'early_count',
+        'average_minutes_late',
+        'open_shifts',
+    )
+    list_filter = ('date', 'company', 'department')
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        """
+        Disables the add permission for DailyAttendanceSummary.
+        """
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        """
+        Disables the delete permission for DailyAttendanceSummary.
+        """
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """
+        Disables the change permission for DailyAttendanceSummary.
+        """
+        return False
+
+
+class ExportJobAdmin(admin.ModelAdmin):
+    """
+    Read-only admin interface for ExportJob model.
+
+    Jobs are created from the admin page's date range export. Deleting a
+    job also deletes its file.
+    """
+    list_display = (
+        'filename',
+        'requested_by',
+        'status',
+        'rows_written',
+        'total_rows',
+        'created_at',
+        'updated_at',
+        'finished_at',
+    )
+    list_filter = ('status', 'export_format', 'created_at')
+    search_fields = ('filename', 'requested_by__employee_id')
+    date_hierarchy = 'created_at'
+    # The file is in private storage with no public URL; it is downloaded from the admin page
+    exclude = ('file',)
+
+    def has_add_permission(self, request):
+        """
+        Disables the add permission for ExportJob.
+        """
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """
+        Disables the change permission for ExportJob.
+        """
+        return False
+
+
 class LeaveTypeAdmin(admin.ModelAdmin):
     """
     Admin interface for LeaveType model.
@@ -486,5 +543,7 @@ admin.site.register(Position, PositionAdmin)
 admin.site.register(ScheduleGroup, ScheduleGroupAdmin)
 admin.site.register(Department, DepartmentAdmin)
 admin.site.register(AdminLog, AdminLogAdmin)
+admin.site.register(DailyAttendanceSummary, DailyAttendanceSummaryAdmin)
+admin.site.register(ExportJob, ExportJobAdmin)
 admin.site.register(LeaveType, LeaveTypeAdmin)
 admin.site.register(Leave, LeaveAdmin)
\ No newline at end of file
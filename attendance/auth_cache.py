@@ -0,0 +1,207 @@
+"""
+Cached PIN authentication with per-employee and per-IP attempt throttling.
+
+Users are cached by employee ID (with their company) in Django's cache, so
+repeat logins and punches do not query the database. Unknown employee IDs
+are cached briefly too, so repeating an unknown ID does not reach the
+database, though each new ID tried costs one indexed lookup. Entries are
+invalidated when a CustomUser is saved or deleted; the TTLs bound how
+stale an entry can get when it is changed without signals (e.g. bulk
+updates) or in another process with a per-process cache backend.
+
+Failed attempts are counted per employee ID and per client IP in fixed
+windows. Once an employee ID reaches its limit, further attempts for it are
+rejected before any lookup is made. Kiosks serve a whole shift from one IP,
+so the per-IP limit never rejects a correct PIN: once an IP is over it, each
+further failure from it is rejected as throttled (HTTP 429 with Retry-After)
+instead of reporting why it failed. The per-IP limit can be set with the
+MAX_FAILED_PIN_ATTEMPTS_PER_IP setting.
+
+Attempts for inactive accounts count as failures and get the same answer as
+a wrong PIN, so they do not reveal which employee IDs exist.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+# Seconds a known user's credential state is cached
+USER_CACHE_TTL = 300
+
+# Seconds an unknown employee ID is remembered as not found
+MISSING_USER_CACHE_TTL = 30
+
+# Failed attempts allowed per employee ID within the window
+MAX_FAILED_ATTEMPTS_PER_EMPLOYEE = 5
+
+# Failed attempts per client IP within the window before its failures are
+# throttled (kiosks share an IP); default of the MAX_FAILED_PIN_ATTEMPTS_PER_IP
+# setting
+MAX_FAILED_ATTEMPTS_PER_IP = 50
+
+# Length of the failed attempt window in seconds
+FAILED_ATTEMPT_WINDOW = 300
+
+THROTTLED_MESSAGE = "Too many failed attempts. Please try again later."
+
+_MISSING = "missing"
+
+
+def _user_key(employee_id):
+    return f"attendance:auth:user:{employee_id}"
+
+
+def _employee_attempts_key(employee_id):
+    return f"attendance:auth:fail:emp:{employee_id}"
+
+
+def _ip_attempts_key(ip_address):
+    return f"attendance:auth:fail:ip:{ip_address}"
+
+
+def get_cached_user(employee_id):
+    """
+    Get a user by employee ID, using the authentication cache.
+
+    Each call returns a separate instance, so callers may modify it freely.
+
+    Args:
+        employee_id (str): The employee ID.
+
+    Returns:
+        CustomUser: The user with its company loaded, or None if not found.
+    """
+    from .models import CustomUser  # Import here to avoid circular imports
+
+    if not employee_id:
+        return None
+
+    key = _user_key(employee_id)
+    cached = cache.get(key)
+    if cached == _MISSING:
+        return None
+    if cached is not None:
+        return cached
+
+    try:
+        user = CustomUser.objects.select_related("company").get(employee_id=employee_id)
+    except CustomUser.DoesNotExist:
+        cache.set(key, _MISSING, MISSING_USER_CACHE_TTL)
+        return None
+
+    cache.set(key, user, USER_CACHE_TTL)
+    return user
+
+
+def invalidate_cached_users(employee_ids):
+    """
+    Remove users from the authentication cache.
+
+    Args:
+        employee_ids (iterable): The employee IDs to remove.
+    """
+    cache.delete_many([_user_key(employee_id) for employee_id in employee_ids])
+
+
+def _increment(key):
+    """
+    Increment a failed attempt counter, starting a new window if needed.
+    """
+    cache.add(key, 0, FAILED_ATTEMPT_WINDOW)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The counter expired between add() and incr()
+        cache.set(key, 1, FAILED_ATTEMPT_WINDOW)
+        return 1
+
+
+def is_throttled(employee_id):
+    """
+    Check whether an employee ID has too many failed attempts.
+
+    Args:
+        employee_id (str): The employee ID being tried.
+
+    Returns:
+        bool: True if the attempt should be rejected.
+    """
+    return cache.get(_employee_attempts_key(employee_id), 0) >= MAX_FAILED_ATTEMPTS_PER_EMPLOYEE
+
+
+def record_failed_attempt(employee_id, ip_address=None):
+    """
+    Record a failed authentication attempt.
+
+    Args:
+        employee_id (str): The employee ID that was tried.
+        ip_address (str, optional): The client's IP address.
+
+    Returns:
+        bool: True if the client IP is over its failed attempt limit, so the
+              failure should be answered as throttled.
+    """
+    _increment(_employee_attempts_key(employee_id))
+    if not ip_address:
+        return False
+    limit = getattr(settings, "MAX_FAILED_PIN_ATTEMPTS_PER_IP", MAX_FAILED_ATTEMPTS_PER_IP)
+    return _increment(_ip_attempts_key(ip_address)) > limit
+
+
+def clear_failed_attempts(employee_id):
+    """
+    Reset the failed attempt counter for an employee ID after a success.
+
+    Args:
+        employee_id (str): The employee ID.
+    """
+    cache.delete(_employee_attempts_key(employee_id))
+
+
+def authenticate_pin(employee_id, pin, ip_address=None):
+    """
+    Authenticate a PIN attempt through the cache and attempt limiter.
+
+    Args:
+        employee_id (str): The employee ID.
+        pin (str): The PIN.
+        ip_address (str, optional): The client's IP address.
+
+    Returns:
+        tuple: (auth_result, error_message). auth_result is what
+               CustomUser.check_pin() returns, or None with an error message
+               if the attempt failed. The message is THROTTLED_MESSAGE if the
+               attempt was throttled.
+    """
+    if is_throttled(employee_id):
+        return None, THROTTLED_MESSAGE
+
+    user = get_cached_user(employee_id)
+    if user is None:
+        error_message = "Employee ID not found"
+    else:
+        # check_pin() rejects inactive accounts like a wrong PIN
+        auth_result = user.check_pin(pin)
+        error_message = None if auth_result else "Incorrect PIN"
+
+    if error_message:
+        if record_failed_attempt(employee_id, ip_address):
+            return None, THROTTLED_MESSAGE
+        return None, error_message
+
+    clear_failed_attempts(employee_id)
+    return auth_result, None
+
+
+@receiver(post_save, sender="attendance.CustomUser")
+@receiver(post_delete, sender="attendance.CustomUser")
+def user_changed(sender, instance, **kwargs):
+    """
+    Invalidate a user's cached credential state when it is saved or deleted.
+
+    Args:
+        sender: The model class that sent the signal.
+        instance (CustomUser): The user that changed.
+        **kwargs: Additional keyword arguments.
+    """
+    invalidate_cached_users([instance.employee_id])
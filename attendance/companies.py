@@ -0,0 +1,175 @@
+"""
+Process-wide company alias map.
+
+Maps every company name and CompanyAlias (lowercased) to the IDs of the
+companies it refers to, and to the logo shown on the kiosk. Company filters
+resolve a code to integer IDs with one dict lookup and filter on
+company_id__in, so adding a subsidiary or alias only needs an admin change.
+
+Companies that share a name or alias are grouped together: a legacy
+"AgriDOM" company row is filtered together with "ASC" once "AgriDOM" is an
+alias of ASC.
+
+The map is rebuilt lazily after any Company or CompanyAlias is saved or
+deleted. Signals only reach the current process, so the map also expires
+after COMPANY_MAP_TTL seconds to bound how long other worker processes can
+use a stale map.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+# Seconds before the map is rebuilt even without a local invalidation
+COMPANY_MAP_TTL = 300
+
+DEFAULT_COMPANY_LOGO = "default_logo.png"
+
+CompanyMap = namedtuple("CompanyMap", ["company_ids", "logos"])
+
+_lock = threading.Lock()
+_map = None
+_loaded_at = 0.0
+_generation = 0
+
+
+def _normalize(name):
+    return (name or "").strip().lower()
+
+
+def _load_company_map():
+    """
+    Build the company alias map with two queries.
+
+    Returns:
+        CompanyMap: Mapping of lowercased names to frozensets of company IDs,
+                    and of lowercased names to logo filenames.
+    """
+    from .models import Company, CompanyAlias  # Import here to avoid circular imports
+
+    names = {}
+    for company_id, name in Company.objects.values_list("id", "name"):
+        names.setdefault(_normalize(name), set()).add(company_id)
+
+    company_names = {}
+    logos = {}
+    aliases = CompanyAlias.objects.values_list("alias", "company_id", "company__name", "logo")
+    for alias, company_id, company_name, logo in aliases.order_by("id"):
+        key = _normalize(alias)
+        names.setdefault(key, set()).add(company_id)
+        company_names[company_id] = _normalize(company_name)
+        if logo:
+            logos.setdefault(key, logo)
+            # A company without a logo of its own uses its first alias' logo
+            logos.setdefault(company_names[company_id], logo)
+
+    # Group companies that share a name or alias (union-find over IDs)
+    parent = {}
+
+    def find(company_id):
+        parent.setdefault(company_id, company_id)
+        while parent[company_id] != company_id:
+            parent[company_id] = parent[parent[company_id]]
+            company_id = parent[company_id]
+        return company_id
+
+    for company_ids in names.values():
+        first, *rest = company_ids
+        root = find(first)
+        for company_id in rest:
+            parent[find(company_id)] = root
+
+    groups = {}
+    for company_id in parent:
+        groups.setdefault(find(company_id), set()).add(company_id)
+    groups = {root: frozenset(members) for root, members in groups.items()}
+
+    company_ids = {
+        key: groups[find(next(iter(ids)))] for key, ids in names.items()
+    }
+    return CompanyMap(company_ids, logos)
+
+
+def get_company_map():
+    """
+    Get the company alias map, building it if needed.
+
+    Returns:
+        CompanyMap: The company IDs and logos by lowercased name.
+    """
+    global _map, _loaded_at
+
+    company_map = _map
+    if company_map is not None and time.monotonic() - _loaded_at < COMPANY_MAP_TTL:
+        return company_map
+
+    generation = _generation
+    company_map = _load_company_map()
+    with _lock:
+        # Only publish the map if nothing was invalidated while it was loading
+        if generation == _generation:
+            _map = company_map
+            _loaded_at = time.monotonic()
+    return company_map
+
+
+def resolve_company_ids(code):
+    """
+    Resolve a company code, name or alias to company IDs.
+
+    Args:
+        code (str): The company code, name or alias (case-insensitive).
+
+    Returns:
+        list: The IDs of the companies it refers to; empty if it is unknown.
+    """
+    return sorted(get_company_map().company_ids.get(_normalize(code), ()))
+
+
+def get_company_logo(company_name):
+    """
+    Retrieve the company logo filename based on the company name.
+
+    Args:
+        company_name (str): The name or alias of the company.
+
+    Returns:
+        str: The filename of the company logo. Returns a default logo if the
+             company has no logo.
+    """
+    if not company_name:
+        return DEFAULT_COMPANY_LOGO
+    return get_company_map().logos.get(_normalize(company_name), DEFAULT_COMPANY_LOGO)
+
+
+def invalidate_company_map():
+    """
+    Discard the company alias map so it is rebuilt on next use.
+    """
+    global _map, _generation
+
+    with _lock:
+        _map = None
+        _generation += 1
+
+
+@receiver(post_save, sender="attendance.Company")
+@receiver(post_delete, sender="attendance.Company")
+@receiver(post_save, sender="attendance.CompanyAlias")
+@receiver(post_delete, sender="attendance.CompanyAlias")
+def company_changed(sender, **kwargs):
+    """
+    Invalidate the company alias map when a company or alias changes.
+
+    The map is invalidated immediately and again once the transaction
+    commits, so a rebuild that ran before the commit is not kept.
+
+    Args:
+        sender: The model class that sent the signal.
+        **kwargs: Additional keyword arguments.
+    """
+    invalidate_company_map()
+    transaction.on_commit(invalidate_company_map)
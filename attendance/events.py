@@ -0,0 +1,210 @@
+"""
+In-process event broker for pushing clock-in and clock-out punches to kiosks.
+
+The broker keeps one asyncio queue per connected event stream. Publishing is
+thread-safe, so synchronous views (which run in worker threads under ASGI)
+can hand events to streams running on the event loop. It only reaches streams
+served by the same process, so the event stream must be served by a single
+ASGI worker process (e.g. ``uvicorn agridom_attendance.asgi:application``).
+"""
+import asyncio
+import json
+import threading
+
+from .serializers import kiosk_row
+
+# Number of undelivered events a single stream may hold before it is told to resync
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_SECONDS = 15
+
+RESYNC_EVENT = {"type": "resync"}
+
+
+class Subscription:
+    """
+    A single event stream's connection to the broker.
+    """
+    def __init__(self, loop):
+        """
+        Initialize the subscription.
+
+        Args:
+            loop (AbstractEventLoop): The event loop the stream is running on.
+        """
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event):
+        """
+        Put an event on the queue. Must be called from the subscription's loop.
+
+        If the queue is full the event is dropped and the stream is told to
+        resync, so a slow client falls back to fetching the delta instead of
+        holding an unbounded backlog.
+
+        Args:
+            event (dict): The event to deliver.
+        """
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """
+        Wait for the next event.
+
+        Args:
+            timeout (float): Seconds to wait before giving up.
+
+        Returns:
+            dict or None: The next event, or None if the timeout expired.
+        """
+        if self.overflowed and self.queue.empty():
+            self.overflowed = False
+            return RESYNC_EVENT
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class AttendanceBroker:
+    """
+    Fan-out broker for attendance events.
+    """
+    def __init__(self):
+        """
+        Initialize the broker with no subscribers.
+        """
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def subscribe(self):
+        """
+        Register a new subscription on the running event loop.
+
+        Returns:
+            Subscription: The new subscription.
+        """
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Remove a subscription from the broker.
+
+        Args:
+            subscription (Subscription): The subscription to remove.
+        """
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        """
+        Publish an event to every subscription. Safe to call from any thread.
+
+        Args:
+            event (dict): The event to publish.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The stream's event loop has been closed
+                self.unsubscribe(subscription)
+
+    @property
+    def subscriber_count(self):
+        """
+        Get the number of connected subscriptions.
+
+        Returns:
+            int: The number of subscriptions.
+        """
+        with self._lock:
+            return len(self._subscriptions)
+
+
+broker = AttendanceBroker()
+
+
+def publish_time_entry_event(entry, event_type):
+    """
+    Publish a clock-in or clock-out event for a time entry.
+
+    The payload matches a row of the kiosk attendance list, and the cursor
+    matches the change cursor used by get_todays_entries.
+
+    Args:
+        entry (TimeEntry): The time entry that was committed.
+        event_type (str): Either "clock_in" or "clock_out".
+    """
+    from .services import encode_cursor  # Import here to avoid circular imports
+
+    user = entry.user
+    # Formatted like a polled row, from the values of a queries.KIOSK_COLUMNS row
+    row = (
+        user.employee_id,
+        user.first_name,
+        user.surname,
+        user.company.name if user.company else None,
+        entry.time_in,
+        entry.time_out,
+        entry.image_path,
+        entry.last_modified,
+    )
+    broker.publish(
+        {
+            "type": event_type,
+            "cursor": encode_cursor(entry.last_modified),
+            "entry": kiosk_row(row),
+        }
+    )
+
+
+def format_sse(event):
+    """
+    Format an event as a Server-Sent Events message.
+
+    Args:
+        event (dict): The event to format.
+
+    Returns:
+        str: The SSE message.
+    """
+    message = f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    if event.get("cursor"):
+        message = f"id: {event['cursor']}\n" + message
+    return message
+
+
+async def stream_events(subscription):
+    """
+    Yield SSE messages for a subscription until the client disconnects.
+
+    Args:
+        subscription (Subscription): The subscription to stream.
+
+    Yields:
+        str: SSE messages and keep-alive comments.
+    """
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            event = await subscription.get(HEARTBEAT_SECONDS)
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,344 @@
+"""
+Disk cache for exports of past date ranges.
+
+Past days rarely change, and the same month is usually exported by several
+admins. Exports whose range ends before the current work date are written to
+the export_cache directory of settings.EXPORT_ROOT, which is not publicly
+served, and served from there on repeat requests.
+
+Each file is keyed by the export's filters and format plus a data version
+stamp: the count and latest last_modified of the matching time entries, read
+with one aggregate query over the (work_date, last_modified) index. Adding,
+editing or deleting an entry in the range changes the stamp, so an outdated
+file is never served; it is left for eviction. The key also includes a names
+version, bumped whenever an employee's ID, name or company or a company or
+company alias is saved or deleted, so exports showing old names are not
+served either. The version is a file in the cache directory, so every
+process using the cache sees it.
+
+csv and jsonl exports are streamed to the client on a cache miss and written
+to the cache at the same time; xlsx files are written whole first.
+
+Files are evicted least recently used first once the cache holds more than
+EXPORT_CACHE_MAX_BYTES. Serving a file refreshes its modification time,
+which is used as its last use time.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .utils import get_work_date
+
+# Total size of the cached exports before the least recently used are evicted
+EXPORT_CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+# Bump when the export layout changes, to stop serving files in the old layout
+EXPORT_CACHE_LAYOUT = 1
+
+# Bytes read per chunk when streaming a cached file
+_READ_SIZE = 64 * 1024
+
+# The employee fields shown in exports; saving only other fields keeps the names version
+_USER_EXPORT_FIELDS = frozenset({"employee_id", "first_name", "surname", "company"})
+
+_NAMES_VERSION_FILE = "names.version"
+
+_TEMP_SUFFIX = ".tmp"
+
+
+def get_cache_dir():
+    """
+    Get the export cache directory.
+
+    Returns:
+        str: The path of the export_cache directory in the export root.
+    """
+    return os.path.join(settings.EXPORT_ROOT, "export_cache")
+
+
+def is_cacheable(spec):
+    """
+    Check whether an export's range is closed, i.e. ends before today.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+
+    Returns:
+        bool: True if the export may be cached.
+    """
+    last_day = spec.date_to or spec.work_date
+    return last_day is not None and last_day < get_work_date()
+
+
+def export_cache_key(spec, export_format):
+    """
+    Build the cache key of an export, including its data version stamp.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        export_format (str): One of exports.EXPORT_FORMATS, or the kind of
+                             sharded zip, e.g. "csv.month.zip".
+
+    Returns:
+        str: The hex digest identifying the export's current contents.
+    """
+    from .queries import entry_queryset  # Import here to avoid circular imports
+
+    stamp = entry_queryset(spec).aggregate(count=Count("id"), latest=Max("last_modified"))
+    filters = spec._asdict()
+    filters["exclude_dates"] = sorted({str(day) for day in spec.exclude_dates})
+    filters["employee_id"] = spec.employee_id or None
+    payload = json.dumps(
+        [
+            EXPORT_CACHE_LAYOUT,
+            export_format,
+            filters,
+            stamp["count"],
+            stamp["latest"],
+            get_names_version(),
+        ],
+        default=str,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_names_version():
+    """
+    Get the version of the employee and company names shown in exports.
+
+    Returns:
+        str: The current version, or "" if it was never bumped.
+    """
+    try:
+        with open(os.path.join(get_cache_dir(), _NAMES_VERSION_FILE)) as version:
+            return version.read()
+    except FileNotFoundError:
+        return ""
+
+
+def bump_names_version():
+    """
+    Change the names version, so no cached export is served again.
+
+    Nothing is written while the cache directory does not exist, as there
+    is no cached export to replace.
+    """
+    cache_dir = get_cache_dir()
+    try:
+        temp = tempfile.NamedTemporaryFile(
+            "w", dir=cache_dir, suffix=_TEMP_SUFFIX, delete=False
+        )
+    except FileNotFoundError:
+        return
+    with temp:
+        temp.write(uuid.uuid4().hex)
+    os.replace(temp.name, os.path.join(cache_dir, _NAMES_VERSION_FILE))
+
+
+def _cache_path(spec, export_format):
+    """
+    Get the path of an export's cached file.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        export_format (str): One of exports.EXPORT_FORMATS, or the kind of
+                             sharded zip, e.g. "csv.month.zip".
+
+    Returns:
+        str: The path, whether or not the file exists.
+    """
+    return os.path.join(get_cache_dir(), f"{export_cache_key(spec, export_format)}.{export_format}")
+
+
+def _open_cached(path):
+    """
+    Open a cached file and mark it as used.
+
+    Args:
+        path (str): The path of the cached file.
+
+    Returns:
+        file: The file, opened for binary reading, or None if it is not cached.
+    """
+    try:
+        output = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass  # Evicted since it was opened; the open file is still readable
+    return output
+
+
+def _temporary_file(cache_dir):
+    """
+    Create a temporary file in the cache directory.
+
+    Files are written under a temporary name so no request can serve a
+    partial file, then moved to their cached path with os.replace().
+
+    Args:
+        cache_dir (str): The cache directory.
+
+    Returns:
+        file: The temporary file, opened for binary writing.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    return tempfile.NamedTemporaryFile(dir=cache_dir, suffix=_TEMP_SUFFIX, delete=False)
+
+
+def open_cached_export(spec, export_format, write):
+    """
+    Open the cached file of an export, writing it first if it is not cached.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        export_format (str): One of exports.EXPORT_FORMATS, or the kind of
+                             sharded zip, e.g. "csv.month.zip".
+        write (callable): Writes the export to the binary file object it is
+                          given; called on a cache miss.
+
+    Returns:
+        file: The cached export, opened for binary reading.
+    """
+    path = _cache_path(spec, export_format)
+    output = _open_cached(path)
+    if output is not None:
+        return output
+
+    with _temporary_file(os.path.dirname(path)) as temp:
+        try:
+            write(temp)
+        except BaseException:
+            temp.close()
+            os.remove(temp.name)
+            raise
+    os.replace(temp.name, path)
+
+    output = open(path, "rb")
+    evict_exports(keep=path)
+    return output
+
+
+def stream_cached_export(spec, export_format, chunks):
+    """
+    Stream an export from the cache, or stream it while caching it on a miss.
+
+    On a miss each chunk is sent as soon as it is produced and written to a
+    temporary file, which becomes the cached file once the export is
+    complete. An export that fails or is abandoned by the client is not
+    cached.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        export_format (str): One of exports.EXPORT_FORMATS.
+        chunks (callable): Returns the export as an iterable of bytes;
+                           called on a cache miss.
+
+    Yields:
+        bytes: The export, in chunks.
+    """
+    path = _cache_path(spec, export_format)
+    output = _open_cached(path)
+    if output is not None:
+        with output:
+            yield from iter(lambda: output.read(_READ_SIZE), b"")
+        return
+
+    temp = _temporary_file(os.path.dirname(path))
+    try:
+        with temp:
+            for chunk in chunks():
+                temp.write(chunk)
+                yield chunk
+    except BaseException:
+        os.remove(temp.name)
+        raise
+    os.replace(temp.name, path)
+    evict_exports(keep=path)
+
+
+def evict_exports(keep=None, max_bytes=None):
+    """
+    Delete the least recently used cached exports until the cache fits its size limit.
+
+    Args:
+        keep (str): The path of a file never to evict, e.g. the one just written.
+        max_bytes (int): The size limit; defaults to EXPORT_CACHE_MAX_BYTES.
+
+    Returns:
+        int: The number of files deleted.
+    """
+    max_bytes = EXPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    files = []
+    total = 0
+    try:
+        entries = list(os.scandir(get_cache_dir()))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if (
+            not entry.is_file()
+            or entry.name.endswith(_TEMP_SUFFIX)
+            or entry.name == _NAMES_VERSION_FILE
+        ):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+        total += stat.st_size
+
+    deleted = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            # Already evicted by another process, or still open on Windows
+            continue
+        total -= size
+        deleted += 1
+    return deleted
+
+
+@receiver(post_save, sender="attendance.CustomUser")
+@receiver(post_delete, sender="attendance.CustomUser")
+@receiver(post_save, sender="attendance.Company")
+@receiver(post_delete, sender="attendance.Company")
+@receiver(post_save, sender="attendance.CompanyAlias")
+@receiver(post_delete, sender="attendance.CompanyAlias")
+def names_changed(sender, update_fields=None, **kwargs):
+    """
+    Bump the names version when a name shown in exports may have changed.
+
+    The version is bumped immediately and again once the transaction
+    commits, so an export cached before the commit is not served.
+
+    Args:
+        sender: The model class that sent the signal.
+        update_fields (frozenset): The fields saved, or None for all fields.
+        **kwargs: Additional keyword arguments.
+    """
+    if (
+        sender._meta.model_name == "customuser"
+        and update_fields is not None
+        and not _USER_EXPORT_FIELDS & update_fields
+    ):
+        return
+    bump_names_version()
+    transaction.on_commit(bump_names_version)
@@ -0,0 +1,349 @@
+"""
+Sharded exports of long date ranges.
+
+A range export can be split per month or per company. Each shard is
+exported to its own file by a pool of SHARD_WORKERS processes, each with its
+own database connection, so a year-end export uses several cores instead of
+one. The shard files are combined into a zip together with summary.csv,
+which has one row per shard (entries, employees, hours worked and late
+entries) and a total row.
+
+Worker processes are started with the "spawn" method, so they do not
+inherit the web process' threads or database connections, and are kept for
+reuse. Each one sets up Django from DJANGO_SETTINGS_MODULE when it starts.
+If a worker dies (e.g. killed for running out of memory) the pool refuses
+new work; it is then shut down and replaced by a new pool.
+"""
+import csv
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.http import FileResponse
+from django.utils.text import get_valid_filename
+
+from .companies import resolve_company_ids
+from .export_cache import is_cacheable, open_cached_export
+from .exports import write_export
+from .queries import entry_queryset
+
+# Supported values of the range export's shard parameter
+SHARD_TYPES = ("month", "company")
+
+# Processes generating shards at once
+SHARD_WORKERS = min(4, os.cpu_count() or 1)
+
+SUMMARY_HEADERS = ["Shard", "File", "Entries", "Employees", "Hours Worked", "Late"]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    """
+    Set up Django in a shard worker process.
+    """
+    import django
+    django.setup()
+
+
+def _get_pool():
+    """
+    Get the shard process pool, creating it on first use.
+
+    Returns:
+        ProcessPoolExecutor: The pool.
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=SHARD_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def _discard_pool(pool):
+    """
+    Shut down a broken shard process pool, so the next _get_pool() creates a new one.
+
+    Args:
+        pool (ProcessPoolExecutor): The broken pool.
+    """
+    global _pool
+
+    with _pool_lock:
+        # Another thread may already have replaced it
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def month_shards(spec):
+    """
+    Split an export's date range into calendar months.
+
+    Args:
+        spec (AttendanceFilter): The entries to export, with date_from and date_to.
+
+    Returns:
+        list: (label, spec) of each month, e.g. ("2024-03", spec).
+    """
+    shards = []
+    start = spec.date_from
+    while start <= spec.date_to:
+        next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        end = min(next_month - timedelta(days=1), spec.date_to)
+        shards.append((f"{start:%Y-%m}", spec._replace(date_from=start, date_to=end)))
+        start = next_month
+    return shards
+
+
+def company_shards(spec):
+    """
+    Split an export by the companies of its employees.
+
+    Companies sharing a name or alias are one shard, as in company filters.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+
+    Returns:
+        list: (label, spec) of each company with entries, by name, then
+              ("No Company", spec) if some employees have no company.
+    """
+    names = (
+        entry_queryset(spec)
+        .values_list("user__company__name", flat=True)
+        .distinct()
+        .order_by("user__company__name")
+    )
+    shards = []
+    groups = set()
+    without_company = False
+    for name in names:
+        if name is None:
+            without_company = True
+            continue
+        group = frozenset(resolve_company_ids(name))
+        if group not in groups:
+            groups.add(group)
+            shards.append((name, spec._replace(company=name)))
+    if without_company:
+        shards.append(("No Company", spec._replace(company=None)))
+    return shards
+
+
+def get_shards(spec, shard):
+    """
+    Split an export into shards.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        shard (str): One of SHARD_TYPES.
+
+    Returns:
+        list: (label, spec) of each shard.
+
+    Raises:
+        ValueError: If the shard type is not supported.
+    """
+    if shard == "month":
+        return month_shards(spec)
+    if shard == "company":
+        return company_shards(spec)
+    raise ValueError(f"Unsupported shard type: {shard}")
+
+
+def summarize(spec):
+    """
+    Summarize the entries of an export with one aggregate query.
+
+    Args:
+        spec (AttendanceFilter): The entries.
+
+    Returns:
+        list: The summary values in SUMMARY_HEADERS order after File: the
+              entry count, distinct employees, total hours worked and late
+              entry count.
+    """
+    summary = entry_queryset(spec).aggregate(
+        entries=Count("id"),
+        employees=Count("user", distinct=True),
+        hours_worked=Sum("hours_worked"),
+        late=Count("id", filter=Q(is_late=True)),
+    )
+    return [
+        summary["entries"],
+        summary["employees"],
+        round(summary["hours_worked"] or 0, 2),
+        summary["late"],
+    ]
+
+
+def write_shard(spec, export_format, path):
+    """
+    Export one shard to a file and summarize it.
+
+    Args:
+        spec (AttendanceFilter): The shard's entries.
+        export_format (str): One of exports.EXPORT_FORMATS.
+        path (str): The file to write.
+
+    Returns:
+        list: The shard's summary values (see summarize()).
+    """
+    with open(path, "wb") as output:
+        write_export(spec, output, export_format)
+    return summarize(spec)
+
+
+def _write_shard_in_worker(spec, export_format, path):
+    """
+    Export one shard in a worker process.
+
+    Args:
+        spec (AttendanceFilter): The shard's entries.
+        export_format (str): One of exports.EXPORT_FORMATS.
+        path (str): The file to write.
+
+    Returns:
+        list: The shard's summary values.
+    """
+    try:
+        return write_shard(spec, export_format, path)
+    finally:
+        connection.close()
+
+
+def _submit_shards(shards, paths, export_format):
+    """
+    Submit shards to the process pool, replacing the pool once if it is broken.
+
+    Args:
+        shards (list): The (label, spec) of each shard.
+        paths (list): The file to write for each shard.
+        export_format (str): One of exports.EXPORT_FORMATS.
+
+    Returns:
+        list: The Future of each shard's summary values.
+
+    Raises:
+        BrokenProcessPool: If the new pool is broken too.
+    """
+    def submit(pool):
+        return [
+            pool.submit(_write_shard_in_worker, shard_spec, export_format, path)
+            for (_, shard_spec), path in zip(shards, paths)
+        ]
+
+    pool = _get_pool()
+    try:
+        return submit(pool)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+    return submit(_get_pool())
+
+
+def write_sharded(spec, output, export_format, shard, progress=None, workers=None):
+    """
+    Write a zip of an export's shard files and their summary.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        output: A writable binary file object.
+        export_format (str): One of exports.EXPORT_FORMATS.
+        shard (str): One of SHARD_TYPES.
+        progress (callable): Called with the number of entries written so
+                             far after each shard.
+        workers (int): Processes to use; defaults to SHARD_WORKERS. With one
+                       process (or one shard) the shards are written in the
+                       current process.
+    """
+    shards = get_shards(spec, shard)
+    workers = SHARD_WORKERS if workers is None else workers
+    # xlsx files are already compressed
+    compression = zipfile.ZIP_STORED if export_format == "xlsx" else zipfile.ZIP_DEFLATED
+
+    with tempfile.TemporaryDirectory() as shard_dir:
+        paths = [
+            os.path.join(shard_dir, f"{index}.{export_format}") for index in range(len(shards))
+        ]
+        if workers > 1 and len(shards) > 1:
+            results = _submit_shards(shards, paths, export_format)
+        else:
+            results = None
+
+        summary = io.StringIO()
+        writer = csv.writer(summary)
+        writer.writerow(SUMMARY_HEADERS)
+        written = 0
+        try:
+            with zipfile.ZipFile(output, "w", compression=compression) as archive:
+                for index, ((label, shard_spec), path) in enumerate(zip(shards, paths)):
+                    if results is None:
+                        row = write_shard(shard_spec, export_format, path)
+                    else:
+                        row = results[index].result()
+                    filename = get_valid_filename(f"{label}.{export_format}")
+                    archive.write(path, filename)
+                    os.remove(path)
+
+                    writer.writerow([label, filename, *row])
+                    written += row[0]
+                    if progress is not None:
+                        progress(written)
+
+                # Employees can appear in several shards, so the total is counted separately
+                writer.writerow(["Total", "", *summarize(spec)])
+                archive.writestr("summary.csv", summary.getvalue(), compress_type=zipfile.ZIP_DEFLATED)
+        except BaseException:
+            for result in results or ():
+                result.cancel()
+            raise
+
+
+def sharded_response(spec, name, export_format, shard):
+    """
+    Build a zip attachment of an export split into shards.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        name (str): The attachment filename without extension.
+        export_format (str): One of exports.EXPORT_FORMATS.
+        shard (str): One of SHARD_TYPES.
+
+    Returns:
+        FileResponse: The zip, served from the export cache for past ranges
+                      and from a temporary file otherwise.
+    """
+    def write(output):
+        write_sharded(spec, output, export_format, shard)
+
+    if is_cacheable(spec):
+        output = open_cached_export(spec, f"{export_format}.{shard}.zip", write)
+    else:
+        output = tempfile.TemporaryFile()
+        try:
+            write(output)
+        except BaseException:
+            output.close()
+            raise
+        output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f"{name}_by_{shard}.zip",
+        content_type="application/zip",
+    )
@@ -0,0 +1,413 @@
+"""
+Time entry exports.
+
+Exports read joined values_list() rows in chunks with iterator(), so a
+full-year export uses about as much worker memory as a one-day export.
+
+- xlsx rows are written to an openpyxl write-only workbook, which keeps only
+  the current row in memory and spools the sheet to disk. The finished file
+  is written to a temporary file and streamed to the client.
+- csv and jsonl rows are encoded and sent as they are read, from a generator
+  behind a StreamingHttpResponse, so the download starts immediately.
+
+Exports of ranges that ended before today are served from the export disk
+cache (see export_cache) in any format. On a cache miss csv and jsonl are
+still streamed as they are read, while a copy is written to the cache.
+
+The payroll timesheet has one row of totals per employee instead of one row
+per entry; the totals are computed by a grouped query in the database.
+"""
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+from .export_cache import is_cacheable, open_cached_export, stream_cached_export
+from .queries import EXPORT_COLUMNS, entry_rows, timesheet_rows
+from .serializers import day_time, dumps, iso_date
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+CSV_CONTENT_TYPE = "text/csv; charset=utf-8"
+
+JSONL_CONTENT_TYPE = "application/x-ndjson"
+
+# Supported values of the export views' format parameter
+EXPORT_FORMATS = ("xlsx", "csv", "jsonl")
+
+EXPORT_CONTENT_TYPES = {
+    "xlsx": XLSX_CONTENT_TYPE,
+    "csv": CSV_CONTENT_TYPE,
+    "jsonl": JSONL_CONTENT_TYPE,
+}
+
+# Rows fetched from the database per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_HEADERS = [
+    "ID",
+    "Employee ID",
+    "First Name",
+    "Surname",
+    "Company",
+    "Date",
+    "Time In",
+    "Time Out",
+    "Hours Worked",
+    "Is Late"
+]
+
+# Keys of the jsonl records, in EXPORT_HEADERS order
+EXPORT_FIELDS = (
+    "id",
+    "employee_id",
+    "first_name",
+    "surname",
+    "company",
+    "date",
+    "time_in",
+    "time_out",
+    "hours_worked",
+    "is_late",
+)
+
+TIMESHEET_HEADERS = [
+    "Employee ID",
+    "First Name",
+    "Surname",
+    "Company",
+    "Days Present",
+    "Hours Worked",
+    "Late Count",
+    "Minutes Late",
+    "Early Arrivals"
+]
+
+# Keys of the timesheet jsonl records, in TIMESHEET_HEADERS order
+TIMESHEET_FIELDS = (
+    "employee_id",
+    "first_name",
+    "surname",
+    "company",
+    "days_present",
+    "total_hours_worked",
+    "late_count",
+    "total_minutes_late",
+    "early_count",
+)
+
+
+class _Echo:
+    """
+    A file-like object whose write() returns the value written, so csv.writer
+    can encode one row at a time for a streaming response.
+    """
+    def write(self, value):
+        return value
+
+
+def export_rows(spec, flags=("No", "Yes"), progress=None):
+    """
+    Get the export rows of the time entries matching a filter spec.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        flags (tuple): The values written for is_late False and True.
+        progress (callable): Called with the number of rows yielded so far
+                             after every EXPORT_CHUNK_SIZE rows and at the end.
+
+    Yields:
+        list: One row per entry, in EXPORT_HEADERS order, ordered by time in.
+    """
+    count = 0
+    rows = entry_rows(spec, EXPORT_COLUMNS, ordering=("time_in", "id"))
+    for entry_id, employee_id, first_name, surname, company, time_in, time_out, hours_worked, is_late in rows.iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    ):
+        yield [
+            entry_id,
+            employee_id,
+            first_name,
+            surname,
+            company or "",
+            iso_date(time_in),
+            day_time(time_in),
+            day_time(time_out) if time_out else "",
+            hours_worked,
+            flags[bool(is_late)]
+        ]
+        count += 1
+        if progress is not None and count % EXPORT_CHUNK_SIZE == 0:
+            progress(count)
+    if progress is not None:
+        progress(count)
+
+
+def timesheet_export_rows(spec):
+    """
+    Get the payroll timesheet rows of the time entries matching a filter spec.
+
+    Args:
+        spec (AttendanceFilter): The entries to total.
+
+    Yields:
+        list: One row of totals per employee, in TIMESHEET_HEADERS order,
+              ordered by employee ID.
+    """
+    rows = timesheet_rows(spec).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for employee_id, first_name, surname, company, days_present, hours_worked, late_count, minutes_late, early_count in rows:
+        yield [
+            employee_id,
+            first_name,
+            surname,
+            company or "",
+            days_present,
+            round(hours_worked, 2),
+            late_count,
+            minutes_late,
+            early_count
+        ]
+
+
+def encode_csv(headers, rows):
+    """
+    Encode rows as CSV, one line at a time.
+
+    Args:
+        headers (list): The header row.
+        rows (iterable): The rows.
+
+    Yields:
+        str: The header line, then one line per row.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def encode_jsonl(fields, rows):
+    """
+    Encode rows as JSON Lines, one line at a time.
+
+    Args:
+        fields (tuple): The key of each column.
+        rows (iterable): The rows.
+
+    Yields:
+        bytes: One JSON object per row.
+    """
+    for row in rows:
+        yield dumps(dict(zip(fields, row))) + b"\n"
+
+
+def write_workbook(output, title, headers, rows):
+    """
+    Write rows as a single-sheet write-only Excel workbook.
+
+    Args:
+        output: A writable binary file object.
+        title (str): The sheet title.
+        headers (list): The header row.
+        rows (iterable): The rows.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
+    wb.save(output)
+
+
+def csv_lines(spec, progress=None):
+    """
+    Encode the time entries matching a filter spec as CSV.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        progress (callable): Passed to export_rows().
+
+    Yields:
+        str: The header line, then one line per entry.
+    """
+    return encode_csv(EXPORT_HEADERS, export_rows(spec, progress=progress))
+
+
+def jsonl_lines(spec, progress=None):
+    """
+    Encode the time entries matching a filter spec as JSON Lines.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        progress (callable): Passed to export_rows().
+
+    Yields:
+        bytes: One JSON object per entry, keyed by EXPORT_FIELDS, with
+               is_late as a boolean.
+    """
+    return encode_jsonl(EXPORT_FIELDS, export_rows(spec, flags=(False, True), progress=progress))
+
+
+def export_lines(spec, export_format, progress=None):
+    """
+    Encode the time entries matching a filter spec as CSV or JSON Lines.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        export_format (str): "csv" or "jsonl".
+        progress (callable): Passed to export_rows().
+
+    Returns:
+        iterable: The encoded lines, as bytes.
+    """
+    if export_format == "csv":
+        return (line.encode() for line in csv_lines(spec, progress=progress))
+    return jsonl_lines(spec, progress=progress)
+
+
+def write_xlsx(spec, output, progress=None):
+    """
+    Write the time entries matching a filter spec as an Excel workbook.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        output: A writable binary file object.
+        progress (callable): Passed to export_rows().
+    """
+    write_workbook(output, "Time Entries", EXPORT_HEADERS, export_rows(spec, progress=progress))
+
+
+def write_export(spec, output, export_format, progress=None):
+    """
+    Write the time entries matching a filter spec in any export format.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        output: A writable binary file object.
+        export_format (str): One of EXPORT_FORMATS.
+        progress (callable): Passed to export_rows().
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if export_format == "xlsx":
+        write_xlsx(spec, output, progress=progress)
+    elif export_format in ("csv", "jsonl"):
+        output.writelines(export_lines(spec, export_format, progress=progress))
+    else:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+
+def _temporary_file_response(write, filename, content_type):
+    """
+    Write a file to a temporary file and build a response streaming it.
+
+    Args:
+        write (callable): Writes the file to the binary file object it is given.
+        filename (str): The attachment filename.
+        content_type (str): The file's content type.
+
+    Returns:
+        FileResponse: The file, streamed from a temporary file that is
+                      removed once the response is closed.
+    """
+    output = tempfile.TemporaryFile()
+    try:
+        write(output)
+    except BaseException:
+        output.close()
+        raise
+    output.seek(0)
+    return FileResponse(
+        output, as_attachment=True, filename=filename, content_type=content_type
+    )
+
+
+def xlsx_response(spec, filename):
+    """
+    Build a streamed Excel attachment of the time entries matching a filter spec.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        filename (str): The attachment filename.
+
+    Returns:
+        FileResponse: The workbook, streamed from a temporary file.
+    """
+    return _temporary_file_response(
+        lambda output: write_xlsx(spec, output), filename, XLSX_CONTENT_TYPE
+    )
+
+
+def timesheet_response(spec, name, export_format="xlsx"):
+    """
+    Build a downloadable payroll timesheet of the time entries matching a filter spec.
+
+    Args:
+        spec (AttendanceFilter): The entries to total.
+        name (str): The attachment filename without extension.
+        export_format (str): One of EXPORT_FORMATS.
+
+    Returns:
+        FileResponse or StreamingHttpResponse: The timesheet attachment.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    filename = f"{name}.{export_format}"
+    if export_format == "xlsx":
+        return _temporary_file_response(
+            lambda output: write_workbook(
+                output, "Timesheet", TIMESHEET_HEADERS, timesheet_export_rows(spec)
+            ),
+            filename,
+            XLSX_CONTENT_TYPE,
+        )
+    if export_format == "csv":
+        lines = encode_csv(TIMESHEET_HEADERS, timesheet_export_rows(spec))
+    elif export_format == "jsonl":
+        lines = encode_jsonl(TIMESHEET_FIELDS, timesheet_export_rows(spec))
+    else:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    response = StreamingHttpResponse(lines, content_type=EXPORT_CONTENT_TYPES[export_format])
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_response(spec, name, export_format="xlsx"):
+    """
+    Build a downloadable export of the time entries matching a filter spec.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        name (str): The attachment filename without extension.
+        export_format (str): One of EXPORT_FORMATS.
+
+    Returns:
+        FileResponse or StreamingHttpResponse: The export attachment.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    filename = f"{name}.{export_format}"
+    if export_format == "xlsx":
+        if not is_cacheable(spec):
+            return xlsx_response(spec, filename)
+        output = open_cached_export(spec, "xlsx", lambda output: write_xlsx(spec, output))
+        return FileResponse(
+            output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE
+        )
+
+    if is_cacheable(spec):
+        lines = stream_cached_export(
+            spec, export_format, lambda: export_lines(spec, export_format)
+        )
+    else:
+        lines = export_lines(spec, export_format)
+    response = StreamingHttpResponse(lines, content_type=EXPORT_CONTENT_TYPES[export_format])
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
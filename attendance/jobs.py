@@ -0,0 +1,353 @@
+"""
+Background export jobs.
+
+Large exports are submitted as ExportJob records and generated by a bounded
+thread pool in the web process instead of inside the request, so
+simultaneous month-end exports cannot take every worker thread and database
+connection away from the kiosk endpoints. Clients poll the job for its
+progress and download the file once it is done.
+
+The limits are enforced in the database, so they hold across web processes:
+a user may have at most MAX_ACTIVE_JOBS_PER_USER jobs pending or running,
+and at most MAX_RUNNING_JOBS jobs run at once. A job that cannot be claimed
+because too many are running stays pending, and the next pool thread to
+finish a job (in any process) claims the oldest pending one. Each process
+has a pool of EXPORT_WORKERS threads.
+
+A running job's updated_at is refreshed with its progress and by a
+heartbeat every HEARTBEAT_SECONDS. Jobs whose heartbeat stopped (e.g. their
+process was restarted) are requeued and run by the run_export_jobs command.
+"""
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .export_cache import is_cacheable, open_cached_export
+from .export_shards import write_sharded
+from .exports import write_export
+from .models import CustomUser, ExportJob
+from .queries import AttendanceFilter, entry_queryset
+
+# Pool threads generating exports per process
+EXPORT_WORKERS = 2
+
+# Jobs running at once across all processes
+MAX_RUNNING_JOBS = 4
+
+# Pending or running jobs a single user may have at once
+MAX_ACTIVE_JOBS_PER_USER = 3
+
+# Seconds between heartbeats of a running job
+HEARTBEAT_SECONDS = 60
+
+ACTIVE_STATUSES = ("PENDING", "RUNNING")
+
+_DATE_FIELDS = ("work_date", "date_from", "date_to")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ExportJobLimitError(Exception):
+    """
+    Raised when a user already has too many export jobs in progress.
+    """
+
+
+def _filters_from_spec(spec):
+    """
+    Convert a filter spec to JSON-serializable job filters.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+
+    Returns:
+        dict: The spec's fields, with dates as ISO strings.
+    """
+    filters = spec._asdict()
+    del filters["modified_since"]
+    for field in _DATE_FIELDS:
+        if filters[field] is not None:
+            filters[field] = filters[field].isoformat()
+    filters["exclude_dates"] = [str(day) for day in spec.exclude_dates]
+    return filters
+
+
+def _spec_from_filters(filters):
+    """
+    Convert job filters back to a filter spec.
+
+    Args:
+        filters (dict): The job filters.
+
+    Returns:
+        AttendanceFilter: The entries to export.
+    """
+    values = dict(filters)
+    for field in _DATE_FIELDS:
+        if values.get(field):
+            values[field] = parse_date(values[field])
+    values["exclude_dates"] = tuple(values.get("exclude_dates", ()))
+    return AttendanceFilter(**values)
+
+
+def _get_executor():
+    """
+    Get the export thread pool, creating it on first use.
+
+    Returns:
+        ThreadPoolExecutor: The pool.
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=EXPORT_WORKERS, thread_name_prefix="export"
+            )
+        return _executor
+
+
+def count_active_jobs(user):
+    """
+    Count a user's pending and running export jobs.
+
+    Args:
+        user (CustomUser): The user.
+
+    Returns:
+        int: The number of active jobs.
+    """
+    return ExportJob.objects.filter(requested_by=user, status__in=ACTIVE_STATUSES).count()
+
+
+def submit_export_job(spec, name, export_format, user, shard=""):
+    """
+    Create an export job and queue it once the current transaction commits.
+
+    The user's row is locked while their active jobs are counted, so
+    concurrent submissions, even to other processes, cannot exceed the limit.
+
+    Args:
+        spec (AttendanceFilter): The entries to export.
+        name (str): The export filename without extension.
+        export_format (str): One of exports.EXPORT_FORMATS.
+        user (CustomUser): The user requesting the export.
+        shard (str): One of export_shards.SHARD_TYPES to export a zip of
+                     shard files, or "" for one file.
+
+    Returns:
+        ExportJob: The pending job.
+
+    Raises:
+        ExportJobLimitError: If the user already has MAX_ACTIVE_JOBS_PER_USER
+                             jobs pending or running.
+    """
+    with transaction.atomic():
+        # Lock the user's row so their concurrent submissions are counted one at a time
+        list(CustomUser.objects.select_for_update().filter(pk=user.pk).values_list("pk"))
+        if count_active_jobs(user) >= MAX_ACTIVE_JOBS_PER_USER:
+            raise ExportJobLimitError("Too many exports in progress. Wait for one to finish.")
+        job = ExportJob.objects.create(
+            requested_by=user,
+            filters=_filters_from_spec(spec),
+            export_format=export_format,
+            shard=shard,
+            filename=f"{name}_by_{shard}.zip" if shard else f"{name}.{export_format}",
+        )
+    transaction.on_commit(lambda: _get_executor().submit(_run_in_worker, job.pk))
+    return job
+
+
+def _run_in_worker(job_id):
+    """
+    Run an export job on a pool thread, then any jobs left pending because
+    too many were running.
+
+    Args:
+        job_id (int): The job ID.
+    """
+    try:
+        run_export_job(job_id)
+        while run_next_export_job():
+            pass
+    finally:
+        # Pool threads are not request threads, so nothing else closes their connection
+        connection.close()
+
+
+def _claim_job(job_id=None):
+    """
+    Mark a pending job as running, unless MAX_RUNNING_JOBS are running already.
+
+    Claims from several processes are not serialized, so each claim is made
+    first and then checked: a job with MAX_RUNNING_JOBS running jobs claimed
+    before it goes back to pending, to be claimed when one of them finishes.
+
+    Args:
+        job_id (int): The job to claim, or None for the oldest pending job.
+
+    Returns:
+        int: The claimed job's ID, or None if no job was claimed.
+    """
+    pending = ExportJob.objects.filter(status="PENDING")
+    if job_id is None:
+        job_id = pending.order_by("created_at").values_list("pk", flat=True).first()
+        if job_id is None:
+            return None
+
+    now = timezone.now()
+    if not pending.filter(pk=job_id).update(status="RUNNING", started_at=now, updated_at=now):
+        return None
+
+    claimed_before = ExportJob.objects.filter(
+        Q(started_at__lt=now) | Q(started_at=now, pk__lt=job_id), status="RUNNING"
+    ).count()
+    if claimed_before >= MAX_RUNNING_JOBS:
+        ExportJob.objects.filter(pk=job_id, status="RUNNING").update(
+            status="PENDING", started_at=None, updated_at=timezone.now()
+        )
+        return None
+    return job_id
+
+
+class _Heartbeat:
+    """
+    Refreshes a running job's updated_at from a background thread, so long
+    steps without progress (e.g. saving a workbook) are not mistaken for a
+    dead job.
+    """
+    def __init__(self, job_id):
+        """
+        Initialize the heartbeat.
+
+        Args:
+            job_id (int): The running job's ID.
+        """
+        self.job_id = job_id
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f"export-heartbeat-{job_id}", daemon=True)
+
+    def run(self):
+        """
+        Beat every HEARTBEAT_SECONDS until stopped.
+        """
+        try:
+            while not self.stopped.wait(HEARTBEAT_SECONDS):
+                ExportJob.objects.filter(pk=self.job_id, status="RUNNING").update(
+                    updated_at=timezone.now()
+                )
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def run_next_export_job():
+    """
+    Claim the oldest pending export job and generate its file.
+
+    Returns:
+        bool: False if no job was claimed.
+    """
+    job_id = _claim_job()
+    if job_id is None:
+        return False
+    _generate(job_id)
+    return True
+
+
+def run_export_job(job_id):
+    """
+    Claim a pending export job and generate its file.
+
+    The job's rows_written is updated every exports.EXPORT_CHUNK_SIZE rows.
+    Jobs for past ranges reuse (and fill) the export disk cache. A job that
+    fails is marked FAILED with the error instead of raising.
+
+    Args:
+        job_id (int): The job ID.
+
+    Returns:
+        bool: False if the job was not claimed: it was not pending (e.g.
+              another worker claimed it), or MAX_RUNNING_JOBS were running.
+    """
+    if _claim_job(job_id) is None:
+        return False
+    _generate(job_id)
+    return True
+
+
+def _generate(job_id):
+    """
+    Generate the file of a claimed export job and mark it DONE or FAILED.
+
+    Args:
+        job_id (int): The job ID.
+    """
+    with _Heartbeat(job_id):
+        _write_job(job_id)
+
+
+def _write_job(job_id):
+    """
+    Write a claimed export job's file and record the outcome.
+
+    Args:
+        job_id (int): The job ID.
+    """
+    job = ExportJob.objects.get(pk=job_id)
+    jobs = ExportJob.objects.filter(pk=job_id)
+
+    def progress(count):
+        jobs.update(rows_written=count, updated_at=timezone.now())
+
+    def write(output):
+        if job.shard:
+            write_sharded(spec, output, job.export_format, job.shard, progress=progress)
+        else:
+            write_export(spec, output, job.export_format, progress=progress)
+
+    try:
+        spec = _spec_from_filters(job.filters)
+        total_rows = entry_queryset(spec).count()
+        jobs.update(total_rows=total_rows, updated_at=timezone.now())
+        if is_cacheable(spec):
+            kind = f"{job.export_format}.{job.shard}.zip" if job.shard else job.export_format
+            output = open_cached_export(spec, kind, write)
+        else:
+            output = tempfile.TemporaryFile()
+            try:
+                write(output)
+            except BaseException:
+                output.close()
+                raise
+            output.seek(0)
+        with output:
+            job.file.save(job.filename, File(output), save=False)
+    except Exception as exc:
+        now = timezone.now()
+        jobs.update(
+            status="FAILED",
+            error=str(exc) or exc.__class__.__name__,
+            finished_at=now,
+            updated_at=now,
+        )
+        return
+
+    now = timezone.now()
+    jobs.update(
+        status="DONE", file=job.file.name, rows_written=total_rows, finished_at=now, updated_at=now
+    )
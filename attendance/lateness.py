@@ -0,0 +1,89 @@
+"""
+Lateness engine for time entries.
+
+Lateness is worked out from arrival times expressed as seconds since local
+midnight, compared against the schedule resolved for each (schedule group,
+day) pair. Schedules come from the resolved schedule table, so computing
+lateness for many entries costs no schedule queries.
+"""
+from django.utils import timezone
+
+from .schedules import resolve_schedule
+from .utils import get_day_code
+
+
+def _seconds_since_midnight(value):
+    """
+    Convert a time or datetime to seconds since midnight.
+
+    Args:
+        value (time or datetime): The value to convert.
+
+    Returns:
+        float: The number of seconds since midnight.
+    """
+    return (
+        value.hour * 3600
+        + value.minute * 60
+        + value.second
+        + value.microsecond / 1_000_000
+    )
+
+
+def compute_lateness(rows):
+    """
+    Compute lateness for many time entries at once.
+
+    Entries are grouped by (schedule group, day) so each schedule is resolved
+    once per batch, and lateness is worked out on the arrival seconds of each
+    group rather than on per-row datetime arithmetic.
+
+    Args:
+        rows (iterable): (time_in, schedule_group_id) pairs. schedule_group_id
+                         may be None for users without a schedule group.
+
+    Returns:
+        list: An (is_late, minutes_late) tuple for each row, in input order.
+              Rows without a schedule, or without a time_in, get (False, 0).
+    """
+    results = []
+    groups = {}
+
+    for index, (time_in, schedule_group_id) in enumerate(rows):
+        results.append((False, 0))
+        if time_in is None:
+            continue
+        if timezone.is_aware(time_in):
+            time_in = timezone.localtime(time_in)
+
+        key = (schedule_group_id, get_day_code(time_in))
+        indexes, arrivals = groups.setdefault(key, ([], []))
+        indexes.append(index)
+        arrivals.append(_seconds_since_midnight(time_in))
+
+    for (schedule_group_id, day_code), (indexes, arrivals) in groups.items():
+        preset = resolve_schedule(schedule_group_id, day_code)
+        if preset is None:
+            continue
+
+        expected = _seconds_since_midnight(preset.start_time)
+        deadline = expected + preset.grace_period_minutes * 60
+
+        for index, arrival in zip(indexes, arrivals):
+            results[index] = (arrival > deadline, round((arrival - expected) / 60))
+
+    return results
+
+
+def calculate_lateness(time_in, schedule_group_id):
+    """
+    Compute lateness for a single time entry.
+
+    Args:
+        time_in (datetime): The clock-in time.
+        schedule_group_id (int): The user's schedule group ID, or None.
+
+    Returns:
+        tuple: (is_late, minutes_late).
+    """
+    return compute_lateness([(time_in, schedule_group_id)])[0]
@@ -0,0 +1,398 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from attendance.auth_cache import invalidate_cached_users
+from attendance.models import Company, CustomUser, ScheduleGroup, TimePreset
+
+# Employee IDs seeded by the benchmark start here and are removed afterwards;
+# the run is refused if any ID it needs is already taken
+BENCH_EMPLOYEE_ID_START = 900000
+
+BENCH_GUARD_ID = "899999"
+
+BENCH_PIN = "1234"
+
+ENDPOINTS = ("upload_image", "clock_in", "get_todays_entries", "clock_out")
+
+# A minimal JPEG payload for upload_image requests
+BENCH_IMAGE = bytes.fromhex("ffd8ffe000104a46494600010100000100010000ffd9")
+
+
+def percentile(sorted_values, fraction):
+    """
+    Get a percentile from a sorted list using the nearest-rank method.
+
+    Args:
+        sorted_values (list): The values, sorted ascending.
+        fraction (float): The percentile as a fraction (e.g. 0.95).
+
+    Returns:
+        float: The percentile value, or 0 if there are no values.
+    """
+    if not sorted_values:
+        return 0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the kiosk endpoints under a simulated shift-change burst.
+    """
+    help = 'Seed employees and drive the kiosk endpoints with concurrent punches, then report latency and query stats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=500, help='Number of employees punching in and out')
+        parser.add_argument('--concurrency', type=int, default=8, help='Number of concurrent kiosk clients')
+        parser.add_argument('--window', type=float, default=0, help='Seconds over which the clock-ins arrive (e.g. 900 for 15 minutes); 0 sends them as fast as possible')
+        parser.add_argument('--groups', type=int, default=4, help='Number of schedule groups to spread the employees over')
+        parser.add_argument('--poll-every', type=int, default=10, help='Fetch get_todays_entries after every N clock-ins (0 to disable)')
+        parser.add_argument('--output', type=str, help='Path of the JSON results file (default: bench_kiosk_<timestamp>.json)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the arrival schedule')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded employees and entries after the run')
+
+    def handle(self, *args, **options):
+        """
+        Handles the benchmark run.
+        """
+        if options['employees'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--employees and --concurrency must be at least 1')
+        if options['employees'] > 999999 - BENCH_EMPLOYEE_ID_START:
+            raise CommandError('Too many employees for the benchmark employee ID range')
+
+        self.samples = {endpoint: [] for endpoint in ENDPOINTS}
+        self.samples_lock = threading.Lock()
+        self.uploaded_files = []
+
+        employee_ids = self.seed(options['employees'], options['groups'])
+        try:
+            started = time.perf_counter()
+            self.run_phase(
+                'clock_in', employee_ids, options['concurrency'],
+                options['window'], options['poll_every'], options['seed']
+            )
+            self.run_phase(
+                'clock_out', employee_ids, options['concurrency'],
+                0, options['poll_every'], options['seed']
+            )
+            elapsed = time.perf_counter() - started
+        finally:
+            if not options['keep']:
+                self.cleanup(employee_ids)
+
+        report = self.build_report(options, elapsed)
+        output = options['output'] or f"bench_kiosk_{datetime.now():%Y%m%d_%H%M%S}.json"
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        self.print_report(report)
+        self.stdout.write(self.style.SUCCESS(f'Results saved to {output}'))
+
+    def seed(self, employee_count, group_count):
+        """
+        Create the benchmark guard, schedule groups and employees.
+
+        Args:
+            employee_count (int): Number of employees to create.
+            group_count (int): Number of schedule groups to create.
+
+        Returns:
+            list: The seeded employee IDs.
+
+        Raises:
+            CommandError: If a user already has one of the benchmark employee IDs.
+        """
+        employee_ids = [
+            str(BENCH_EMPLOYEE_ID_START + i) for i in range(employee_count)
+        ]
+        taken = list(
+            CustomUser.objects.filter(employee_id__in=employee_ids + [BENCH_GUARD_ID])
+            .order_by('employee_id')
+            .values_list('employee_id', flat=True)[:5]
+        )
+        if taken:
+            raise CommandError(
+                f"Employee IDs {BENCH_GUARD_ID} to {employee_ids[-1]} must be free for the "
+                f"benchmark, but {', '.join(taken)} already exist. Remove them (e.g. data left "
+                f"by a --keep run) or use fewer --employees."
+            )
+
+        self.stdout.write(f'Seeding {employee_count} employees...')
+        company, self.company_created = Company.objects.get_or_create(name='Bench Company')
+
+        groups = []
+        for i in range(max(1, group_count)):
+            preset = TimePreset.objects.create(
+                name=f'Bench Preset {i + 1}',
+                start_time=datetime.strptime(f'{7 + i % 4}:00', '%H:%M').time(),
+                end_time=datetime.strptime(f'{16 + i % 4}:00', '%H:%M').time(),
+                grace_period_minutes=5,
+            )
+            groups.append(ScheduleGroup.objects.create(
+                name=f'Bench Group {i + 1}', default_schedule=preset
+            ))
+
+        CustomUser.objects.bulk_create(
+            [
+                CustomUser(
+                    employee_id=employee_id,
+                    username=employee_id,
+                    first_name=f'Bench{i}',
+                    surname='Employee',
+                    company=company,
+                    schedule_group=groups[i % len(groups)],
+                    pin=BENCH_PIN,
+                    if_first_login=False,
+                )
+                for i, employee_id in enumerate(employee_ids)
+            ],
+            batch_size=1000,
+        )
+        CustomUser.objects.create_user(
+            employee_id=BENCH_GUARD_ID,
+            username=BENCH_GUARD_ID,
+            password=BENCH_PIN,
+            first_name='Bench',
+            surname='Guard',
+            company=company,
+            is_guard=True,
+        )
+        invalidate_cached_users(employee_ids)
+
+        self.groups = groups
+        self.company = company
+        return employee_ids
+
+    def cleanup(self, employee_ids):
+        """
+        Remove everything the benchmark created.
+
+        seed() refuses to run if any benchmark employee ID is taken, so the
+        users with these IDs are the ones this run created.
+
+        Args:
+            employee_ids (list): The seeded employee IDs.
+        """
+        self.stdout.write('Cleaning up benchmark data...')
+        CustomUser.objects.filter(
+            employee_id__in=employee_ids + [BENCH_GUARD_ID], company=self.company
+        ).delete()
+        invalidate_cached_users(employee_ids + [BENCH_GUARD_ID])
+        for group in self.groups:
+            preset = group.default_schedule
+            group.delete()
+            preset.delete()
+        if self.company_created and not CustomUser.objects.filter(company=self.company).exists():
+            self.company.delete()
+        for path in self.uploaded_files:
+            default_storage.delete(path)
+            try:
+                # Prune the dated directories upload_image created, if now empty
+                os.removedirs(os.path.dirname(default_storage.path(path)))
+            except OSError:
+                pass
+
+    def make_client(self):
+        """
+        Create a test client logged in as the benchmark guard.
+
+        Returns:
+            Client: The logged-in client.
+        """
+        client = Client(raise_request_exception=False)
+        client.force_login(CustomUser.objects.get(employee_id=BENCH_GUARD_ID))
+        return client
+
+    def timed(self, endpoint, func):
+        """
+        Call an endpoint and record its latency, query count and DB time.
+
+        Args:
+            endpoint (str): The endpoint name.
+            func (callable): A function that performs the request.
+
+        Returns:
+            HttpResponse: The response.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = func()
+            latency = time.perf_counter() - started
+
+        ok = response.status_code == 200
+        if ok and response.get('Content-Type', '').startswith('application/json'):
+            ok = response.json().get('success', True) is not False
+
+        sample = {
+            'latency': latency,
+            'queries': len(queries),
+            'db_time': sum(float(q['time']) for q in queries.captured_queries),
+            'ok': ok,
+        }
+        with self.samples_lock:
+            self.samples[endpoint].append(sample)
+        return response
+
+    def punch(self, client, phase, employee_id, poll):
+        """
+        Perform one employee's punch through the kiosk endpoints.
+
+        Args:
+            client (Client): The kiosk's test client.
+            phase (str): Either "clock_in" or "clock_out".
+            employee_id (str): The employee punching.
+            poll (bool): Whether to fetch today's entries afterwards.
+        """
+        if phase == 'clock_in':
+            response = self.timed('upload_image', lambda: client.post(
+                reverse('upload_image'),
+                {
+                    'employee_id': employee_id,
+                    'image': SimpleUploadedFile('bench.jpg', BENCH_IMAGE, content_type='image/jpeg'),
+                },
+                secure=True,
+            ))
+            image_path = response.json().get('file_path') if response.status_code == 200 else None
+            if image_path:
+                with self.samples_lock:
+                    self.uploaded_files.append(image_path)
+
+            self.timed('clock_in', lambda: client.post(
+                reverse('clock_in'),
+                data=json.dumps({'employee_id': employee_id, 'pin': BENCH_PIN, 'image_path': image_path}),
+                content_type='application/json',
+                secure=True,
+            ))
+        else:
+            self.timed('clock_out', lambda: client.post(
+                reverse('clock_out'),
+                data=json.dumps({'employee_id': employee_id, 'pin': BENCH_PIN}),
+                content_type='application/json',
+                secure=True,
+            ))
+
+        if poll:
+            self.timed('get_todays_entries', lambda: client.get(
+                reverse('get_todays_entries'), secure=True
+            ))
+
+    def run_phase(self, phase, employee_ids, concurrency, window, poll_every, seed):
+        """
+        Run one phase of punches with the given concurrency and arrival window.
+
+        Args:
+            phase (str): Either "clock_in" or "clock_out".
+            employee_ids (list): The employees punching.
+            concurrency (int): The number of concurrent kiosk clients.
+            window (float): Seconds over which punches arrive (0 for no delay).
+            poll_every (int): Poll today's entries after every N punches (0 to disable).
+            seed (int): Random seed for the arrival schedule.
+        """
+        self.stdout.write(f'Running {phase} for {len(employee_ids)} employees...')
+        rng = random.Random(seed)
+        arrivals = sorted(rng.uniform(0, window) for _ in employee_ids) if window else [0] * len(employee_ids)
+        order = list(employee_ids)
+        rng.shuffle(order)
+        work = [
+            (offset, employee_id, bool(poll_every) and (i + 1) % poll_every == 0)
+            for i, (offset, employee_id) in enumerate(zip(arrivals, order))
+        ]
+
+        def worker(client, items):
+            try:
+                for offset, employee_id, poll in items:
+                    delay = offset - (time.perf_counter() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                    self.punch(client, phase, employee_id, poll)
+            finally:
+                if concurrency > 1:
+                    connection.close()
+
+        # Log the kiosks in up front so sessions are not created mid-burst
+        clients = [self.make_client() for _ in range(concurrency)]
+        shards = [work[i::concurrency] for i in range(concurrency)]
+        started = time.perf_counter()
+        if concurrency == 1:
+            worker(clients[0], shards[0])
+            return
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(worker, client, shard)
+                for client, shard in zip(clients, shards)
+            ]
+            for future in futures:
+                future.result()
+
+    def build_report(self, options, elapsed):
+        """
+        Summarize the collected samples.
+
+        Args:
+            options (dict): The command options.
+            elapsed (float): Total run time in seconds.
+
+        Returns:
+            dict: The benchmark report.
+        """
+        endpoints = {}
+        for endpoint, samples in self.samples.items():
+            latencies = sorted(sample['latency'] * 1000 for sample in samples)
+            count = len(samples)
+            endpoints[endpoint] = {
+                'requests': count,
+                'errors': sum(1 for sample in samples if not sample['ok']),
+                'p50_ms': round(percentile(latencies, 0.50), 2),
+                'p95_ms': round(percentile(latencies, 0.95), 2),
+                'p99_ms': round(percentile(latencies, 0.99), 2),
+                'max_ms': round(latencies[-1], 2) if latencies else 0,
+                'queries_per_request': round(sum(s['queries'] for s in samples) / count, 2) if count else 0,
+                'total_db_time_ms': round(sum(s['db_time'] for s in samples) * 1000, 2),
+            }
+
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'database': connection.vendor,
+            'employees': options['employees'],
+            'concurrency': options['concurrency'],
+            'window_seconds': options['window'],
+            'schedule_groups': options['groups'],
+            'elapsed_seconds': round(elapsed, 2),
+            'endpoints': endpoints,
+        }
+
+    def print_report(self, report):
+        """
+        Print the report as a table.
+
+        Args:
+            report (dict): The benchmark report.
+        """
+        self.stdout.write(
+            f"\n{report['employees']} employees, concurrency {report['concurrency']}, "
+            f"{report['elapsed_seconds']}s on {report['database']}\n"
+        )
+        self.stdout.write(
+            f"{'endpoint':<20}{'reqs':>7}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'p99 ms':>10}{'q/req':>8}{'db ms':>12}"
+        )
+        for endpoint, stats in report['endpoints'].items():
+            self.stdout.write(
+                f"{endpoint:<20}{stats['requests']:>7}{stats['errors']:>6}"
+                f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+                f"{stats['queries_per_request']:>8}{stats['total_db_time_ms']:>12}"
+            )
+        self.stdout.write('')
@@ -0,0 +1,111 @@
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from attendance.models import TimeEntry
+from attendance.serializers import dumps
+from attendance.services import get_attendance_list
+from attendance.utils import get_work_date
+
+
+def serialize_instances(work_date):
+    """
+    Serialize a day's kiosk list the old way: from model instances, with
+    strftime and the standard JSON encoder.
+
+    Args:
+        work_date (date): The day to list.
+
+    Returns:
+        bytes: The encoded list.
+    """
+    entries = TimeEntry.objects.filter(work_date=work_date).select_related(
+        "user", "user__company"
+    ).order_by("-last_modified")
+    return json.dumps([
+        {
+            "employee_id": entry.user.employee_id,
+            "first_name": entry.user.first_name,
+            "surname": entry.user.surname,
+            "company": entry.user.company.name if entry.user.company else "",
+            "time_in": entry.time_in.strftime("%I:%M %p"),
+            "time_out": entry.time_out.strftime("%I:%M %p") if entry.time_out else None,
+            "image_path": entry.image_path,
+        }
+        for entry in entries
+    ]).encode()
+
+
+def serialize_rows(work_date):
+    """
+    Serialize a day's kiosk list from values_list rows, as get_todays_entries does.
+
+    Args:
+        work_date (date): The day to list.
+
+    Returns:
+        bytes: The encoded list.
+    """
+    return dumps(get_attendance_list(work_date)["entries"])
+
+
+def measure(serialize, work_date, repeat):
+    """
+    Measure a serializer's best run time and peak allocation.
+
+    Args:
+        serialize (callable): The serializer.
+        work_date (date): The day to list.
+        repeat (int): Number of timed runs.
+
+    Returns:
+        tuple: (best seconds, peak bytes allocated).
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        serialize(work_date)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        serialize(work_date)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+class Command(BaseCommand):
+    """
+    Compares the kiosk list serializers on a day's entries.
+    """
+    help = "Compare serializing a day's kiosk list from model instances and from values_list rows (read-only)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=str, help='Work date to list, YYYY-MM-DD (default: today)')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs per serializer; the best is reported')
+
+    def handle(self, *args, **options):
+        """
+        Handles the benchmark run.
+        """
+        work_date = parse_date(options['date']) if options['date'] else get_work_date()
+        if work_date is None:
+            raise CommandError('--date must be in YYYY-MM-DD format')
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        if json.loads(serialize_instances(work_date)) != json.loads(serialize_rows(work_date)):
+            raise CommandError('The serializers produced different lists')
+
+        count = TimeEntry.objects.filter(work_date=work_date).count()
+        self.stdout.write(
+            f"{count} entries on {work_date}\n"
+        )
+        self.stdout.write(f"{'serializer':<12}{'best ms':>10}{'peak KiB':>12}")
+        for name, serialize in (('instances', serialize_instances), ('rows', serialize_rows)):
+            best, peak = measure(serialize, work_date, options['repeat'])
+            self.stdout.write(f"{name:<12}{best * 1000:>10.2f}{peak / 1024:>12.1f}")
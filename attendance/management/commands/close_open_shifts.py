@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, FloatField, Value
+from django.db.models.functions import ExtractHour, ExtractMinute, ExtractSecond, Round
+from django.utils import timezone
+
+from attendance.models import TimeEntry
+from attendance.schedules import resolve_schedule
+from attendance.summaries import COUNTER_FIELDS, apply_summary_deltas, new_deltas
+from attendance.utils import get_day_code, get_work_date
+
+
+def get_shift_end(schedule_group_id, work_date):
+    """
+    Get the time a shift on the given day is scheduled to end.
+
+    Overnight schedules (end_time at or before start_time) end on the next
+    day. Days whose override has no preset fall back to the default schedule.
+
+    Args:
+        schedule_group_id (int): The schedule group ID, or None.
+        work_date (date): The day the shift started.
+
+    Returns:
+        datetime: The scheduled end of the shift, in local time.
+    """
+    day_code = get_day_code(work_date)
+    preset = resolve_schedule(schedule_group_id, day_code) or resolve_schedule(None, day_code)
+
+    shift_end = datetime.combine(work_date, preset.end_time)
+    if preset.end_time <= preset.start_time:
+        shift_end += timedelta(days=1)
+    if timezone.is_aware(timezone.now()):
+        shift_end = timezone.make_aware(shift_end)
+    return shift_end
+
+
+class Command(BaseCommand):
+    """
+    Closes open shifts whose schedule has ended, for forgotten clock-outs.
+    """
+    help = "Close open time entries at their schedule group's end time once that time has passed (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report the shifts that would be closed without closing them')
+
+    def handle(self, *args, **options):
+        """
+        Handles closing the stale open shifts.
+        """
+        now = timezone.now()
+        open_entries = TimeEntry.objects.filter(time_out__isnull=True, work_date__lte=get_work_date(now))
+
+        buckets = (
+            open_entries.values_list("user__schedule_group_id", "work_date")
+            .distinct()
+            .order_by("work_date")
+        )
+
+        closed = 0
+        skipped = 0
+        for schedule_group_id, work_date in list(buckets):
+            shift_end = get_shift_end(schedule_group_id, work_date)
+            if shift_end > now:
+                continue
+
+            bucket = open_entries.filter(
+                work_date=work_date, user__schedule_group_id=schedule_group_id
+            )
+            # Entries that started after the scheduled end are left for review
+            skipped += bucket.filter(time_in__gte=shift_end).count()
+            bucket = bucket.filter(time_in__lt=shift_end)
+
+            if options['dry_run']:
+                closed += bucket.count()
+                continue
+
+            closed += self.close_bucket(bucket, work_date, shift_end, now)
+
+        verb = 'Would close' if options['dry_run'] else 'Closed'
+        message = f'{verb} {closed} open shifts'
+        if skipped:
+            message += f'; skipped {skipped} that started after their scheduled end'
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def close_bucket(self, bucket, work_date, shift_end, now):
+        """
+        Close a group's open shifts for one day with a single UPDATE, and
+        take them off their daily summaries' open shift counts.
+
+        hours_worked is computed in the database from each entry's time of day,
+        since every entry in the bucket started on work_date and ends at
+        shift_end.
+
+        Args:
+            bucket (QuerySet): The open entries to close.
+            work_date (date): The day the shifts started.
+            shift_end (datetime): The scheduled end of the shifts.
+            now (datetime): The current time, stored as last_modified.
+
+        Returns:
+            int: The number of entries closed.
+        """
+        day_start = datetime.combine(work_date, datetime.min.time())
+        if timezone.is_aware(shift_end):
+            day_start = timezone.make_aware(day_start)
+        end_offset = (shift_end - day_start).total_seconds()
+
+        seconds_in = (
+            ExtractHour("time_in") * 3600
+            + ExtractMinute("time_in") * 60
+            + ExtractSecond("time_in")
+        )
+        hours_worked = Round(
+            (Value(end_offset, output_field=FloatField()) - seconds_in)
+            / Value(3600.0, output_field=FloatField()),
+            2,
+            output_field=FloatField(),
+        )
+
+        with transaction.atomic():
+            # Closed shifts are no longer open in their daily summaries
+            deltas = new_deltas()
+            groups = (
+                bucket.values_list("user__company_id", "user__department_id")
+                .annotate(count=Count("id"))
+                .order_by()
+            )
+            for company_id, department_id, count in groups:
+                deltas[(work_date, company_id, department_id)][
+                    COUNTER_FIELDS.index("open_shifts")
+                ] -= count
+            apply_summary_deltas(deltas)
+
+            return bucket.update(
+                time_out=shift_end, hours_worked=hours_worked, last_modified=now
+            )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from attendance.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    """
+    Regenerates the daily attendance summaries for a date range.
+    """
+    help = 'Rebuild daily attendance summaries from the raw time entries (e.g. after users change company or department)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', type=str, required=True, help='First date to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=str, required=True, help='Last date to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        """
+        Handles the summary rebuild.
+        """
+        date_from = parse_date(options['date_from'] or '')
+        date_to = parse_date(options['date_to'] or '')
+        if not date_from or not date_to:
+            raise CommandError('--from and --to must be dates in YYYY-MM-DD format')
+        if date_from > date_to:
+            raise CommandError('--from must not be after --to')
+
+        written = rebuild_summaries(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} summary rows from {date_from} to {date_to}'
+        ))
@@ -0,0 +1,105 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from attendance.companies import resolve_company_ids
+from attendance.lateness import compute_lateness
+from attendance.models import TimeEntry
+from attendance.summaries import add_contribution, apply_summary_deltas, new_deltas
+
+
+class Command(BaseCommand):
+    """
+    Recomputes is_late and minutes_late for time entries in a date range.
+    """
+    help = 'Recompute lateness for time entries in a date range (e.g. after editing a preset)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', type=str, required=True, help='First date to recompute (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=str, required=True, help='Last date to recompute (YYYY-MM-DD)')
+        parser.add_argument('--company', type=str, help='Only recompute entries for users of this company (code, name or alias)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Number of entries to compute and write per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Report the number of changed entries without writing them')
+
+    def handle(self, *args, **options):
+        """
+        Handles the lateness recomputation.
+        """
+        date_from = parse_date(options['date_from'] or '')
+        date_to = parse_date(options['date_to'] or '')
+        if not date_from or not date_to:
+            raise CommandError('--from and --to must be dates in YYYY-MM-DD format')
+        if date_from > date_to:
+            raise CommandError('--from must not be after --to')
+
+        chunk_size = options['chunk_size']
+        qs = TimeEntry.objects.filter(work_date__range=(date_from, date_to))
+        if options['company']:
+            # By the IDs the code, name or alias refers to, as in company filters
+            company_ids = resolve_company_ids(options['company'])
+            if not company_ids:
+                raise CommandError(f"Unknown company: {options['company']}")
+            qs = qs.filter(user__company_id__in=company_ids)
+
+        rows = qs.order_by('id').values_list(
+            'id', 'time_in', 'user__schedule_group_id', 'is_late', 'minutes_late',
+            'work_date', 'user__company_id', 'user__department_id', 'time_out',
+        )
+
+        # Walk the range in id order, one chunk at a time, so writes never
+        # interleave with an open read cursor
+        scanned = 0
+        changed = 0
+        last_id = 0
+        while True:
+            chunk = list(rows.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            changed += self.recompute_chunk(chunk, options['dry_run'])
+            scanned += len(chunk)
+            last_id = chunk[-1][0]
+
+        verb = 'would change' if options['dry_run'] else 'updated'
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {scanned} entries from {date_from} to {date_to}; {verb} {changed}'
+        ))
+
+    def recompute_chunk(self, chunk, dry_run):
+        """
+        Compute lateness for a chunk of entries and write back the changed ones.
+
+        The daily summaries of the changed entries are adjusted in the same
+        transaction.
+
+        Args:
+            chunk (list): (id, time_in, schedule_group_id, is_late, minutes_late,
+                          work_date, company_id, department_id, time_out) rows.
+            dry_run (bool): If True, count changes without writing them.
+
+        Returns:
+            int: The number of entries whose lateness changed.
+        """
+        results = compute_lateness((row[1], row[2]) for row in chunk)
+
+        now = timezone.now()
+        updates = []
+        deltas = new_deltas()
+        for row, (is_late, minutes_late) in zip(chunk, results):
+            entry_id, _, _, old_is_late, old_minutes_late, work_date, company_id, department_id, time_out = row
+            if (is_late, minutes_late) == (old_is_late, old_minutes_late):
+                continue
+            updates.append(TimeEntry(
+                id=entry_id, is_late=is_late, minutes_late=minutes_late, last_modified=now
+            ))
+            key = (work_date, company_id, department_id)
+            add_contribution(deltas, key, old_is_late, old_minutes_late, time_out, sign=-1)
+            add_contribution(deltas, key, is_late, minutes_late, time_out)
+
+        if updates and not dry_run:
+            with transaction.atomic():
+                TimeEntry.objects.bulk_update(
+                    updates, ['is_late', 'minutes_late', 'last_modified']
+                )
+                apply_summary_deltas(deltas)
+        return len(updates)
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from attendance.jobs import run_next_export_job
+from attendance.models import ExportJob
+
+
+class Command(BaseCommand):
+    """
+    Runs export jobs left behind by a restarted web process.
+    """
+    help = "Run pending export jobs, requeueing running jobs whose heartbeat stopped (run after a restart or from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=10, help='Requeue running jobs not updated for this many minutes (jobs beat every minute while running)')
+
+    def handle(self, *args, **options):
+        """
+        Handles requeueing the stale jobs and running the pending ones.
+        """
+        cutoff = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        requeued = ExportJob.objects.filter(status='RUNNING', updated_at__lt=cutoff).update(
+            status='PENDING', rows_written=0, started_at=None, updated_at=timezone.now()
+        )
+
+        ran = 0
+        while run_next_export_job():
+            ran += 1
+
+        message = f'Ran {ran} export jobs'
+        if requeued:
+            message += f'; requeued {requeued} stale running jobs'
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,186 @@
+"""
+Process-wide request metrics.
+
+Per-request measurements are collected into fixed-bucket histograms keyed by
+URL name and rendered in the Prometheus text exposition format. Histograms
+live in process memory, so each worker process reports its own series.
+"""
+import threading
+from bisect import bisect_left
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape_label(value):
+    """
+    Escape a label value for the Prometheus text format.
+
+    Args:
+        value (str): The label value.
+
+    Returns:
+        str: The escaped value.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_number(value):
+    """
+    Format a bucket bound or sample value for the Prometheus text format.
+
+    Args:
+        value (int or float): The value to format.
+
+    Returns:
+        str: The formatted value.
+    """
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """
+    A thread-safe histogram with one series per URL name.
+    """
+    def __init__(self, name, documentation, buckets):
+        """
+        Initialize the histogram.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The HELP text.
+            buckets (tuple): The ascending upper bounds of the buckets.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, view, value):
+        """
+        Record a value for a URL name.
+
+        Args:
+            view (str): The URL name.
+            value (float): The observed value.
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(view)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                series = self._series[view] = [[0] * (len(self.buckets) + 1), 0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def reset(self):
+        """
+        Discard all recorded values.
+        """
+        with self._lock:
+            self._series = {}
+
+    def render(self):
+        """
+        Render the histogram in the Prometheus text format.
+
+        Returns:
+            list: The lines of the rendered histogram.
+        """
+        with self._lock:
+            series = {
+                view: (list(counts), total, count)
+                for view, (counts, total, count) in self._series.items()
+            }
+
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for view in sorted(series):
+            counts, total, count = series[view]
+            label = f'view="{_escape_label(view)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else _format_number(bound)
+                lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {_format_number(total)}")
+            lines.append(f"{self.name}_count{{{label}}} {count}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "attendance_request_duration_seconds",
+    "Time spent handling the request, including database time.",
+    DURATION_BUCKETS,
+)
+
+DB_DURATION = Histogram(
+    "attendance_request_db_duration_seconds",
+    "Time spent executing SQL queries per request.",
+    DURATION_BUCKETS,
+)
+
+QUERY_COUNT = Histogram(
+    "attendance_request_queries",
+    "Number of SQL queries executed per request.",
+    QUERY_COUNT_BUCKETS,
+)
+
+RESPONSE_SIZE = Histogram(
+    "attendance_response_size_bytes",
+    "Size of the response body, excluding streaming responses.",
+    SIZE_BUCKETS,
+)
+
+HISTOGRAMS = (REQUEST_DURATION, DB_DURATION, QUERY_COUNT, RESPONSE_SIZE)
+
+
+def observe_request(view, duration, db_duration, query_count, response_size=None):
+    """
+    Record the measurements of one request.
+
+    Args:
+        view (str): The URL name of the request.
+        duration (float): Seconds spent handling the request.
+        db_duration (float): Seconds spent executing SQL queries.
+        query_count (int): Number of SQL queries executed.
+        response_size (int, optional): Response body size in bytes, or None
+                                       for streaming responses.
+    """
+    REQUEST_DURATION.observe(view, duration)
+    DB_DURATION.observe(view, db_duration)
+    QUERY_COUNT.observe(view, query_count)
+    if response_size is not None:
+        RESPONSE_SIZE.observe(view, response_size)
+
+
+def render_metrics():
+    """
+    Render all request histograms in the Prometheus text format.
+
+    Returns:
+        str: The exposition text.
+    """
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics():
+    """
+    Discard all recorded request metrics.
+    """
+    for histogram in HISTOGRAMS:
+        histogram.reset()
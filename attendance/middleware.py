@@ -1,9 +1,14 @@
+import time
+
 from django.shortcuts import redirect
 from django.urls import reverse
+from django.db import connection
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.admin.models import LogEntry
 
+from .metrics import observe_request
+
 
 class BlockAdminAccessMiddleware:
     """
@@ -42,6 +47,86 @@ class BlockAdminAccessMiddleware:
         return self.get_response(request)
 
 
+class QueryTimer:
+    """
+    Database execute wrapper that counts queries and their total time.
+    """
+    def __init__(self):
+        """
+        Initialize the timer.
+        """
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Execute a query and record its duration.
+
+        Args:
+            execute: The next execute function in the chain.
+            sql (str): The SQL statement.
+            params: The query parameters.
+            many (bool): Whether this is an executemany call.
+            context (dict): Context about the connection and cursor.
+
+        Returns:
+            The result of the query execution.
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class RequestTimingMiddleware:
+    """
+    Middleware to measure query count, database time, total handling time and
+    response size for every request.
+
+    The handling time ("app" in the Server-Timing header) covers everything
+    below this middleware: the other middleware, the view and rendering the
+    response. The measurements are added to the response as a Server-Timing
+    header and recorded in the process-wide histograms exposed by the metrics
+    endpoint.
+    """
+    def __init__(self, get_response):
+        """
+        Initialize the middleware.
+
+        Args:
+            get_response: The next middleware or view to call.
+        """
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """
+        Process the request.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            The HTTP response object.
+        """
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        view = getattr(request.resolver_match, "view_name", None) or "unresolved"
+        response_size = None if response.streaming else len(response.content)
+        observe_request(view, duration, timer.duration, timer.count, response_size)
+
+        response["Server-Timing"] = (
+            f'db;dur={timer.duration * 1000:.1f};desc="{timer.count} queries", '
+            f'app;dur={duration * 1000:.1f};desc="Middleware, view and rendering"'
+        )
+        return response
+
+
 @receiver(post_save, sender=LogEntry)
 def log_admin_entries(sender, instance, created, **kwargs):
     """
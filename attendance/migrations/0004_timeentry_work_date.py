@@ -0,0 +1,30 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_alter_adminlog_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeentry',
+            name='work_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(fields=['work_date', 'last_modified'], name='time_entry_day_modified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(fields=['user', 'work_date'], name='time_entry_user_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(fields=['user', 'time_in'], name='time_entry_user_time_in_idx'),
+        ),
+    ]
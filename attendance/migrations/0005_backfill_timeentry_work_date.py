@@ -0,0 +1,33 @@
+from django.db import migrations
+from django.db.models import Max, Min
+from django.db.models.functions import TruncDate
+
+# Rows updated per statement, to keep each UPDATE's locks short
+BATCH_SIZE = 10000
+
+
+def backfill_work_date(apps, schema_editor):
+    """
+    Fill work_date from time_in for existing entries, in id-range batches.
+    """
+    TimeEntry = apps.get_model("attendance", "TimeEntry")
+    pending = TimeEntry.objects.filter(work_date__isnull=True)
+    bounds = pending.aggregate(first=Min("id"), last=Max("id"))
+    if bounds["first"] is None:
+        return
+
+    for start in range(bounds["first"], bounds["last"] + 1, BATCH_SIZE):
+        pending.filter(id__gte=start, id__lt=start + BATCH_SIZE).update(
+            work_date=TruncDate("time_in")
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_timeentry_work_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_work_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:22
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def worked_hours(entries):
+    """
+    Total the hours of a day's entries, counting overlapping time once.
+
+    Args:
+        entries (list): The day's entries; those without a time_out are skipped.
+
+    Returns:
+        float: The hours covered by the entries' intervals, rounded to 2 places.
+    """
+    intervals = sorted(
+        (entry.time_in, entry.time_out) for entry in entries if entry.time_out
+    )
+    seconds = 0
+    start = end = None
+    for time_in, time_out in intervals:
+        if end is None or time_in > end:
+            if end is not None:
+                seconds += (end - start).total_seconds()
+            start, end = time_in, time_out
+        else:
+            end = max(end, time_out)
+    if end is not None:
+        seconds += (end - start).total_seconds()
+    return round(seconds / 3600, 2)
+
+
+def merge_duplicate_entries(apps, schema_editor):
+    """
+    Merge entries that share a user and work_date into the earliest one.
+
+    The kept entry is the day's first clock-in, so its lateness stands. It
+    takes the latest time_out of the day and the first available image path,
+    and its hours_worked becomes the time covered by all the entries, without
+    the gaps between them. Each removed entry is recorded in the admin log
+    with all its values before it is deleted.
+    """
+    TimeEntry = apps.get_model("attendance", "TimeEntry")
+    AdminLog = apps.get_model("attendance", "AdminLog")
+    duplicates = list(
+        TimeEntry.objects.filter(work_date__isnull=False)
+        .values("user_id", "work_date")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+    )
+
+    for duplicate in duplicates:
+        entries = list(
+            TimeEntry.objects.filter(
+                user_id=duplicate["user_id"], work_date=duplicate["work_date"]
+            ).order_by("time_in", "id")
+        )
+        keep = entries[0]
+
+        time_outs = [entry.time_out for entry in entries if entry.time_out]
+        if time_outs:
+            keep.time_out = max(time_outs)
+            keep.hours_worked = worked_hours(entries)
+        if not keep.image_path:
+            keep.image_path = next(
+                (entry.image_path for entry in entries if entry.image_path), None
+            )
+        keep.save(update_fields=["time_out", "hours_worked", "image_path", "last_modified"])
+
+        AdminLog.objects.bulk_create([
+            AdminLog(
+                user_id=entry.user_id,
+                action="admin_delete",
+                description=(
+                    f"Merged duplicate time entry {entry.pk} into {keep.pk} "
+                    f"(work_date={entry.work_date}, time_in={entry.time_in}, "
+                    f"time_out={entry.time_out}, hours_worked={entry.hours_worked}, "
+                    f"is_late={entry.is_late}, minutes_late={entry.minutes_late}, "
+                    f"image_path={entry.image_path})"
+                ),
+            )
+            for entry in entries[1:]
+        ])
+        TimeEntry.objects.filter(pk__in=[entry.pk for entry in entries[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_backfill_timeentry_work_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_entries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='timeentry',
+            constraint=models.UniqueConstraint(fields=('user', 'work_date'), name='time_entry_user_day_unique', violation_error_message='This user already has a time entry for this day.'),
+        ),
+        # The unique constraint's index covers (user, work_date) lookups
+        migrations.RemoveIndex(
+            model_name='timeentry',
+            name='time_entry_user_day_idx',
+        ),
+    ]
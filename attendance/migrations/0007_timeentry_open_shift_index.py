@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_timeentry_one_entry_per_day'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(fields=['time_out', 'work_date'], name='time_entry_open_shift_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def build_summaries(apps, schema_editor):
+    """
+    Build the daily summaries for all existing time entries.
+    """
+    TimeEntry = apps.get_model("attendance", "TimeEntry")
+    DailyAttendanceSummary = apps.get_model("attendance", "DailyAttendanceSummary")
+
+    groups = (
+        TimeEntry.objects.filter(work_date__isnull=False)
+        .values("work_date", "user__company_id", "user__department_id")
+        .annotate(
+            present_count=Count("id"),
+            late_count=Count("id", filter=Q(is_late=True)),
+            early_count=Count("id", filter=Q(minutes_late__lt=0)),
+            total_minutes_late=Coalesce(Sum("minutes_late", filter=Q(is_late=True)), 0),
+            open_shifts=Count("id", filter=Q(time_out__isnull=True)),
+        )
+        .order_by()
+    )
+    DailyAttendanceSummary.objects.bulk_create(
+        [
+            DailyAttendanceSummary(
+                date=group["work_date"],
+                company_id=group["user__company_id"],
+                department_id=group["user__department_id"],
+                present_count=group["present_count"],
+                late_count=group["late_count"],
+                early_count=group["early_count"],
+                total_minutes_late=group["total_minutes_late"],
+                open_shifts=group["open_shifts"],
+            )
+            for group in groups
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_timeentry_open_shift_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present_count', models.IntegerField(default=0)),
+                ('late_count', models.IntegerField(default=0)),
+                ('early_count', models.IntegerField(default=0)),
+                ('total_minutes_late', models.IntegerField(default=0)),
+                ('open_shifts', models.IntegerField(default=0)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='attendance.company')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='attendance.department')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Attendance Summaries',
+                'db_table': 'django_daily_attendance_summaries',
+                'constraints': [models.UniqueConstraint(fields=('date', 'company', 'department'), name='daily_summary_group_unique')],
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
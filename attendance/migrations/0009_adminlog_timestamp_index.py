@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_dailyattendancesummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adminlog',
+            index=models.Index(fields=['timestamp', 'id'], name='admin_log_timestamp_idx'),
+        ),
+    ]
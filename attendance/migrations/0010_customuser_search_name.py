@@ -0,0 +1,70 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:34
+
+import unicodedata
+
+from django.db import migrations, models
+
+# Users written per bulk update
+BATCH_SIZE = 1000
+
+
+# Frozen copies of attendance.utils.normalize_name and get_name_search_keys,
+# so replaying this migration gives the same keys if those change later
+
+
+def normalize_name(value):
+    """
+    Lowercase a name, remove its accents and collapse its whitespace.
+    """
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return " ".join(value.casefold().split())
+
+
+def get_name_search_keys(first_name, surname):
+    """
+    Build the "first surname" and "surname first" search keys of a name.
+    """
+    first_name, surname = normalize_name(first_name), normalize_name(surname)
+    return (
+        " ".join(filter(None, (first_name, surname))),
+        " ".join(filter(None, (surname, first_name))),
+    )
+
+
+def backfill_search_names(apps, schema_editor):
+    """
+    Fill the name search keys of existing users.
+    """
+    CustomUser = apps.get_model("attendance", "CustomUser")
+    users = []
+    for user in CustomUser.objects.only("first_name", "surname").iterator(chunk_size=BATCH_SIZE):
+        user.search_name, user.search_name_reversed = get_name_search_keys(
+            user.first_name, user.surname
+        )
+        users.append(user)
+        if len(users) == BATCH_SIZE:
+            CustomUser.objects.bulk_update(users, ["search_name", "search_name_reversed"])
+            users = []
+    CustomUser.objects.bulk_update(users, ["search_name", "search_name_reversed"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_adminlog_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=201),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='search_name_reversed',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=201),
+        ),
+        migrations.RunPython(backfill_search_names, migrations.RunPython.noop),
+    ]
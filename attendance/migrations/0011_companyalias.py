@@ -0,0 +1,62 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The former hardcoded company groups and logos: (names, logo), first name primary
+COMPANY_GROUPS = (
+    (("ASC", "AgriDOM"), "agridom4.png"),
+    (("SFGCI", "SFGC"), "sfgroup.png"),
+    (("DJAS", "DSC"), "djas.png"),
+    (("FAC",), "farmtech.png"),
+    (("GTI",), "geniustech.png"),
+    (("SMI",), "sunfood.png"),
+)
+
+
+def seed_company_aliases(apps, schema_editor):
+    """
+    Create aliases for the former hardcoded company groups and logos.
+
+    Each group's names become aliases of its primary company (or of the first
+    existing company of the group). Groups with no existing company are
+    skipped; their aliases can be added in the admin once the company exists.
+    """
+    Company = apps.get_model("attendance", "Company")
+    CompanyAlias = apps.get_model("attendance", "CompanyAlias")
+
+    companies = {company.name.lower(): company for company in Company.objects.all()}
+    for names, logo in COMPANY_GROUPS:
+        company = next(
+            (companies[name.lower()] for name in names if name.lower() in companies), None
+        )
+        if company is None:
+            continue
+        for name in names:
+            if not CompanyAlias.objects.filter(alias__iexact=name).exists():
+                CompanyAlias.objects.create(alias=name, company=company, logo=logo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_customuser_search_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=100, unique=True)),
+                ('logo', models.CharField(blank=True, help_text='Logo filename under static/images/logos', max_length=100)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='attendance.company')),
+            ],
+            options={
+                'verbose_name_plural': 'Company Aliases',
+                'db_table': 'django_company_aliases',
+                'ordering': ['alias'],
+            },
+        ),
+        migrations.RunPython(seed_company_aliases, migrations.RunPython.noop),
+    ]
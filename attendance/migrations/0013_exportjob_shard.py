@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0012_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='shard',
+            field=models.CharField(blank=True, help_text='How the export is split into a zip of files, if at all', max_length=10),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.5 on 2026-10-18 21:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0013_exportjob_shard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Last progress or heartbeat of a running job'),
+            preserve_default=False,
+        ),
+    ]
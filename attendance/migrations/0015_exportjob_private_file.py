@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:57
+
+import attendance.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0014_exportjob_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='file',
+            field=models.FileField(blank=True, storage=attendance.storage.ExportStorage(), upload_to=attendance.storage.export_job_path),
+        ),
+    ]
@@ -1,12 +1,20 @@
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.core.validators import MinLengthValidator
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Max
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.forms import ValidationError
 from django.utils import timezone
-from .utils import create_default_time_preset, get_day_code
-import datetime as dt
+from . import companies  # noqa: F401 (connects the company map's invalidation signals)
+from . import export_cache  # noqa: F401 (connects the export cache's names version signals)
+from .auth_cache import get_cached_user
+from .events import publish_time_entry_event
+from .lateness import calculate_lateness
+from .storage import export_job_path, export_storage
+from .summaries import record_entry_change, stored_summary_state, summary_state
+from .utils import create_default_time_preset, get_name_search_keys, get_work_date
 
 
 class CustomUserManager(BaseUserManager):
@@ -112,6 +120,30 @@ class Company(models.Model):
         db_table = "django_companies"
 
 
+class CompanyAlias(models.Model):
+    """
+    Represents another name a company is known by, with its kiosk logo.
+
+    Company filters given an alias match the aliased company and any other
+    company of that name.
+    """
+    alias = models.CharField(max_length=100, unique=True)
+    company = models.ForeignKey(
+        Company, on_delete=models.CASCADE, related_name="aliases"
+    )
+    logo = models.CharField(
+        max_length=100, blank=True, help_text="Logo filename under static/images/logos"
+    )
+
+    def __str__(self):
+        return self.alias
+
+    class Meta:
+        verbose_name_plural = "Company Aliases"
+        ordering = ["alias"]
+        db_table = "django_company_aliases"
+
+
 class Department(models.Model):
     """
     Represents a department within a company.
@@ -178,6 +210,9 @@ class CustomUser(AbstractUser):
     is_guard = models.BooleanField(default=False)
     is_hr = models.BooleanField(default=False)
     if_first_login = models.BooleanField(default=True)
+    # Normalized "first surname" and "surname first", maintained by save()
+    search_name = models.CharField(max_length=201, default="", editable=False, db_index=True)
+    search_name_reversed = models.CharField(max_length=201, default="", editable=False, db_index=True)
 
     USERNAME_FIELD = "employee_id"
     REQUIRED_FIELDS = []
@@ -189,6 +224,10 @@ class CustomUser(AbstractUser):
         """
         Authenticate a user by employee ID and PIN.
 
+        The user is looked up through the authentication cache. Callers that
+        handle client requests should use auth_cache.authenticate_pin(), which
+        also applies the failed attempt limits.
+
         Args:
             employee_id (str): The employee ID.
             pin (str): The PIN.
@@ -198,23 +237,49 @@ class CustomUser(AbstractUser):
                 Returns a dict with status "first_login" and the user if it's the user's first login.
                 Returns None if authentication fails.
         """
-        try:
-            user = cls.objects.get(employee_id=employee_id)
-            if not user.is_active:
-                return None
-            if user.is_superuser:
-                if user.check_password(pin):
-                    return user
-            elif user.is_staff:
-                if user.pin == pin:
-                    return user
-            elif user.if_first_login and pin == "0000":
-                return {"status": "first_login", "user": user}
-            elif user.pin == pin:
-                return user
+        user = get_cached_user(employee_id)
+        if user is None:
             return None
-        except cls.DoesNotExist:
+        return user.check_pin(pin)
+
+    def check_pin(self, pin):
+        """
+        Check a PIN against this user without querying the database.
+
+        Args:
+            pin (str): The PIN.
+
+        Returns:
+            CustomUser or dict or None: The same result as authenticate_by_pin()
+                for this user.
+        """
+        if not self.is_active:
             return None
+        if self.is_superuser:
+            if self.check_password(pin):
+                return self
+        elif self.is_staff:
+            if self.pin == pin:
+                return self
+        elif self.if_first_login and pin == "0000":
+            return {"status": "first_login", "user": self}
+        elif self.pin == pin:
+            return self
+        return None
+
+    def save(self, *args, **kwargs):
+        """
+        Save the CustomUser object, refreshing its name search keys.
+        """
+        self.search_name, self.search_name_reversed = get_name_search_keys(
+            self.first_name, self.surname
+        )
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"first_name", "surname"} & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | {
+                "search_name", "search_name_reversed"
+            }
+        super().save(*args, **kwargs)
 
     def get_schedule_for_day(self, day_code):
         """
@@ -250,6 +315,8 @@ class TimeEntry(models.Model):
     minutes_late = models.IntegerField(default=0)
     last_modified = models.DateTimeField(auto_now=True)
     image_path = models.CharField(max_length=255, null=True, blank=True)
+    # Local date of time_in, stored so day filters can use an index
+    work_date = models.DateField(null=True, blank=True, editable=False)
 
     @property
     def date(self):
@@ -263,7 +330,9 @@ class TimeEntry(models.Model):
 
     def clock_out(self):
         """
-        Record the clock-out time and calculate hours worked and lateness.
+        Record the clock-out time and calculate hours worked.
+
+        Lateness is recalculated by clean() as part of save().
         """
         self.time_out = timezone.now()
 
@@ -271,130 +340,217 @@ class TimeEntry(models.Model):
             delta = self.time_out - self.time_in
             self.hours_worked = round(delta.total_seconds() / 3600, 2)
 
-        if self.time_in:
-            try:
-                time_in_local = self.time_in
-                day_code = get_day_code(time_in_local)
-
-                preset = self.user.get_schedule_for_day(day_code)
-                if preset:
-                    expected_start = preset.start_time
-                    grace_period = dt.datetime.timedelta(minutes=preset.grace_period_minutes)
-
-                    naive_expected_time = dt.datetime.combine(
-                        time_in_local.date(), expected_start
-                    )
-
-                    expected_start_dt = timezone.make_aware(naive_expected_time)
-                    expected_with_grace = expected_start_dt + grace_period
-
-                    if not timezone.is_aware(time_in_local):
-                        time_in_local = timezone.make_aware(time_in_local)
-
-                    self.is_late = time_in_local > expected_with_grace
-
-                    time_diff = time_in_local - expected_start_dt
-                    self.minutes_late = round(time_diff.total_seconds() / 60)
-                else:
-                    self.is_late = False
-                    self.minutes_late = 0
-            except Exception as e:
-                self.is_late = False
-                self.minutes_late = 0
-                print(f"Error in clock_out: {e}")
-
         self.save()
+        transaction.on_commit(lambda: publish_time_entry_event(self, "clock_out"))
 
     @classmethod
-    def clock_in(cls, user):
+    def clock_in(cls, user, image_path=None):
         """
         Record the clock-in time and calculate lateness.
 
+        The entry is written with a single insert; lateness is calculated by
+        clean() as part of save().
+
         Args:
             user (CustomUser): The user clocking in.
+            image_path (str, optional): The path of the captured kiosk image.
 
         Returns:
             TimeEntry: The created TimeEntry object.
         """
-        new_entry = cls.objects.create(user=user)
-        try:
-            time_in_local = new_entry.time_in
-            day_code = get_day_code(time_in_local)
-
-            preset = user.get_schedule_for_day(day_code)
-            if preset:
-                naive_expected_time = dt.datetime.combine(
-                    time_in_local.date(), preset.start_time
-                )
+        new_entry = cls(user=user, image_path=image_path)
+        new_entry.save()
+        transaction.on_commit(lambda: publish_time_entry_event(new_entry, "clock_in"))
+        return new_entry
 
-                expected_time = timezone.make_aware(naive_expected_time)
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Create an instance from a database row and remember its loaded values.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_loaded_values()
+        return instance
 
-                if not timezone.is_aware(time_in_local):
-                    time_in_local = timezone.make_aware(time_in_local)
+    def refresh_from_db(self, *args, **kwargs):
+        """
+        Reload the instance from the database and remember its loaded values.
+        """
+        super().refresh_from_db(*args, **kwargs)
+        self._snapshot_loaded_values()
 
-                grace_period = dt.timedelta(minutes=preset.grace_period_minutes)
-                expected_time_with_grace = expected_time + grace_period
+    def _snapshot_loaded_values(self):
+        """
+        Record the current value of every loaded field for dirty tracking.
+        """
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname not in deferred
+        }
 
-                new_entry.is_late = time_in_local > expected_time_with_grace
+    def get_dirty_fields(self):
+        """
+        Get the fields that changed since the instance was loaded or saved.
 
-                time_diff = time_in_local - expected_time
-                new_entry.minutes_late = round(time_diff.total_seconds() / 60)
-                new_entry.save()
-        except Exception as e:
-            new_entry.is_late = False
-            new_entry.minutes_late = 0
-            new_entry.save()
-            print(f"Error in clock_in: {e}")
+        Returns:
+            list or None: The attribute names of the changed fields, or None if
+                          the instance was not loaded from the database.
+        """
+        loaded_values = getattr(self, "_loaded_values", None)
+        if loaded_values is None:
+            return None
+        return [
+            name for name, value in loaded_values.items()
+            if getattr(self, name) != value
+        ]
 
-        return new_entry
+    def update_lateness(self):
+        """
+        Calculate is_late and minutes_late from time_in and the user's schedule.
+        """
+        if self.time_in and self.user_id:
+            self.is_late, self.minutes_late = calculate_lateness(
+                self.time_in, self.user.schedule_group_id
+            )
 
     def clean(self):
         """
         Validate entry and calculate derived values.
         """
         super().clean()
+        self.update_lateness()
+        if self.time_in:
+            self.work_date = get_work_date(self.time_in)
 
-        if self.time_in and hasattr(self, 'user') and self.user:
-            try:
-                time_in_local = self.time_in
+    def validate_constraints(self, exclude=None):
+        """
+        Validate constraints, checking work_date whenever time_in is validated.
 
-                if not timezone.is_aware(time_in_local):
-                    time_in_local = timezone.make_aware(time_in_local)
+        work_date is not editable, so forms always exclude it; it is derived
+        from time_in by clean(), so the one-entry-per-day constraint is still
+        checked when time_in is part of the form.
+        """
+        if exclude and "work_date" in exclude and "time_in" not in exclude:
+            exclude = set(exclude) - {"work_date"}
+        super().validate_constraints(exclude=exclude)
 
-                day_code = get_day_code(time_in_local)
+    def save(self, *args, **kwargs):
+        """
+        Save the TimeEntry object.
 
-                preset = self.user.get_schedule_for_day(day_code)
-                if preset:
-                    expected_start = preset.start_time
+        Lateness and work_date are only recalculated for new entries or when
+        time_in or user changed. Entries loaded from the database only write
+        their changed columns, and a save with no changes does not touch the
+        database. The entry's daily summary row is updated in the same
+        transaction.
+        """
+        dirty_fields = None if self._state.adding else self.get_dirty_fields()
+        if self._state.adding:
+            previous = None
+        elif dirty_fields is None:
+            previous = stored_summary_state(self.pk)
+        else:
+            previous = summary_state(self, loaded=True)
+        update_fields = kwargs.get("update_fields")
+
+        if (
+            dirty_fields is None
+            or "time_in" in dirty_fields
+            or "user_id" in dirty_fields
+        ):
+            self.update_lateness()
+            if self.time_in:
+                self.work_date = get_work_date(self.time_in)
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | {
+                    "is_late", "minutes_late", "work_date"
+                }
+            elif dirty_fields is not None:
+                dirty_fields = self.get_dirty_fields()
+
+        if dirty_fields is not None and update_fields is None and not args:
+            if not dirty_fields:
+                return
+            kwargs["update_fields"] = set(dirty_fields) | {"last_modified"}
+
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            record_entry_change(self, previous)
+        self._snapshot_loaded_values()
 
-                    naive_expected_time = dt.datetime.combine(
-                        time_in_local.date(), expected_start
-                    )
+    def __str__(self):
+        return f"{self.user.employee_id} - {self.user.first_name} {self.user.surname} - {self.time_in.strftime('%Y-%m-%d %H:%M:%S')}"
 
-                    expected_start_dt = timezone.make_aware(naive_expected_time)
+    class Meta:
+        verbose_name_plural = "Time Entries"
+        db_table = "django_time_entries"
+        indexes = [
+            # Today's entries, newest change first (kiosk list, dashboard)
+            models.Index(fields=["work_date", "last_modified"], name="time_entry_day_modified_idx"),
+            # A user's entries in time order (latest entry lookups)
+            models.Index(fields=["user", "time_in"], name="time_entry_user_time_in_idx"),
+            # Open shifts by day (forgotten clock-outs). Not a partial index:
+            # MySQL does not support them, and NULL time_out is a prefix lookup
+            models.Index(fields=["time_out", "work_date"], name="time_entry_open_shift_idx"),
+        ]
+        constraints = [
+            # One entry per user per day; also serves a user's entries on given days
+            models.UniqueConstraint(
+                fields=["user", "work_date"],
+                name="time_entry_user_day_unique",
+                violation_error_message="This user already has a time entry for this day.",
+            ),
+        ]
 
-                    time_diff = time_in_local - expected_start_dt
-                    self.minutes_late = round(time_diff.total_seconds() / 60)
 
-                    grace_period = dt.timedelta(minutes=preset.grace_period_minutes)
-                    expected_with_grace = expected_start_dt + grace_period
-                    self.is_late = time_in_local > expected_with_grace
-            except Exception as e:
-                print(f"Error calculating lateness in clean(): {e}")
+class DailyAttendanceSummary(models.Model):
+    """
+    Per-day attendance counts for a company and department.
 
-    def save(self, *args, **kwargs):
+    Rows are kept up to date incrementally with F() expressions as time
+    entries change (see attendance.summaries), so dashboards and reports read
+    one row per group instead of every entry. Entries are counted under their
+    user's current company and department.
+    """
+    date = models.DateField()
+    company = models.ForeignKey(
+        Company, on_delete=models.CASCADE, null=True, blank=True
+    )
+    department = models.ForeignKey(
+        Department, on_delete=models.CASCADE, null=True, blank=True
+    )
+    present_count = models.IntegerField(default=0)
+    late_count = models.IntegerField(default=0)
+    early_count = models.IntegerField(default=0)
+    total_minutes_late = models.IntegerField(default=0)
+    open_shifts = models.IntegerField(default=0)
+
+    @property
+    def average_minutes_late(self):
         """
-        Save the TimeEntry object.
+        Get the average lateness of the late entries.
+
+        Returns:
+            float: The average minutes late, or 0 if nobody was late.
         """
-        self.clean()
-        super().save(*args, **kwargs)
+        if not self.late_count:
+            return 0
+        return round(self.total_minutes_late / self.late_count, 1)
 
     def __str__(self):
-        return f"{self.user.employee_id} - {self.user.first_name} {self.user.surname} - {self.time_in.strftime('%Y-%m-%d %H:%M:%S')}"
+        return f"{self.date} - {self.company or 'No company'} - {self.department or 'No department'}"
 
     class Meta:
-        verbose_name_plural = "Time Entries"
-        db_table = "django_time_entries"
+        verbose_name_plural = "Daily Attendance Summaries"
+        db_table = "django_daily_attendance_summaries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "company", "department"],
+                name="daily_summary_group_unique",
+            ),
+        ]
 
 
 class Announcement(models.Model):
@@ -543,6 +699,10 @@ class AdminLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination walks (timestamp, id) newest first
+            models.Index(fields=['timestamp', 'id'], name='admin_log_timestamp_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.action} - {self.timestamp}"
@@ -613,4 +773,56 @@ class Leave(models.Model):
         return f"{self.employee}'s leave request from {self.start_date} to {self.end_date}"
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+class ExportJob(models.Model):
+    """
+    Represents a time entry export generated in the background.
+    """
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    )
+
+    requested_by = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, related_name='export_jobs'
+    )
+    filters = models.JSONField(default=dict, help_text="The AttendanceFilter of the exported entries")
+    export_format = models.CharField(max_length=5, default='xlsx')
+    shard = models.CharField(max_length=10, blank=True, help_text="How the export is split into a zip of files, if at all")
+    filename = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    rows_written = models.PositiveIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    file = models.FileField(upload_to=export_job_path, storage=export_storage, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, help_text="Last progress or heartbeat of a running job")
+
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Finding a user's active jobs and the pending jobs to resume
+            models.Index(fields=['status', 'created_at'], name='export_job_status_idx'),
+        ]
+
+
+@receiver(post_delete, sender=ExportJob)
+def delete_export_job_file(sender, instance, **kwargs):
+    """
+    Delete an export job's file along with the job.
+
+    Args:
+        sender: The model class that sent the signal.
+        instance (ExportJob): The deleted job.
+        **kwargs: Additional keyword arguments.
+    """
+    if instance.file:
+        instance.file.delete(save=False)
@@ -0,0 +1,210 @@
+"""
+Keyset (cursor) pagination for the admin list endpoints.
+
+Pages are addressed by the sort key of the row they continue from instead of
+an OFFSET, so every page is a bounded index range scan no matter how deep it
+is. Cursors are opaque URL-safe tokens carrying the direction and the sort
+key values; the ordering must end in a unique field (normally "id") so the
+key identifies exactly one position.
+
+Totals are optional. By default count_rows() serves the count of a filtered
+query from Django's cache for COUNT_CACHE_TTL seconds, so paging through a
+list costs at most one COUNT per filter combination; exact counts are only
+run when a client asks for them.
+"""
+import base64
+import hashlib
+import json
+from datetime import date, datetime
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# Seconds an estimated (non-exact) total is reused across pages
+COUNT_CACHE_TTL = 60
+
+DEFAULT_PAGE_SIZE = 50
+
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a pagination cursor cannot be decoded.
+    """
+
+
+def encode_cursor(direction, values):
+    """
+    Encode a pagination cursor.
+
+    Args:
+        direction (str): "next" to continue after the key, "prev" to continue
+                         before it.
+        values (list): The sort key values of the row to continue from.
+
+    Returns:
+        str: The opaque cursor.
+    """
+    values = [
+        value.isoformat() if isinstance(value, (date, datetime)) else value
+        for value in values
+    ]
+    payload = json.dumps([direction, values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, key_length):
+    """
+    Decode a pagination cursor.
+
+    Args:
+        cursor (str): The opaque cursor.
+        key_length (int): The number of fields in the sort key.
+
+    Returns:
+        tuple: (direction, values).
+
+    Raises:
+        InvalidCursor: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor("Invalid cursor") from exc
+
+    if direction not in ("next", "prev") or not isinstance(values, list) or len(values) != key_length:
+        raise InvalidCursor("Invalid cursor")
+    return direction, values
+
+
+def get_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """
+    Parse a requested page size, clamped to 1..MAX_PAGE_SIZE.
+
+    Args:
+        value (str): The requested size, or None.
+        default (int): The size to use if none or an invalid one was given.
+
+    Returns:
+        int: The page size.
+    """
+    try:
+        size = int(value) if value is not None else default
+    except ValueError:
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _flip(field):
+    return field[1:] if field.startswith("-") else f"-{field}"
+
+
+def _continue_from(ordering, values):
+    """
+    Build the filter for the rows that follow a key in the given ordering.
+
+    Args:
+        ordering (list): The fields, "-"-prefixed when descending.
+        values (list): The key values to continue from.
+
+    Returns:
+        Q: (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ..., with < for descending
+           fields.
+    """
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= Q(**equal, **{f"{name}__{lookup}": value})
+        equal[name] = value
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, limit=DEFAULT_PAGE_SIZE, key=None):
+    """
+    Get one page of a queryset by keyset pagination.
+
+    Args:
+        queryset (QuerySet): The filtered rows.
+        ordering (tuple): The sort key fields of the model, "-"-prefixed when
+                          descending, ending in a unique field.
+        cursor (str): A cursor from a previous page, or None for the first page.
+        limit (int): The page size.
+        key (callable): Returns a row's sort key values, e.g. for values_list
+                        rows; defaults to reading the ordering fields as
+                        attributes.
+
+    Returns:
+        tuple: (rows, next_cursor, prev_cursor); a cursor is None when there
+               is no page in that direction.
+
+    Raises:
+        InvalidCursor: If the cursor is malformed.
+    """
+    names = [field.lstrip("-") for field in ordering]
+    direction, values = "next", None
+    if cursor:
+        direction, values = decode_cursor(cursor, len(ordering))
+        try:
+            values = [
+                queryset.model._meta.get_field(name).to_python(value)
+                for name, value in zip(names, values)
+            ]
+        except ValidationError as exc:
+            raise InvalidCursor("Invalid cursor") from exc
+
+    backwards = direction == "prev"
+    order = [_flip(field) for field in ordering] if backwards else list(ordering)
+    queryset = queryset.order_by(*order)
+    if values is not None:
+        queryset = queryset.filter(_continue_from(order, values))
+
+    rows = list(queryset[: limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+
+    if key is None:
+        def key(row):
+            return [getattr(row, name) for name in names]
+
+    has_next = has_more if not backwards else True
+    has_prev = has_more if backwards else values is not None
+    next_cursor = encode_cursor("next", key(rows[-1])) if has_next else None
+    prev_cursor = encode_cursor("prev", key(rows[0])) if has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+def count_rows(queryset, exact=False):
+    """
+    Count the rows of a queryset, reusing a cached count unless exact.
+
+    Args:
+        queryset (QuerySet): The filtered rows.
+        exact (bool): If True, always run COUNT(*) and refresh the cache.
+
+    Returns:
+        tuple: (count, is_exact); is_exact is False when the count came from
+               the cache and may be up to COUNT_CACHE_TTL seconds old.
+    """
+    queryset = queryset.order_by()
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.md5(repr((sql, params)).encode(), usedforsecurity=False).hexdigest()
+    key = f"attendance:count:{queryset.model._meta.label_lower}:{digest}"
+
+    if not exact:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, False
+
+    count = queryset.count()
+    cache.set(key, count, COUNT_CACHE_TTL)
+    return count, True
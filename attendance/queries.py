@@ -0,0 +1,247 @@
+"""
+Shared queryset builders for the attendance list, dashboard, kiosk list and
+exports.
+
+An AttendanceFilter describes which time entries (or users) to return; the
+builders turn it into a queryset that only joins the tables its filters
+need. Consumers then ask for exactly the columns they render as
+values_list() tuples, so each list is one query regardless of its length
+and no model instances are built.
+"""
+from collections import namedtuple
+
+from django.db.models import Count, FloatField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .companies import resolve_company_ids
+from .models import CustomUser, TimeEntry
+from .utils import DEPARTMENT_CHOICES, name_search_q
+
+# Filter spec for time entries and users. work_date, date_from/date_to,
+# exclude_dates and modified_since only apply to time entries; company and
+# department are codes, names or aliases, or "all" (company None selects
+# users without a company); search is a name search term; is_active selects
+# active or inactive users (None for both).
+AttendanceFilter = namedtuple(
+    "AttendanceFilter",
+    [
+        "work_date",
+        "date_from",
+        "date_to",
+        "exclude_dates",
+        "employee_id",
+        "company",
+        "department",
+        "search",
+        "is_active",
+        "modified_since",
+    ],
+    defaults=(None, None, None, (), None, "all", "all", "", None, None),
+)
+
+# Columns of the kiosk attendance list, most recently modified first
+KIOSK_COLUMNS = (
+    "user__employee_id",
+    "user__first_name",
+    "user__surname",
+    "user__company__name",
+    "time_in",
+    "time_out",
+    "image_path",
+    "last_modified",
+)
+
+# Columns of the dashboard's top late and early lists
+DASHBOARD_COLUMNS = (
+    "user__employee_id",
+    "user__first_name",
+    "user__surname",
+    "user__company__name",
+    "time_in",
+    "time_out",
+    "minutes_late",
+    "is_late",
+)
+
+# Columns of the Excel exports
+EXPORT_COLUMNS = (
+    "id",
+    "user__employee_id",
+    "user__first_name",
+    "user__surname",
+    "user__company__name",
+    "time_in",
+    "time_out",
+    "hours_worked",
+    "is_late",
+)
+
+# Employee columns the payroll timesheet is grouped by
+TIMESHEET_COLUMNS = (
+    "user__employee_id",
+    "user__first_name",
+    "user__surname",
+    "user__company__name",
+)
+
+# Per-employee totals of the payroll timesheet, after TIMESHEET_COLUMNS;
+# early arrivals count the entries with negative minutes_late, as in the
+# daily attendance summaries
+TIMESHEET_TOTALS = {
+    "days_present": Count("work_date", distinct=True),
+    "total_hours_worked": Coalesce(Sum("hours_worked"), Value(0.0), output_field=FloatField()),
+    "late_count": Count("id", filter=Q(is_late=True)),
+    "total_minutes_late": Coalesce(Sum("minutes_late", filter=Q(is_late=True)), 0),
+    "early_count": Count("id", filter=Q(minutes_late__lt=0)),
+}
+
+# Columns of the admin time log; keyset paginated on (last_modified, id)
+TIME_LOG_COLUMNS = (
+    "last_modified",
+    "id",
+    "user__employee_id",
+    "user__first_name",
+    "user__surname",
+    "time_in",
+    "time_out",
+    "hours_worked",
+)
+
+# Columns of the admin user lists; keyset paginated on id
+USER_LIST_COLUMNS = ("id", "employee_id", "first_name", "surname")
+
+# Columns of the admin log; keyset paginated on (timestamp, id)
+ADMIN_LOG_COLUMNS = (
+    "id",
+    "timestamp",
+    "user__first_name",
+    "user__surname",
+    "user__employee_id",
+    "action",
+    "description",
+    "ip_address",
+)
+
+# Columns of the pending leave list
+LEAVE_COLUMNS = (
+    "id",
+    "employee__first_name",
+    "employee__surname",
+    "start_date",
+    "end_date",
+    "leave_type__name",
+    "reason",
+)
+
+
+def _user_filters(spec, prefix=""):
+    """
+    Build the user filters of a spec.
+
+    Args:
+        spec (AttendanceFilter): The filter spec.
+        prefix (str): The lookup path to the user, e.g. "user__".
+
+    Returns:
+        tuple: The keyword lookups (dict), and the name search filter (Q) or
+               None.
+    """
+    lookups = {}
+    if spec.employee_id:
+        lookups[f"{prefix}employee_id"] = spec.employee_id
+    if spec.is_active is not None:
+        lookups[f"{prefix}is_active"] = spec.is_active
+    if spec.company is None:
+        lookups[f"{prefix}company__isnull"] = True
+    elif spec.company != "all":
+        # By the IDs the code, name or alias refers to
+        lookups[f"{prefix}company_id__in"] = resolve_company_ids(spec.company)
+    if spec.department != "all":
+        lookups[f"{prefix}position__name"] = DEPARTMENT_CHOICES.get(
+            spec.department, spec.department
+        )
+    search = name_search_q(spec.search, prefix=prefix) if spec.search else None
+    return lookups, search
+
+
+def entry_queryset(spec):
+    """
+    Build the filtered time entry queryset of a spec.
+
+    Args:
+        spec (AttendanceFilter): The filter spec.
+
+    Returns:
+        QuerySet: The matching entries, with no columns or joins selected.
+    """
+    lookups, search = _user_filters(spec, prefix="user__")
+    if spec.work_date is not None:
+        lookups["work_date"] = spec.work_date
+    if spec.date_from is not None and spec.date_to is not None:
+        lookups["work_date__range"] = (spec.date_from, spec.date_to)
+    if spec.modified_since is not None:
+        lookups["last_modified__gt"] = spec.modified_since
+
+    queryset = TimeEntry.objects.filter(**lookups)
+    if search is not None:
+        queryset = queryset.filter(search)
+    if spec.exclude_dates:
+        queryset = queryset.exclude(work_date__in=spec.exclude_dates)
+    return queryset
+
+
+def entry_rows(spec, columns, ordering=()):
+    """
+    Get the matching time entries as tuples of the given columns.
+
+    Args:
+        spec (AttendanceFilter): The filter spec.
+        columns (tuple): The columns, e.g. EXPORT_COLUMNS.
+        ordering (tuple): The order_by() fields.
+
+    Returns:
+        QuerySet: A values_list queryset joining only the related tables the
+                  columns need.
+    """
+    return entry_queryset(spec).order_by(*ordering).values_list(*columns)
+
+
+def timesheet_rows(spec):
+    """
+    Get per-employee totals of the matching time entries.
+
+    The totals are computed by one grouped query, so only one row per
+    employee leaves the database.
+
+    Args:
+        spec (AttendanceFilter): The filter spec.
+
+    Returns:
+        QuerySet: A values_list queryset of TIMESHEET_COLUMNS followed by
+                  TIMESHEET_TOTALS, one row per employee, by employee ID.
+    """
+    return (
+        entry_queryset(spec)
+        .values(*TIMESHEET_COLUMNS)
+        .annotate(**TIMESHEET_TOTALS)
+        .order_by("user__employee_id")
+        .values_list(*TIMESHEET_COLUMNS, *TIMESHEET_TOTALS)
+    )
+
+
+def user_rows(spec, columns=USER_LIST_COLUMNS):
+    """
+    Get the matching users as tuples of the given columns.
+
+    Args:
+        spec (AttendanceFilter): The filter spec.
+        columns (tuple): The columns, e.g. USER_LIST_COLUMNS.
+
+    Returns:
+        QuerySet: A values_list queryset of the matching users.
+    """
+    lookups, search = _user_filters(spec)
+    queryset = CustomUser.objects.filter(**lookups)
+    if search is not None:
+        queryset = queryset.filter(search)
+    return queryset.values_list(*columns)
@@ -0,0 +1,154 @@
+"""
+Process-wide resolved schedule table.
+
+Maps (schedule_group_id, day_code) to an immutable SchedulePreset so that
+schedule resolution on the punch path costs no queries after warm-up. Users
+without a schedule group are looked up with a schedule_group_id of None.
+
+The table is rebuilt lazily after any ScheduleGroup, DayOverride or
+TimePreset is saved or deleted. Signals only reach the current process, so
+the table also expires after SCHEDULE_TABLE_TTL seconds to bound how long
+other worker processes can serve a stale schedule.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .utils import DAY_CODE_MAPPING, create_default_time_preset
+
+# Seconds before the table is rebuilt even without a local invalidation
+SCHEDULE_TABLE_TTL = 300
+
+SchedulePreset = namedtuple(
+    "SchedulePreset", ["start_time", "end_time", "grace_period_minutes"]
+)
+
+_lock = threading.Lock()
+_table = None
+_loaded_at = 0.0
+_generation = 0
+
+
+def _to_preset(time_preset):
+    """
+    Convert a TimePreset model instance to a SchedulePreset.
+
+    Args:
+        time_preset (TimePreset): The preset to convert, or None.
+
+    Returns:
+        SchedulePreset: The immutable preset, or None if no preset was given.
+    """
+    if time_preset is None:
+        return None
+    return SchedulePreset(
+        time_preset.start_time,
+        time_preset.end_time,
+        time_preset.grace_period_minutes,
+    )
+
+
+def _load_schedule_table():
+    """
+    Build the full schedule table with two queries.
+
+    Returns:
+        dict: Mapping of (schedule_group_id, day_code) to SchedulePreset or None.
+    """
+    from .models import DayOverride, ScheduleGroup  # Import here to avoid circular imports
+
+    defaults = {
+        day_code: _to_preset(create_default_time_preset(day_code))
+        for day_code in DAY_CODE_MAPPING.values()
+    }
+    table = {(None, day_code): preset for day_code, preset in defaults.items()}
+
+    for group in ScheduleGroup.objects.select_related("default_schedule"):
+        group_default = _to_preset(group.default_schedule)
+        for day_code, preset in defaults.items():
+            table[(group.id, day_code)] = group_default or preset
+
+    for override in DayOverride.objects.select_related("time_preset"):
+        table[(override.schedule_group_id, override.day)] = _to_preset(
+            override.time_preset
+        )
+
+    return table
+
+
+def get_schedule_table():
+    """
+    Get the resolved schedule table, building it if needed.
+
+    Returns:
+        dict: Mapping of (schedule_group_id, day_code) to SchedulePreset or None.
+    """
+    global _table, _loaded_at
+
+    table = _table
+    if table is not None and time.monotonic() - _loaded_at < SCHEDULE_TABLE_TTL:
+        return table
+
+    generation = _generation
+    table = _load_schedule_table()
+    with _lock:
+        # Only publish the table if nothing was invalidated while it was loading
+        if generation == _generation:
+            _table = table
+            _loaded_at = time.monotonic()
+    return table
+
+
+def resolve_schedule(schedule_group_id, day_code):
+    """
+    Resolve the schedule for a schedule group on a given day.
+
+    Args:
+        schedule_group_id (int): The schedule group ID, or None for the default schedule.
+        day_code (str): The day code (e.g., 'mon', 'tue', 'wed').
+
+    Returns:
+        SchedulePreset: The (start_time, end_time, grace_period_minutes) tuple,
+                        or None if a day override has no preset.
+    """
+    table = get_schedule_table()
+    key = (schedule_group_id, day_code)
+    if key in table:
+        return table[key]
+    return table[(None, day_code)]
+
+
+def invalidate_schedule_table():
+    """
+    Discard the resolved schedule table so it is rebuilt on next use.
+    """
+    global _table, _generation
+
+    with _lock:
+        _table = None
+        _generation += 1
+
+
+@receiver(post_save, sender="attendance.ScheduleGroup")
+@receiver(post_delete, sender="attendance.ScheduleGroup")
+@receiver(post_save, sender="attendance.DayOverride")
+@receiver(post_delete, sender="attendance.DayOverride")
+@receiver(post_save, sender="attendance.TimePreset")
+@receiver(post_delete, sender="attendance.TimePreset")
+def schedule_changed(sender, **kwargs):
+    """
+    Invalidate the schedule table when a schedule model changes.
+
+    The table is invalidated immediately and again once the transaction
+    commits, so a rebuild that ran before the commit is not kept.
+
+    Args:
+        sender: The model class that sent the signal.
+        **kwargs: Additional keyword arguments.
+    """
+    invalidate_schedule_table()
+    transaction.on_commit(invalidate_schedule_table)
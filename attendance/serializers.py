@@ -0,0 +1,238 @@
+"""
+Fast row serialization for the JSON endpoints.
+
+List endpoints read values_list() tuples instead of model instances and
+format them with the row formatters below, which unpack each tuple once and
+format dates and times with f-strings and a precomputed clock time table
+instead of calling strftime() per value. Responses are encoded with orjson.
+"""
+import orjson
+from django.http import HttpResponse
+
+# "%I:%M %p" for every minute of the day, indexed by hour * 60 + minute
+_CLOCK_TIMES = tuple(
+    f"{hour % 12 or 12:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+    for hour in range(24)
+    for minute in range(60)
+)
+
+
+def clock_time(value):
+    """
+    Format a time of day as "%I:%M %p" (e.g. "08:05 AM").
+
+    Args:
+        value (datetime or time): The value to format, or None.
+
+    Returns:
+        str: The formatted time, or None if no value was given.
+    """
+    if value is None:
+        return None
+    return _CLOCK_TIMES[value.hour * 60 + value.minute]
+
+
+def day_time(value):
+    """
+    Format a time of day as "%H:%M:%S".
+
+    Args:
+        value (datetime or time): The value to format.
+
+    Returns:
+        str: The formatted time.
+    """
+    return f"{value.hour:02d}:{value.minute:02d}:{value.second:02d}"
+
+
+def iso_date(value):
+    """
+    Format a date as "%Y-%m-%d".
+
+    Args:
+        value (date or datetime): The value to format.
+
+    Returns:
+        str: The formatted date.
+    """
+    return f"{value.year:04d}-{value.month:02d}-{value.day:02d}"
+
+
+def date_time(value):
+    """
+    Format a datetime as "%Y-%m-%d %H:%M:%S".
+
+    Args:
+        value (datetime): The value to format, or None.
+
+    Returns:
+        str: The formatted datetime, or "" if no value was given.
+    """
+    if value is None:
+        return ""
+    return f"{iso_date(value)} {day_time(value)}"
+
+
+def full_name(first_name, surname):
+    """
+    Join a first name and surname, skipping missing parts.
+
+    Args:
+        first_name (str): The first name, or None.
+        surname (str): The surname, or None.
+
+    Returns:
+        str: The full name.
+    """
+    return f"{first_name or ''} {surname or ''}".strip()
+
+
+def kiosk_row(row):
+    """
+    Format a row of queries.KIOSK_COLUMNS for the kiosk attendance list.
+
+    Args:
+        row (tuple): The values_list row.
+
+    Returns:
+        dict: The kiosk list entry.
+    """
+    employee_id, first_name, surname, company, time_in, time_out, image_path, _ = row
+    return {
+        "employee_id": employee_id,
+        "first_name": first_name,
+        "surname": surname,
+        "company": company or "",
+        "time_in": clock_time(time_in),
+        "time_out": clock_time(time_out),
+        "image_path": image_path,
+    }
+
+
+def dashboard_row(row):
+    """
+    Format a row of queries.DASHBOARD_COLUMNS for the dashboard's top lists.
+
+    Args:
+        row (tuple): The values_list row.
+
+    Returns:
+        dict: The dashboard entry; users without a name are shown by ID.
+    """
+    employee_id, first_name, surname, company, time_in, time_out, minutes_late, is_late = row
+    return {
+        "employee_id": employee_id,
+        "name": full_name(first_name, surname) or f"User {employee_id}",
+        "company": company or "",
+        "time_in": clock_time(time_in),
+        "time_out": clock_time(time_out),
+        "minutes_diff": minutes_late,
+        "is_late": is_late,
+    }
+
+
+def time_log_row(row):
+    """
+    Format a row of queries.TIME_LOG_COLUMNS for the admin time log.
+
+    Args:
+        row (tuple): The values_list row.
+
+    Returns:
+        dict: The time log entry.
+    """
+    _, _, employee_id, first_name, surname, time_in, time_out, hours_worked = row
+    return {
+        "employee_id": employee_id,
+        "name": f"{first_name} {surname}",
+        "time_in": date_time(time_in),
+        "time_out": date_time(time_out),
+        "hours_worked": hours_worked,
+    }
+
+
+def user_row(row):
+    """
+    Format a row of queries.USER_LIST_COLUMNS for the admin user lists.
+
+    Args:
+        row (tuple): The values_list row.
+
+    Returns:
+        dict: The user list entry.
+    """
+    _, employee_id, first_name, surname = row
+    return {"employee_id": employee_id, "name": f"{first_name} {surname}"}
+
+
+def admin_log_row(row, action_labels):
+    """
+    Format a row of queries.ADMIN_LOG_COLUMNS for the admin log.
+
+    Args:
+        row (tuple): The values_list row.
+        action_labels (dict): The display label of each action.
+
+    Returns:
+        dict: The admin log entry.
+    """
+    _, timestamp, first_name, surname, employee_id, action, description, ip_address = row
+    return {
+        "user": f"{first_name} {surname}",
+        "employee_id": employee_id,
+        "action": action_labels.get(action, action),
+        "description": description,
+        "timestamp": f"{iso_date(timestamp)} {clock_time(timestamp)}",
+        "ip_address": ip_address or "Unknown",
+    }
+
+
+def leave_row(row):
+    """
+    Format a row of queries.LEAVE_COLUMNS for the pending leave list.
+
+    Args:
+        row (tuple): The values_list row.
+
+    Returns:
+        dict: The pending leave entry.
+    """
+    leave_id, first_name, surname, start_date, end_date, leave_type, reason = row
+    return {
+        "id": leave_id,
+        "employee_name": f"{first_name} {surname}",
+        "start_date": iso_date(start_date),
+        "end_date": iso_date(end_date),
+        "duration": (end_date - start_date).days + 1,
+        "leave_type": leave_type or "N/A",
+        "reason": reason,
+    }
+
+
+def dumps(data):
+    """
+    Encode data as JSON with orjson.
+
+    Args:
+        data: The data to encode.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON.
+    """
+    return orjson.dumps(data)
+
+
+class FastJsonResponse(HttpResponse):
+    """
+    A JSON response encoded with dumps(), for endpoints returning long lists.
+    """
+    def __init__(self, data, **kwargs):
+        """
+        Initialize the response.
+
+        Args:
+            data: The data to encode.
+            **kwargs: Additional HttpResponse arguments.
+        """
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=dumps(data), **kwargs)
@@ -0,0 +1,366 @@
+"""
+Service layer for kiosk clock-in and clock-out punches.
+
+These functions keep the number of database queries per punch constant,
+no matter how many people have already punched in for the day.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .auth_cache import THROTTLED_MESSAGE, is_throttled, record_failed_attempt
+from .events import publish_time_entry_event
+from .lateness import compute_lateness
+from .models import CustomUser, TimeEntry
+from .queries import KIOSK_COLUMNS, AttendanceFilter, entry_rows
+from .serializers import kiosk_row
+from .summaries import add_entry_change, apply_summary_deltas, new_deltas, summary_state
+from .utils import get_work_date
+
+# Maximum number of buffered punches accepted in one bulk request
+MAX_BULK_PUNCHES = 500
+
+# How far ahead of the server clock a buffered punch may be stamped
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+class ClockInError(Exception):
+    """
+    Raised when a clock-in punch cannot be recorded.
+    """
+
+
+def clock_in_user(user, image_path=None):
+    """
+    Record a clock-in punch for an already authenticated user.
+
+    The entry is inserted straight away; the unique (user, work_date)
+    constraint rejects a second punch for the same day, even from concurrent
+    kiosks, and the conflict is reported as an error. Only a successful punch
+    checks whether yesterday's entry was left open.
+
+    Args:
+        user (CustomUser): The authenticated user clocking in.
+        image_path (str, optional): The path of the captured kiosk image.
+
+    Returns:
+        tuple: The created TimeEntry and a warning message (or None).
+
+    Raises:
+        ClockInError: If the user has already clocked in today.
+    """
+    try:
+        with transaction.atomic():
+            entry = TimeEntry.clock_in(user, image_path=image_path)
+    except IntegrityError:
+        raise ClockInError("You have already clocked in today")
+
+    forgot_clock_out = TimeEntry.objects.filter(
+        user=user,
+        work_date=entry.work_date - timedelta(days=1),
+        time_out__isnull=True,
+    ).exists()
+
+    warning_message = None
+    if forgot_clock_out:
+        warning_message = "Clock in successful! However, you forgot to clock out yesterday."
+
+    return entry, warning_message
+
+
+def encode_cursor(last_modified):
+    """
+    Encode a change cursor for the kiosk attendance list.
+
+    Args:
+        last_modified (datetime): The newest last_modified value the client has seen.
+
+    Returns:
+        str: The opaque cursor string, or None if there is nothing to encode.
+    """
+    if last_modified is None:
+        return None
+    return last_modified.isoformat()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a change cursor produced by encode_cursor().
+
+    Args:
+        cursor (str): The cursor string sent back by the client.
+
+    Returns:
+        datetime: The decoded timestamp, or None if the cursor is missing or invalid.
+    """
+    if not cursor:
+        return None
+    try:
+        return parse_datetime(cursor)
+    except ValueError:
+        return None
+
+
+def get_attendance_list(work_date, since=None):
+    """
+    Build the kiosk attendance list for a day in a single query.
+
+    When a change cursor is given, only the entries created or changed after
+    it are returned. A missing, invalid or stale cursor (from a previous day)
+    returns the full list so the client can rebuild its table.
+
+    Args:
+        work_date (date): The day to list.
+        since (str, optional): The change cursor returned by a previous call.
+
+    Returns:
+        dict: A dictionary with the "entries" list (most recently modified
+              first), the new "cursor", and "full" indicating whether the list
+              replaces the client's table or should be merged into it.
+    """
+    since_dt = decode_cursor(since)
+    full = since_dt is None or get_work_date(since_dt) < work_date
+
+    spec = AttendanceFilter(
+        work_date=work_date, modified_since=None if full else since_dt
+    )
+    rows = list(entry_rows(spec, KIOSK_COLUMNS, ordering=("-last_modified",)))
+
+    entries = [kiosk_row(row) for row in rows]
+    # Rows are newest first, and all newer than the client's cursor
+    newest = rows[0][-1] if rows else (None if full else since_dt)
+
+    return {"entries": entries, "cursor": encode_cursor(newest), "full": full}
+
+
+def _parse_punch_timestamp(value):
+    """
+    Parse a client punch timestamp into the server's datetime convention.
+
+    Args:
+        value (str): An ISO 8601 timestamp.
+
+    Returns:
+        datetime: The parsed timestamp (aware if USE_TZ is enabled, naive local
+                  time otherwise), or None if it cannot be parsed.
+    """
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        return None
+    if parsed is None:
+        return None
+
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        return timezone.make_aware(parsed)
+    if not settings.USE_TZ and timezone.is_aware(parsed):
+        return timezone.make_naive(parsed)
+    return parsed
+
+
+def ingest_punches(events, ip_address=None):
+    """
+    Validate and record a batch of buffered kiosk punches.
+
+    Users are resolved with one query and their entries for the affected days
+    with another. Punches are applied in timestamp order, and all new and
+    changed entries are written with bulk_create/bulk_update in a single
+    transaction. A punch that was already recorded with the same timestamp
+    (e.g. a kiosk replaying a batch whose response was lost) is reported as
+    a successful duplicate.
+
+    Args:
+        events (list): Dictionaries with "type" ("clock_in" or "clock_out"),
+                       "employee_id", "pin", "timestamp" and an optional
+                       "image_path".
+        ip_address (str, optional): The kiosk's IP address, used by the
+                                    failed PIN attempt limiter.
+
+    Returns:
+        list: One result dictionary per event, in input order, with "index",
+              "success", and either "error" or "duplicate".
+    """
+    results = [None] * len(events)
+    now = timezone.now()
+    valid = []
+
+    for index, event in enumerate(events):
+        if not isinstance(event, dict):
+            results[index] = {"index": index, "success": False, "error": "Invalid event"}
+            continue
+
+        punch_type = event.get("type")
+        timestamp = _parse_punch_timestamp(event.get("timestamp"))
+        if punch_type not in ("clock_in", "clock_out"):
+            error = "Invalid event type"
+        elif not event.get("employee_id"):
+            error = "Employee ID is required"
+        elif timestamp is None:
+            error = "Invalid timestamp"
+        elif timestamp > now + MAX_CLOCK_SKEW:
+            error = "Timestamp is in the future"
+        else:
+            error = None
+
+        if error:
+            results[index] = {"index": index, "success": False, "error": error}
+        else:
+            valid.append((timestamp, index, punch_type, event))
+
+    if not valid:
+        return results
+
+    users = {
+        user.employee_id: user
+        for user in CustomUser.objects.select_related("company").filter(
+            employee_id__in={str(event["employee_id"]) for _, _, _, event in valid}
+        )
+    }
+
+    authenticated = []
+    for timestamp, index, punch_type, event in valid:
+        employee_id = str(event["employee_id"])
+        if is_throttled(employee_id):
+            results[index] = {"index": index, "success": False, "error": THROTTLED_MESSAGE}
+            continue
+
+        user = users.get(employee_id)
+        auth_result = user.check_pin(event.get("pin")) if user else None
+        if user is None:
+            error = "Employee ID not found"
+        elif isinstance(auth_result, dict):
+            error = "first_login"
+        elif not auth_result:
+            error = "Incorrect PIN"
+        else:
+            error = None
+
+        if error in ("Employee ID not found", "Incorrect PIN"):
+            if record_failed_attempt(employee_id, ip_address):
+                error = THROTTLED_MESSAGE
+
+        if error:
+            results[index] = {"index": index, "success": False, "error": error}
+        else:
+            authenticated.append((timestamp, index, punch_type, event, user))
+
+    if not authenticated:
+        return results
+
+    try:
+        _apply_punches(authenticated, results, now)
+    except IntegrityError:
+        # Another kiosk created one of these entries after it was read; apply
+        # the batch again against the current entries
+        _apply_punches(authenticated, results, now)
+    return results
+
+
+def _apply_punches(authenticated, results, now):
+    """
+    Apply authenticated punches to the affected days' entries in one transaction.
+
+    Args:
+        authenticated (list): (timestamp, index, punch_type, event, user) tuples.
+        results (list): The per-event results, filled in by index.
+        now (datetime): The time the batch was received.
+
+    Raises:
+        IntegrityError: If a concurrent punch created an entry for the same
+                        user and day; nothing is written in that case.
+    """
+    first_day = min(get_work_date(timestamp) for timestamp, *_ in authenticated)
+    last_day = max(get_work_date(timestamp) for timestamp, *_ in authenticated)
+
+    users_by_pk = {user.pk: user for *_, user in authenticated}
+    entries_by_day = {}
+    existing = TimeEntry.objects.filter(
+        user__in=users_by_pk.keys(),
+        work_date__range=(first_day, last_day),
+    ).order_by("time_in")
+    for entry in existing:
+        entry.user = users_by_pk[entry.user_id]
+        entries_by_day.setdefault((entry.user_id, entry.work_date), entry)
+
+    to_create = []
+    to_update = {}
+
+    with transaction.atomic():
+        for timestamp, index, punch_type, event, user in sorted(
+            authenticated, key=lambda item: (item[0], item[1])
+        ):
+            key = (user.pk, get_work_date(timestamp))
+            entry = entries_by_day.get(key)
+            result = {"index": index, "success": True}
+
+            if punch_type == "clock_in":
+                if entry is None:
+                    entry = TimeEntry(
+                        user=user,
+                        time_in=timestamp,
+                        work_date=key[1],
+                        image_path=event.get("image_path"),
+                    )
+                    entries_by_day[key] = entry
+                    to_create.append(entry)
+                elif entry.time_in == timestamp:
+                    result["duplicate"] = True
+                else:
+                    result = {
+                        "index": index,
+                        "success": False,
+                        "error": "You have already clocked in today",
+                    }
+            elif entry is None:
+                result = {"index": index, "success": False, "error": "No active clock in found."}
+            elif entry.time_out is not None:
+                if entry.time_out == timestamp:
+                    result["duplicate"] = True
+                else:
+                    result = {"index": index, "success": False, "error": "No active clock in found."}
+            elif timestamp < entry.time_in:
+                result = {"index": index, "success": False, "error": "Clock out is before clock in"}
+            else:
+                entry.time_out = timestamp
+                entry.hours_worked = round((timestamp - entry.time_in).total_seconds() / 3600, 2)
+                entry.last_modified = now
+                if entry.pk is not None:
+                    to_update[entry.pk] = entry
+
+            results[index] = result
+
+        lateness = compute_lateness(
+            (entry.time_in, entry.user.schedule_group_id) for entry in to_create
+        )
+        for entry, (is_late, minutes_late) in zip(to_create, lateness):
+            entry.is_late = is_late
+            entry.minutes_late = minutes_late
+
+        if to_create:
+            TimeEntry.objects.bulk_create(to_create)
+        if to_update:
+            TimeEntry.objects.bulk_update(
+                list(to_update.values()), ["time_out", "hours_worked", "last_modified"]
+            )
+
+        # bulk_create/bulk_update skip save(), so update the summaries here
+        deltas = new_deltas()
+        for entry in to_create:
+            add_entry_change(deltas, entry)
+        for entry in to_update.values():
+            add_entry_change(deltas, entry, summary_state(entry, loaded=True))
+        apply_summary_deltas(deltas)
+
+        for entry in to_create:
+            transaction.on_commit(
+                lambda entry=entry: publish_time_entry_event(entry, "clock_in")
+            )
+        for entry in to_update.values():
+            transaction.on_commit(
+                lambda entry=entry: publish_time_entry_event(entry, "clock_out")
+            )
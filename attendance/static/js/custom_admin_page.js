@@ -1,9 +1,9 @@
-let logPage = 1;
+let logCursor = null;
 const logsPerPage = 50;
 let isLoadingLogs = false;
 let hasMoreLogs = true;
 
-let attendancePage = 1;
+let attendanceCursor = null;
 const attendancePerPage = 50;
 let isLoadingAttendance = false;
 let hasMoreAttendance = true;
@@ -87,12 +87,9 @@ function loadDashboardData() {
     .then((response) => response.json())
     .then((data) => {
       document.getElementById("total-time-in").textContent =
-        data.today_entries.length;
-
-      const timeOutCount = data.today_entries.filter(
-        (entry) => entry.time_out
-      ).length;
-      document.getElementById("total-time-out").textContent = timeOutCount;
+        data.total_time_in;
+      document.getElementById("total-time-out").textContent =
+        data.total_time_out;
 
       document.getElementById("total-late-count").textContent = data.late_count;
 
@@ -177,7 +174,7 @@ function loadLogData(filtered = false, reset = false) {
   if (isLoadingLogs && !reset) return;
 
   if (reset || filtered) {
-    logPage = 1;
+    logCursor = null;
     hasMoreLogs = true;
     document.getElementById("log_rectangle").innerHTML = "";
   }
@@ -196,7 +193,8 @@ function loadLogData(filtered = false, reset = false) {
   }
   loadingSpinner.classList.add("visible");
 
-  let url = `/get_logs/?page=${logPage}&limit=${logsPerPage}`;
+  let url = `/get_logs/?limit=${logsPerPage}`;
+  if (logCursor) url += `&cursor=${encodeURIComponent(logCursor)}`;
 
   if (filtered) {
     const searchQuery = document.getElementById("log-search").value;
@@ -241,7 +239,7 @@ function loadLogData(filtered = false, reset = false) {
         container.appendChild(table);
       }
 
-      if (logPage === 1 && (!data.logs || data.logs.length === 0)) {
+      if (!logCursor && (!data.logs || data.logs.length === 0)) {
         container.innerHTML = "<p>No logs found.</p>";
         hasMoreLogs = false;
         isLoadingLogs = false;
@@ -268,9 +266,9 @@ function loadLogData(filtered = false, reset = false) {
           tbody.appendChild(row);
         });
 
-        hasMoreLogs = data.logs.length === logsPerPage;
+        hasMoreLogs = Boolean(data.next);
 
-        logPage++;
+        logCursor = data.next;
       } else {
         hasMoreLogs = false;
       }
@@ -754,6 +752,8 @@ document.addEventListener("DOMContentLoaded", function () {
     if (employeeId) {
       url += `&employee_id=${encodeURIComponent(employeeId)}`;
     }
+    const exportFormat = document.getElementById("modal_export_format").value;
+    url += `&format=${encodeURIComponent(exportFormat)}`;
     window.location.href = url;
   });
 
@@ -782,20 +782,80 @@ document.addEventListener("DOMContentLoaded", function () {
       .getElementById("modal_export_employee_id")
       .value.trim();
 
-    let url = `/export_time_entries_range/?date_start=${encodeURIComponent(
-      startDate
-    )}&date_end=${encodeURIComponent(endDate)}`;
-    excludedDates.forEach((date) => {
-      url += `&exclude_date=${encodeURIComponent(date)}`;
-    });
+    // Timesheets are one row per employee, so they are downloaded directly
+    if (document.getElementById("modal_export_kind").value === "timesheet") {
+      const params = new URLSearchParams({
+        date_start: startDate,
+        date_end: endDate,
+        format: document.getElementById("modal_export_format").value,
+      });
+      excludedDates.forEach((date) => params.append("exclude_date", date));
+      if (employeeId) {
+        params.append("employee_id", employeeId);
+      }
+      window.location.href = `/export_timesheet/?${params}`;
+      return;
+    }
+
+    const formData = new FormData();
+    formData.append("date_start", startDate);
+    formData.append("date_end", endDate);
+    excludedDates.forEach((date) => formData.append("exclude_date", date));
     if (employeeId) {
-      url += `&employee_id=${encodeURIComponent(employeeId)}`;
+      formData.append("employee_id", employeeId);
+    }
+    formData.append(
+      "format",
+      document.getElementById("modal_export_format").value
+    );
+    const shard = document.getElementById("modal_export_shard").value;
+    if (shard) {
+      formData.append("shard", shard);
     }
 
-    window.location.href = url;
+    // Range exports run as background jobs; poll until the file is ready
+    exportDateRangeSubmit.disabled = true;
+    fetch("/export_jobs/", {
+      method: "POST",
+      headers: { "X-CSRFToken": getCookie("csrftoken") },
+      body: formData,
+    })
+      .then((response) =>
+        response.json().then((job) => {
+          if (!response.ok) {
+            throw new Error(job.error || "Export failed");
+          }
+          return pollExportJob(job, exportDateRangeSubmit);
+        })
+      )
+      .catch((error) => {
+        exportDateRangeSubmit.disabled = false;
+        exportDateRangeSubmit.textContent = "Export";
+        alert(error.message);
+      });
   });
 });
 
+function pollExportJob(job, button) {
+  if (job.status === "DONE") {
+    button.disabled = false;
+    button.textContent = "Export";
+    window.location.href = job.download_url;
+    return;
+  }
+  if (job.status === "FAILED") {
+    throw new Error(job.error || "Export failed");
+  }
+
+  button.textContent = job.total_rows
+    ? `Exporting... ${job.rows_written} / ${job.total_rows} rows`
+    : "Exporting...";
+  return new Promise((resolve) => setTimeout(resolve, 2000))
+    .then(() => fetch(job.status_url))
+    .then((response) => response.json())
+    .then((nextJob) => pollExportJob(nextJob, button));
+}
+
 function loadPendingLeaves() {
   fetch("/leaves/pending/")
     .then((response) => response.json())
@@ -907,7 +967,7 @@ document.addEventListener("DOMContentLoaded", function () {
 
 function filterAttendance(reset = false) {
   if (reset) {
-    attendancePage = 1;
+    attendanceCursor = null;
     hasMoreAttendance = true;
     document.getElementById("attendance_rectangle").innerHTML = "";
   }
@@ -941,9 +1001,9 @@ function filterAttendance(reset = false) {
     attendance_company: companyElem.value,
     attendance_department: departmentElem.value,
     search: searchElem.value,
-    page: attendancePage,
     limit: attendancePerPage,
   });
+  if (attendanceCursor) params.append("cursor", attendanceCursor);
 
   fetch(`/attendance_list_json/?${params}`)
     .then((response) => {
@@ -997,7 +1057,7 @@ function filterAttendance(reset = false) {
       }
 
       if (
-        attendancePage === 1 &&
+        !attendanceCursor &&
         (!data.attendance_list || data.attendance_list.length === 0)
       ) {
         container.innerHTML = "<p>No records found.</p>";
@@ -1046,8 +1106,8 @@ function filterAttendance(reset = false) {
           tbody.appendChild(row);
         });
 
-        hasMoreAttendance = data.attendance_list.length === attendancePerPage;
-        attendancePage++;
+        hasMoreAttendance = Boolean(data.next);
+        attendanceCursor = data.next;
       } else {
         hasMoreAttendance = false;
       }
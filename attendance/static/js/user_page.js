@@ -117,12 +117,11 @@ function dataURItoBlob(dataURI) {
 }
 
 /**
- * Adds an attendance item to the attendance list.
+ * Builds a table row for an attendance entry.
  * @param {object} data The attendance data.
+ * @returns {HTMLTableRowElement} The table row.
  */
-function addAttendanceItem(data) {
-  const tbody = document.getElementById("attendance-items");
-
+function buildAttendanceRow(data) {
   const row = document.createElement("tr");
   row.setAttribute("data-employee-id", data.employee_id);
 
@@ -135,32 +134,47 @@ function addAttendanceItem(data) {
     <td>${data.time_out || ""}</td>
   `;
 
-  tbody.append(row);
+  return row;
 }
 
+/**
+ * The change cursor returned by the last attendance list response.
+ */
+let attendanceCursor = null;
+
 /**
  * Updates the attendance list with new data.
- * @param {array} attendanceList The new attendance data.
+ *
+ * A full list replaces the table. Otherwise the list only holds the entries
+ * that changed since the last cursor, and they are moved to the top.
+ * @param {array} attendanceList The new attendance data, most recent first.
+ * @param {boolean} full Whether the list replaces the whole table.
+ * @param {string|null} cursor The new change cursor.
  */
-function updateAttendanceList(attendanceList) {
+function updateAttendanceList(attendanceList, full = true, cursor = null) {
   const tbody = document.getElementById("attendance-items");
-  tbody.innerHTML = "";
-
-  attendanceList.forEach((data) => {
-    const row = document.createElement("tr");
-    row.setAttribute("data-employee-id", data.employee_id);
-
-    row.innerHTML = `
-      <td>${data.employee_id || ""}</td>
-      <td>${data.first_name || ""}</td>
-      <td>${data.surname || ""}</td>
-      <td>${data.company || ""}</td>
-      <td>${data.time_in || ""}</td>
-      <td>${data.time_out || ""}</td>
-    `;
-
-    tbody.append(row);
-  });
+
+  if (full) {
+    tbody.innerHTML = "";
+    attendanceList.forEach((data) => tbody.append(buildAttendanceRow(data)));
+  } else {
+    attendanceList
+      .slice()
+      .reverse()
+      .forEach((data) => {
+        const existing = tbody.querySelector(
+          `tr[data-employee-id="${data.employee_id}"]`
+        );
+        if (existing) {
+          existing.remove();
+        }
+        tbody.prepend(buildAttendanceRow(data));
+      });
+  }
+
+  if (full || cursor) {
+    attendanceCursor = cursor;
+  }
 }
 
 /**
@@ -301,6 +315,7 @@ clockInForm.addEventListener("submit", (e) => {
               employee_id,
               pin,
               image_path: filePath,
+              since: attendanceCursor,
             }),
           });
         })
@@ -310,7 +325,6 @@ clockInForm.addEventListener("submit", (e) => {
             alert("Clock In Error: " + data.error);
             return;
           }
-          addAttendanceItem(data);
           alert("Clock In successful!");
           if (data.warning) {
             alert(data.warning);
@@ -318,7 +332,7 @@ clockInForm.addEventListener("submit", (e) => {
           updatePartnerLogo(data.new_logo);
           clockInModal.style.display = "none";
           clockInForm.reset();
-          updateAttendanceList(data.attendance_list);
+          updateAttendanceList(data.attendance_list, data.full, data.cursor);
         })
         .catch((error) => {
           console.error("Error:", error);
@@ -343,7 +357,7 @@ clockOutForm.addEventListener("submit", (e) => {
       "Content-Type": "application/json",
       "X-CSRFToken": csrftoken,
     },
-    body: JSON.stringify({ employee_id, pin }),
+    body: JSON.stringify({ employee_id, pin, since: attendanceCursor }),
   })
     .then((response) => response.json())
     .then((data) => {
@@ -352,7 +366,7 @@ clockOutForm.addEventListener("submit", (e) => {
         updatePartnerLogo(data.new_logo);
         clockOutModal.style.display = "none";
         clockOutForm.reset();
-        updateAttendanceList(data.attendance_list);
+        updateAttendanceList(data.attendance_list, data.full, data.cursor);
       } else {
         alert("Error: " + data.error);
       }
@@ -375,27 +389,77 @@ function updatePartnerLogo(newLogo) {
 }
 
 /**
- * Fetches and updates the attendance entries.
+ * Fetches and updates the attendance entries that changed since the last cursor.
  */
 function fetchAndUpdateEntries() {
-  fetch("/get_todays_entries/")
+  const url = attendanceCursor
+    ? `/get_todays_entries/?since=${encodeURIComponent(attendanceCursor)}`
+    : "/get_todays_entries/";
+
+  fetch(url)
     .then((response) => response.json())
     .then((data) => {
-      const tbody = document.getElementById("attendance-items");
-      tbody.innerHTML = "";
-      data.entries.forEach((entry) => addAttendanceItem(entry));
+      updateAttendanceList(data.entries, data.full, data.cursor);
 
       console.log("Time entries refreshed at", new Date().toLocaleTimeString());
     })
     .catch((error) => console.error("Error loading entries:", error));
 }
 
-document.addEventListener("DOMContentLoaded", function () {
-  fetchAndUpdateEntries();
+/**
+ * Starts polling for attendance changes, if not already polling.
+ */
+function startEntriesPolling() {
+  if (!window.entriesRefreshInterval) {
+    window.entriesRefreshInterval = setInterval(fetchAndUpdateEntries, 30000);
+  }
+}
+
+/**
+ * Stops polling for attendance changes.
+ */
+function stopEntriesPolling() {
+  clearInterval(window.entriesRefreshInterval);
+  window.entriesRefreshInterval = null;
+}
+
+/**
+ * Subscribes to pushed clock-in and clock-out events.
+ *
+ * While the event stream is connected, polling is stopped. If the server
+ * does not support the stream, or the connection drops, the page falls back
+ * to polling until the stream reconnects.
+ */
+function subscribeToAttendanceEvents() {
+  if (!window.EventSource) {
+    startEntriesPolling();
+    return;
+  }
+
+  const source = new EventSource("/attendance_events/");
 
-  const refreshInterval = setInterval(fetchAndUpdateEntries, 30000);
+  source.addEventListener("open", () => {
+    stopEntriesPolling();
+    // Catch up on any punches missed while disconnected
+    fetchAndUpdateEntries();
+  });
 
-  window.entriesRefreshInterval = refreshInterval;
+  const applyEvent = (event) => {
+    const data = JSON.parse(event.data);
+    updateAttendanceList([data.entry], false, data.cursor);
+  };
+  source.addEventListener("clock_in", applyEvent);
+  source.addEventListener("clock_out", applyEvent);
+  source.addEventListener("resync", () => fetchAndUpdateEntries());
+
+  source.addEventListener("error", () => {
+    startEntriesPolling();
+  });
+}
+
+document.addEventListener("DOMContentLoaded", function () {
+  fetchAndUpdateEntries();
+  subscribeToAttendanceEvents();
 
   fetch("/announcements/posted/")
     .then((response) => response.json())
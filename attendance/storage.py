@@ -0,0 +1,47 @@
+"""
+Private storage for generated exports.
+
+Export files hold employees' attendance, so they are kept under
+settings.EXPORT_ROOT rather than the media root, which is served without
+authentication at /media/. Nothing serves EXPORT_ROOT directly: job files are
+only downloaded through the export_job_download view, which checks that the
+job belongs to the requesting user.
+"""
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+
+class ExportStorage(FileSystemStorage):
+    """
+    File storage rooted at settings.EXPORT_ROOT, read when each file is accessed.
+    """
+    @property
+    def base_location(self):
+        return settings.EXPORT_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+export_storage = ExportStorage()
+
+
+def export_job_path(instance, filename):
+    """
+    Build a random storage name for an export job's file.
+
+    The download keeps the job's filename; the stored name is random so it
+    cannot be guessed from the job's filters.
+
+    Args:
+        instance (ExportJob): The job the file belongs to.
+        filename (str): The job's filename.
+
+    Returns:
+        str: The name under the exports directory, keeping the file's extension.
+    """
+    return f"exports/{uuid.uuid4().hex}{os.path.splitext(filename)[1]}"
@@ -0,0 +1,271 @@
+"""
+Incremental maintenance of DailyAttendanceSummary rows.
+
+Every time entry contributes to the summary row of its (work_date, company,
+department) group: one present, whether it is late, early or still open,
+and its minutes late if late. When entries are created, changed or deleted,
+the difference between their old and new contributions is applied with F()
+expressions in the same transaction as the entry write, so concurrent
+punches never overwrite each other's counts.
+
+The unique constraint on the group does not treat NULL keys as equal, so
+updates for groups without a company or department always target the
+group's first row. rebuild_summaries() regenerates a date range from the raw
+entries, e.g. after users move between companies.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+COUNTER_FIELDS = (
+    "present_count",
+    "late_count",
+    "early_count",
+    "total_minutes_late",
+    "open_shifts",
+)
+
+
+def new_deltas():
+    """
+    Create an empty set of summary changes.
+
+    Returns:
+        defaultdict: Mapping of (date, company_id, department_id) to a list of
+                     changes, one per field in COUNTER_FIELDS.
+    """
+    return defaultdict(lambda: [0] * len(COUNTER_FIELDS))
+
+
+def add_contribution(deltas, key, is_late, minutes_late, time_out, sign=1):
+    """
+    Add (or, with sign=-1, remove) one entry's contribution to a set of changes.
+
+    Args:
+        deltas (defaultdict): The changes created by new_deltas().
+        key (tuple): The entry's (work_date, company_id, department_id) group.
+        is_late (bool): Whether the entry is late.
+        minutes_late (int): The entry's minutes late (negative if early).
+        time_out (datetime): The entry's clock-out time, or None if open.
+        sign (int): 1 to add the entry, -1 to remove it.
+    """
+    if key[0] is None:
+        return
+    minutes_late = minutes_late or 0
+    contribution = (
+        1,
+        1 if is_late else 0,
+        1 if minutes_late < 0 else 0,
+        minutes_late if is_late else 0,
+        1 if time_out is None else 0,
+    )
+    values = deltas[key]
+    for index, value in enumerate(contribution):
+        values[index] += sign * value
+
+
+def apply_summary_deltas(deltas):
+    """
+    Apply a set of summary changes with one F() update per changed group.
+
+    Groups without a summary row yet get one created. Must be called inside
+    the transaction that wrote the entries.
+
+    Args:
+        deltas (defaultdict): The changes created by new_deltas().
+    """
+    from .models import DailyAttendanceSummary  # Import here to avoid circular imports
+
+    for (date, company_id, department_id), values in deltas.items():
+        if not any(values):
+            continue
+
+        changes = {
+            field: F(field) + value
+            for field, value in zip(COUNTER_FIELDS, values)
+            if value
+        }
+        rows = DailyAttendanceSummary.objects.filter(
+            date=date, company_id=company_id, department_id=department_id
+        )
+        if company_id is None or department_id is None:
+            # NULL keys are not covered by the unique constraint; target one row
+            rows = rows.filter(
+                pk__in=list(rows.order_by("pk").values_list("pk", flat=True)[:1])
+            )
+
+        if rows.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                DailyAttendanceSummary.objects.create(
+                    date=date,
+                    company_id=company_id,
+                    department_id=department_id,
+                    **dict(zip(COUNTER_FIELDS, values)),
+                )
+        except IntegrityError:
+            # Another punch created the row first
+            rows.update(**changes)
+
+
+def add_entry_change(deltas, entry, previous=None):
+    """
+    Add one time entry's change to a set of summary changes.
+
+    The entry's user is only looked up if the change affects the summary.
+
+    Args:
+        deltas (defaultdict): The changes created by new_deltas().
+        entry (TimeEntry): The entry as saved.
+        previous (tuple): The entry's previous state from summary_state() or
+                          stored_summary_state(), or None if it is new.
+    """
+    current = summary_state(entry)
+    if current == previous:
+        return
+
+    for state, sign in ((previous, -1), (current, 1)):
+        if state is not None:
+            key, is_late, minutes_late, time_out = resolve_summary_key(entry, state)
+            add_contribution(deltas, key, is_late, minutes_late, time_out, sign)
+
+
+def record_entry_change(entry, previous=None):
+    """
+    Apply one time entry's change to its summary rows.
+
+    Args:
+        entry (TimeEntry): The entry as saved.
+        previous (tuple): The entry's previous state, or None if it is new.
+    """
+    deltas = new_deltas()
+    add_entry_change(deltas, entry, previous)
+    apply_summary_deltas(deltas)
+
+
+def summary_state(entry, loaded=False):
+    """
+    Get the summary state of a time entry.
+
+    Args:
+        entry (TimeEntry): The entry.
+        loaded (bool): If True, use the values the entry had when it was
+                       loaded from the database instead of its current ones.
+
+    Returns:
+        tuple: (user_id, work_date, is_late, minutes_late, time_out).
+    """
+    source = (getattr(entry, "_loaded_values", None) or {}) if loaded else {}
+    return tuple(
+        source[name] if name in source else getattr(entry, name)
+        for name in ("user_id", "work_date", "is_late", "minutes_late", "time_out")
+    )
+
+
+def resolve_summary_key(entry, state):
+    """
+    Replace the user in a summary state with the entry's summary group key.
+
+    Args:
+        entry (TimeEntry): The entry the state belongs to.
+        state (tuple): A state from summary_state() or stored_summary_state().
+
+    Returns:
+        tuple: ((work_date, company_id, department_id), is_late, minutes_late,
+               time_out).
+    """
+    from .models import CustomUser  # Import here to avoid circular imports
+
+    user_id, work_date, is_late, minutes_late, time_out = state
+    if user_id == entry.user_id:
+        company_id, department_id = entry.user.company_id, entry.user.department_id
+    else:
+        company_id, department_id = CustomUser.objects.values_list(
+            "company_id", "department_id"
+        ).get(pk=user_id)
+
+    return (work_date, company_id, department_id), is_late, minutes_late, time_out
+
+
+def stored_summary_state(pk):
+    """
+    Get the summary state of a time entry as stored in the database.
+
+    Args:
+        pk (int): The entry's primary key.
+
+    Returns:
+        tuple: The state in the same form as summary_state(), or None if the
+               entry does not exist.
+    """
+    from .models import TimeEntry  # Import here to avoid circular imports
+
+    return TimeEntry.objects.filter(pk=pk).values_list(
+        "user_id", "work_date", "is_late", "minutes_late", "time_out"
+    ).first()
+
+
+def rebuild_summaries(date_from, date_to):
+    """
+    Regenerate the summary rows for a date range from the raw entries.
+
+    Args:
+        date_from (date): The first day to rebuild.
+        date_to (date): The last day to rebuild.
+
+    Returns:
+        int: The number of summary rows written.
+    """
+    from .models import DailyAttendanceSummary, TimeEntry  # Import here to avoid circular imports
+
+    groups = (
+        TimeEntry.objects.filter(work_date__range=(date_from, date_to))
+        .values("work_date", "user__company_id", "user__department_id")
+        .annotate(
+            present_count=Count("id"),
+            late_count=Count("id", filter=Q(is_late=True)),
+            early_count=Count("id", filter=Q(minutes_late__lt=0)),
+            total_minutes_late=Coalesce(Sum("minutes_late", filter=Q(is_late=True)), 0),
+            open_shifts=Count("id", filter=Q(time_out__isnull=True)),
+        )
+        .order_by()
+    )
+
+    with transaction.atomic():
+        DailyAttendanceSummary.objects.filter(date__range=(date_from, date_to)).delete()
+        summaries = DailyAttendanceSummary.objects.bulk_create(
+            [
+                DailyAttendanceSummary(
+                    date=group["work_date"],
+                    company_id=group["user__company_id"],
+                    department_id=group["user__department_id"],
+                    **{field: group[field] for field in COUNTER_FIELDS},
+                )
+                for group in groups
+            ],
+            batch_size=1000,
+        )
+    return len(summaries)
+
+
+@receiver(post_delete, sender="attendance.TimeEntry")
+def time_entry_deleted(sender, instance, **kwargs):
+    """
+    Remove a deleted time entry from its summary row.
+
+    Args:
+        sender: The model class that sent the signal.
+        instance (TimeEntry): The entry that was deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    deltas = new_deltas()
+    key, is_late, minutes_late, time_out = resolve_summary_key(
+        instance, summary_state(instance, loaded=True)
+    )
+    add_contribution(deltas, key, is_late, minutes_late, time_out, sign=-1)
+    apply_summary_deltas(deltas)
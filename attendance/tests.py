@@ -1,16 +1,59 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+import asyncio
+import csv
 import datetime
+import importlib
 import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO, StringIO
+from unittest import mock
+
+from openpyxl import load_workbook
 
 from .models import (
     Company, Department, Position, TimeEntry,
-    Announcement, TimePreset, ScheduleGroup, DayOverride
+    AdminLog, Announcement, TimePreset, ScheduleGroup, DayOverride, DailyAttendanceSummary,
+    CompanyAlias, ExportJob,
+)
+from .auth_cache import MAX_FAILED_ATTEMPTS_PER_EMPLOYEE, authenticate_pin, get_cached_user
+from .management.commands.bench_serialization import serialize_instances, serialize_rows
+from .companies import (
+    DEFAULT_COMPANY_LOGO, get_company_logo, get_company_map, invalidate_company_map,
+    resolve_company_ids,
+)
+from .events import AttendanceBroker, broker
+from .export_cache import evict_exports, export_cache_key, get_cache_dir, get_names_version
+from .export_shards import month_shards, write_shard
+from .exports import (
+    CSV_CONTENT_TYPE, EXPORT_HEADERS, JSONL_CONTENT_TYPE, TIMESHEET_HEADERS, export_rows,
+)
+from .jobs import MAX_ACTIVE_JOBS_PER_USER, MAX_RUNNING_JOBS, run_export_job, run_next_export_job
+from .lateness import compute_lateness
+from .metrics import Histogram, render_metrics, reset_metrics
+from .schedules import get_schedule_table, resolve_schedule
+from .queries import KIOSK_COLUMNS, TIME_LOG_COLUMNS, AttendanceFilter, entry_rows
+from .serializers import FastJsonResponse, clock_time, date_time, dumps, kiosk_row
+from .services import ingest_punches
+from .summaries import COUNTER_FIELDS, rebuild_summaries
+from .utils import (
+    get_day_code, format_minutes, create_default_time_preset, name_search_q, normalize_name
 )
-from .utils import get_day_code, format_minutes, create_default_time_preset
 
 User = get_user_model()
 
@@ -383,6 +426,2429 @@ class ViewsTestCase(TestCase):
         self.assertIn('success', data)
 
 
+class ClockInServiceTestCase(TestCase):
+    """
+    Test case for the clock-in service query budget.
+    """
+    def setUp(self):
+        """
+        Set up a company, a schedule and a user to clock in.
+        """
+        self.client = Client()
+        self.company = Company.objects.create(name="Test Company")
+        self.time_preset = TimePreset.objects.create(
+            name="Default Schedule",
+            start_time=datetime.time(8, 0),
+            end_time=datetime.time(17, 0),
+            grace_period_minutes=5
+        )
+        self.schedule_group = ScheduleGroup.objects.create(
+            name="Test Group",
+            default_schedule=self.time_preset
+        )
+        self.user = User.objects.create_user(
+            employee_id="123456",
+            username="123456",
+            password="testpass123",
+            first_name="Test",
+            surname="User",
+            company=self.company,
+            schedule_group=self.schedule_group,
+            pin="1234",
+            if_first_login=False
+        )
+
+    def _create_punches(self, count, first_id=200000):
+        """
+        Bulk create users that have already clocked in today.
+        """
+        users = User.objects.bulk_create([
+            User(
+                employee_id=str(first_id + i),
+                username=str(first_id + i),
+                first_name=f"First{i}",
+                surname=f"Last{i}",
+                company=self.company,
+                schedule_group=self.schedule_group,
+            )
+            for i in range(count)
+        ])
+        now = timezone.now()
+        TimeEntry.objects.bulk_create([
+            TimeEntry(user=user, time_in=now, work_date=now.date()) for user in users
+        ])
+        # bulk_create bypasses the incremental summary updates
+        rebuild_summaries(now.date(), now.date())
+
+    def _clock_in(self):
+        """
+        Clock in the test user and return the captured queries and response.
+        """
+        get_schedule_table()
+        get_company_map()
+        get_cached_user('123456')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('clock_in'),
+                data=json.dumps({
+                    'employee_id': '123456',
+                    'pin': '1234',
+                    'image_path': 'attendance_images/test.jpg'
+                }),
+                content_type='application/json',
+                secure=True
+            )
+        return queries, json.loads(response.content)
+
+    def test_clock_in_records_entry(self):
+        """
+        Test that a punch creates a single entry with its image path.
+        """
+        _, data = self._clock_in()
+        self.assertTrue(data['success'])
+        entry = TimeEntry.objects.get(user=self.user)
+        self.assertEqual(entry.image_path, 'attendance_images/test.jpg')
+        self.assertEqual(len(data['attendance_list']), 1)
+
+        queries, data = self._clock_in()
+        self.assertFalse(data['success'])
+        self.assertEqual(data['error'], "You have already clocked in today")
+        self.assertEqual(TimeEntry.objects.filter(user=self.user).count(), 1)
+        # The conflict is detected by the insert itself, not a prior lookup
+        self.assertFalse(any(
+            q['sql'].startswith('SELECT') and 'django_time_entries' in q['sql']
+            for q in queries.captured_queries
+        ))
+
+    def test_clock_in_warns_about_missing_clock_out(self):
+        """
+        Test that a punch warns when yesterday's entry was never closed.
+        """
+        yesterday = timezone.now() - datetime.timedelta(days=1)
+        TimeEntry.objects.bulk_create([
+            TimeEntry(user=self.user, time_in=yesterday, work_date=yesterday.date())
+        ])
+        _, data = self._clock_in()
+        self.assertTrue(data['success'])
+        self.assertIn('warning', data)
+
+    def test_clock_in_query_count_is_constant(self):
+        """
+        Test that the query count does not grow with the number of punches today.
+        """
+        self._create_punches(10)
+        small_queries, data = self._clock_in()
+        self.assertTrue(data['success'])
+        self.assertEqual(len(data['attendance_list']), 11)
+
+        TimeEntry.objects.filter(user=self.user).delete()
+        self._create_punches(2000, first_id=300000)
+        large_queries, data = self._clock_in()
+        self.assertTrue(data['success'])
+        self.assertEqual(len(data['attendance_list']), 2011)
+
+        self.assertEqual(len(small_queries), len(large_queries))
+        self.assertLessEqual(len(large_queries), 7)
+
+
+class AttendanceChangesTestCase(TestCase):
+    """
+    Test case for the delta-based kiosk attendance list.
+    """
+    def setUp(self):
+        """
+        Set up a guard and two users that have clocked in today.
+        """
+        self.client = Client()
+        self.guard = User.objects.create_user(
+            employee_id="999998",
+            username="999998",
+            password="guardpass",
+            is_guard=True
+        )
+        self.first = User.objects.create_user(
+            employee_id="100001", username="100001", first_name="First"
+        )
+        self.second = User.objects.create_user(
+            employee_id="100002", username="100002", first_name="Second"
+        )
+        self.first_entry = TimeEntry.objects.create(user=self.first)
+        self.second_entry = TimeEntry.objects.create(user=self.second)
+        self.client.force_login(self.guard)
+
+    def _get_entries(self, since=None):
+        """
+        Fetch today's entries, optionally since a change cursor.
+        """
+        params = {'since': since} if since else {}
+        response = self.client.get(reverse('get_todays_entries'), params, secure=True)
+        return json.loads(response.content)
+
+    def test_full_list_without_cursor(self):
+        """
+        Test that a request without a cursor returns every entry for today.
+        """
+        data = self._get_entries()
+        self.assertTrue(data['full'])
+        self.assertEqual(len(data['entries']), 2)
+        self.assertIsNotNone(data['cursor'])
+
+    def test_only_changes_since_cursor(self):
+        """
+        Test that a cursor limits the response to entries changed after it.
+        """
+        cursor = self._get_entries()['cursor']
+
+        data = self._get_entries(since=cursor)
+        self.assertFalse(data['full'])
+        self.assertEqual(data['entries'], [])
+        self.assertEqual(data['cursor'], cursor)
+
+        self.first_entry.time_out = timezone.now()
+        self.first_entry.save()
+
+        data = self._get_entries(since=cursor)
+        self.assertFalse(data['full'])
+        self.assertEqual([e['employee_id'] for e in data['entries']], ["100001"])
+        self.assertGreater(data['cursor'], cursor)
+
+    def test_stale_cursor_returns_full_list(self):
+        """
+        Test that a cursor from a previous day or an invalid cursor returns the full list.
+        """
+        yesterday = (timezone.now() - datetime.timedelta(days=1)).isoformat()
+        self.assertTrue(self._get_entries(since=yesterday)['full'])
+        self.assertTrue(self._get_entries(since="not-a-cursor")['full'])
+
+
+class AttendanceEventsTestCase(TestCase):
+    """
+    Test case for pushed clock-in and clock-out events.
+    """
+    def setUp(self):
+        """
+        Set up a guard and a user with a company.
+        """
+        self.client = Client()
+        self.company = Company.objects.create(name="Test Company")
+        self.guard = User.objects.create_user(
+            employee_id="999998",
+            username="999998",
+            password="guardpass",
+            is_guard=True
+        )
+        self.user = User.objects.create_user(
+            employee_id="123456",
+            username="123456",
+            first_name="Test",
+            surname="User",
+            company=self.company,
+            pin="1234",
+            if_first_login=False
+        )
+
+    def test_broker_delivers_events_across_threads(self):
+        """
+        Test that an event published from a worker thread reaches a subscriber.
+        """
+        test_broker = AttendanceBroker()
+
+        async def receive():
+            subscription = test_broker.subscribe()
+            thread = threading.Thread(
+                target=test_broker.publish, args=({"type": "clock_in"},)
+            )
+            thread.start()
+            event = await subscription.get(timeout=1)
+            thread.join()
+            test_broker.unsubscribe(subscription)
+            return event
+
+        self.assertEqual(asyncio.run(receive()), {"type": "clock_in"})
+        self.assertEqual(test_broker.subscriber_count, 0)
+
+    def test_clock_in_and_out_publish_after_commit(self):
+        """
+        Test that clocking in and out publish events once the transaction commits.
+        """
+        with mock.patch.object(broker, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                entry = TimeEntry.clock_in(self.user)
+            with self.captureOnCommitCallbacks(execute=True):
+                entry.clock_out()
+
+        events = [call.args[0] for call in publish.call_args_list]
+        self.assertEqual([e["type"] for e in events], ["clock_in", "clock_out"])
+        self.assertEqual(events[0]["entry"]["employee_id"], "123456")
+        self.assertEqual(events[0]["entry"]["company"], "Test Company")
+        self.assertIsNotNone(events[1]["entry"]["time_out"])
+        # A pushed row is formatted exactly like a polled row
+        polled = TimeEntry.objects.filter(pk=entry.pk).values_list(*KIOSK_COLUMNS).get()
+        self.assertEqual(events[1]["entry"], kiosk_row(polled))
+
+    def test_event_stream_requires_asgi(self):
+        """
+        Test that the event stream tells WSGI clients to fall back to polling.
+        """
+        self.client.force_login(self.guard)
+        response = self.client.get(reverse('attendance_events'), secure=True)
+        self.assertEqual(response.status_code, 204)
+
+
+class ScheduleTableTestCase(TestCase):
+    """
+    Test case for the resolved schedule table.
+    """
+    def setUp(self):
+        """
+        Set up a schedule group with a Monday override.
+        """
+        self.default_preset = TimePreset.objects.create(
+            name="Day Shift",
+            start_time=datetime.time(8, 0),
+            end_time=datetime.time(17, 0),
+            grace_period_minutes=5
+        )
+        self.monday_preset = TimePreset.objects.create(
+            name="Monday Shift",
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(18, 0),
+            grace_period_minutes=10
+        )
+        self.group = ScheduleGroup.objects.create(
+            name="Test Group",
+            default_schedule=self.default_preset
+        )
+        self.override = DayOverride.objects.create(
+            schedule_group=self.group,
+            day="mon",
+            time_preset=self.monday_preset
+        )
+
+    def test_resolves_overrides_and_defaults(self):
+        """
+        Test that overrides, group defaults and built-in defaults are resolved.
+        """
+        self.assertEqual(
+            resolve_schedule(self.group.id, "mon"),
+            (datetime.time(9, 0), datetime.time(18, 0), 10)
+        )
+        self.assertEqual(
+            resolve_schedule(self.group.id, "tue"),
+            (datetime.time(8, 0), datetime.time(17, 0), 5)
+        )
+        self.assertEqual(resolve_schedule(None, "wed").end_time, datetime.time(17, 0))
+        self.assertEqual(resolve_schedule(None, "thu").end_time, datetime.time(19, 0))
+
+    def test_no_queries_after_warm_up(self):
+        """
+        Test that resolving a schedule costs no queries once the table is built.
+        """
+        resolve_schedule(self.group.id, "mon")
+        with self.assertNumQueries(0):
+            for day in ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]:
+                resolve_schedule(self.group.id, day)
+                resolve_schedule(None, day)
+
+    def test_invalidated_on_change(self):
+        """
+        Test that saving or deleting schedule models rebuilds the table.
+        """
+        resolve_schedule(self.group.id, "mon")
+
+        self.monday_preset.grace_period_minutes = 15
+        self.monday_preset.save()
+        self.assertEqual(resolve_schedule(self.group.id, "mon").grace_period_minutes, 15)
+
+        self.override.delete()
+        self.assertEqual(resolve_schedule(self.group.id, "mon").start_time, datetime.time(8, 0))
+
+
+class LatenessTestCase(TestCase):
+    """
+    Test case for the batch lateness engine and recompute_lateness command.
+    """
+    def setUp(self):
+        """
+        Set up a schedule group starting at 9:00 AM with a 10 minute grace period.
+        """
+        self.company = Company.objects.create(name="Test Company")
+        self.preset = TimePreset.objects.create(
+            name="Late Shift",
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(18, 0),
+            grace_period_minutes=10
+        )
+        self.group = ScheduleGroup.objects.create(
+            name="Late Group",
+            default_schedule=self.preset
+        )
+        self.user = User.objects.create_user(
+            employee_id="123456",
+            username="123456",
+            company=self.company,
+            schedule_group=self.group
+        )
+
+    def test_compute_lateness(self):
+        """
+        Test lateness against group schedules and the built-in default schedule.
+        """
+        day = datetime.date(2023, 5, 1)  # Monday
+        rows = [
+            (datetime.datetime.combine(day, datetime.time(8, 45)), self.group.id),
+            (datetime.datetime.combine(day, datetime.time(9, 10)), self.group.id),
+            (datetime.datetime.combine(day, datetime.time(9, 10, 30)), self.group.id),
+            (datetime.datetime.combine(day, datetime.time(8, 30)), None),
+            (None, self.group.id),
+        ]
+        self.assertEqual(
+            compute_lateness(rows),
+            [(False, -15), (False, 10), (True, 10), (True, 30), (False, 0)]
+        )
+
+    def test_entry_save_uses_engine(self):
+        """
+        Test that saving an entry calculates its lateness.
+        """
+        entry = TimeEntry.objects.create(
+            user=self.user,
+            time_in=datetime.datetime(2023, 5, 1, 9, 30)
+        )
+        self.assertTrue(entry.is_late)
+        self.assertEqual(entry.minutes_late, 30)
+
+    def test_recompute_lateness_command(self):
+        """
+        Test that the command rewrites stale lateness in the given range only.
+        """
+        inside = TimeEntry.objects.create(
+            user=self.user, time_in=datetime.datetime(2023, 5, 1, 9, 30)
+        )
+        outside = TimeEntry.objects.create(
+            user=self.user, time_in=datetime.datetime(2023, 6, 1, 9, 30)
+        )
+
+        self.preset.start_time = datetime.time(9, 30)
+        self.preset.save()
+
+        call_command(
+            "recompute_lateness",
+            "--from", "2023-05-01",
+            "--to", "2023-05-31",
+            "--company", "test company",
+            "--chunk-size", "1",
+            stdout=StringIO()
+        )
+
+        inside.refresh_from_db()
+        outside.refresh_from_db()
+        self.assertFalse(inside.is_late)
+        self.assertEqual(inside.minutes_late, 0)
+        self.assertTrue(outside.is_late)
+        self.assertEqual(outside.minutes_late, 30)
+
+    def test_recompute_lateness_by_company_alias(self):
+        """
+        Test that --company accepts an alias and rejects unknown companies.
+        """
+        CompanyAlias.objects.create(alias="TC", company=self.company)
+        invalidate_company_map()
+        entry = TimeEntry.objects.create(
+            user=self.user, time_in=datetime.datetime(2023, 5, 1, 9, 30)
+        )
+        self.preset.start_time = datetime.time(9, 30)
+        self.preset.save()
+
+        call_command(
+            "recompute_lateness", "--from", "2023-05-01", "--to", "2023-05-31",
+            "--company", "tc", stdout=StringIO()
+        )
+        entry.refresh_from_db()
+        self.assertFalse(entry.is_late)
+
+        with self.assertRaises(CommandError):
+            call_command(
+                "recompute_lateness", "--from", "2023-05-01", "--to", "2023-05-31",
+                "--company", "Nowhere", stdout=StringIO()
+            )
+
+
+class TimeEntryDirtyTrackingTestCase(TestCase):
+    """
+    Test case for change-aware TimeEntry saves.
+    """
+    def setUp(self):
+        """
+        Set up a user with a saved time entry.
+        """
+        self.user = User.objects.create_user(employee_id="123456", username="123456")
+        TimeEntry.objects.create(
+            user=self.user, time_in=datetime.datetime(2023, 5, 1, 8, 30)
+        )
+        self.entry = TimeEntry.objects.select_related("user").get(user=self.user)
+        get_schedule_table()
+
+    def test_unchanged_save_skips_write(self):
+        """
+        Test that saving an unchanged entry does not query the database.
+        """
+        with self.assertNumQueries(0):
+            self.entry.save()
+
+    def test_clock_out_writes_only_changed_columns(self):
+        """
+        Test that clocking out neither reloads the user nor rewrites lateness.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.entry.time_out = datetime.datetime(2023, 5, 1, 17, 0)
+            self.entry.hours_worked = 8.5
+            self.entry.save()
+
+        # The entry update plus the F() update of its daily summary row
+        entry_updates = [
+            q['sql'] for q in queries.captured_queries
+            if q['sql'].startswith('UPDATE "django_time_entries"')
+        ]
+        self.assertEqual(len(entry_updates), 1)
+        self.assertIn('"time_out"', entry_updates[0])
+        self.assertNotIn('"is_late"', entry_updates[0])
+        self.assertNotIn('"time_in"', entry_updates[0])
+        self.assertFalse(any('"django_users"' in q['sql'] for q in queries.captured_queries))
+
+    def test_time_in_change_recomputes_lateness(self):
+        """
+        Test that changing time_in recalculates and writes lateness.
+        """
+        self.assertTrue(self.entry.is_late)
+        self.entry.time_in = datetime.datetime(2023, 5, 1, 7, 50)
+        self.entry.save()
+
+        self.entry.refresh_from_db()
+        self.assertFalse(self.entry.is_late)
+        self.assertEqual(self.entry.minutes_late, -10)
+
+
+class BulkPunchTestCase(TestCase):
+    """
+    Test case for the bulk punch ingestion endpoint.
+    """
+    def setUp(self):
+        """
+        Set up users with PINs and a base time for the buffered punches.
+        """
+        self.client = Client()
+        self.users = [
+            User.objects.create_user(
+                employee_id=str(100001 + i),
+                username=str(100001 + i),
+                pin="1234",
+                if_first_login=False
+            )
+            for i in range(3)
+        ]
+        self.morning = timezone.now().replace(hour=8, minute=0, second=0, microsecond=0)
+        if self.morning > timezone.now():
+            self.morning -= datetime.timedelta(days=1)
+
+    def _post(self, events):
+        """
+        Post a batch of events and return the decoded response.
+        """
+        response = self.client.post(
+            reverse('bulk_punch'),
+            data=json.dumps({'events': events}),
+            content_type='application/json',
+            secure=True
+        )
+        return response.status_code, json.loads(response.content)
+
+    def _event(self, punch_type, user, minutes, pin="1234"):
+        """
+        Build a punch event a number of minutes after the base time.
+        """
+        return {
+            'type': punch_type,
+            'employee_id': user.employee_id,
+            'pin': pin,
+            'timestamp': (self.morning + datetime.timedelta(minutes=minutes)).isoformat(),
+        }
+
+    def test_batch_results_and_writes(self):
+        """
+        Test that a batch is validated per event and written in bulk.
+        """
+        existing = TimeEntry.objects.create(user=self.users[2], time_in=self.morning)
+        events = [
+            self._event('clock_in', self.users[0], 0),
+            self._event('clock_in', self.users[1], 10),
+            self._event('clock_out', self.users[0], 1),
+            self._event('clock_out', self.users[2], 2),
+            self._event('clock_in', self.users[1], 11, pin="9999"),
+            {'type': 'clock_in', 'employee_id': '999999', 'pin': '1234',
+             'timestamp': self.morning.isoformat()},
+            {'type': 'nap', 'employee_id': '100001', 'pin': '1234',
+             'timestamp': self.morning.isoformat()},
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            status, data = self._post(events)
+        self.assertEqual(status, 200)
+        self.assertLessEqual(len(queries), 8)
+
+        results = data['results']
+        self.assertEqual([r['success'] for r in results], [True, True, True, True, False, False, False])
+        self.assertEqual(results[4]['error'], "Incorrect PIN")
+        self.assertEqual(results[5]['error'], "Employee ID not found")
+        self.assertEqual(results[6]['error'], "Invalid event type")
+
+        first = TimeEntry.objects.get(user=self.users[0])
+        self.assertEqual(first.time_out, self.morning + datetime.timedelta(minutes=1))
+        existing.refresh_from_db()
+        self.assertEqual(existing.time_out, self.morning + datetime.timedelta(minutes=2))
+        self.assertTrue(TimeEntry.objects.get(user=self.users[1]).is_late)
+
+    def test_replayed_batch_is_reported_as_duplicate(self):
+        """
+        Test that replaying a batch does not create duplicate entries.
+        """
+        events = [self._event('clock_in', self.users[0], 0)]
+        self._post(events)
+        _, data = self._post(events)
+        self.assertTrue(data['results'][0]['success'])
+        self.assertTrue(data['results'][0]['duplicate'])
+        self.assertEqual(TimeEntry.objects.filter(user=self.users[0]).count(), 1)
+
+    def test_rejects_invalid_payload(self):
+        """
+        Test that a request without an events list is rejected.
+        """
+        response = self.client.post(
+            reverse('bulk_punch'), data=json.dumps({}), content_type='application/json',
+            secure=True
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class AuthCacheTestCase(TestCase):
+    """
+    Test case for cached PIN authentication and attempt throttling.
+    """
+    def setUp(self):
+        """
+        Set up a user and start from an empty cache.
+        """
+        cache.clear()
+        self.user = User.objects.create_user(
+            employee_id="123456",
+            username="123456",
+            pin="1234",
+            if_first_login=False
+        )
+
+    def tearDown(self):
+        """
+        Clear cached users and attempt counters.
+        """
+        cache.clear()
+
+    def test_repeat_authentication_is_cached(self):
+        """
+        Test that only the first authentication queries the database.
+        """
+        with self.assertNumQueries(1):
+            self.assertEqual(User.authenticate_by_pin("123456", "1234"), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(User.authenticate_by_pin("123456", "1234"), self.user)
+            self.assertIsNone(User.authenticate_by_pin("123456", "0000"))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                authenticate_pin("000000", "1234"), (None, "Employee ID not found")
+            )
+        with self.assertNumQueries(0):
+            authenticate_pin("000000", "1234")
+
+    def test_cache_invalidated_on_save(self):
+        """
+        Test that saving a user invalidates the cached credential state.
+        """
+        User.authenticate_by_pin("123456", "1234")
+        self.user.pin = "5678"
+        self.user.save()
+
+        self.assertIsNone(User.authenticate_by_pin("123456", "1234"))
+        self.assertEqual(User.authenticate_by_pin("123456", "5678"), self.user)
+
+    def test_failed_attempts_are_throttled(self):
+        """
+        Test that repeated failures are rejected without querying the database.
+        """
+        for _ in range(MAX_FAILED_ATTEMPTS_PER_EMPLOYEE):
+            self.assertEqual(authenticate_pin("123456", "0000", "10.0.0.1")[1], "Incorrect PIN")
+
+        with self.assertNumQueries(0):
+            auth_result, error = authenticate_pin("123456", "1234", "10.0.0.1")
+        self.assertIsNone(auth_result)
+        self.assertIn("Too many failed attempts", error)
+
+    @override_settings(MAX_FAILED_PIN_ATTEMPTS_PER_IP=3)
+    def test_correct_pin_gets_through_from_throttled_ip(self):
+        """
+        Test that an IP over its limit has its failures throttled with a 429
+        while correct PINs from it still get through.
+        """
+        for employee_id in ("000001", "000002", "000003"):
+            authenticate_pin(employee_id, "0000", "10.0.0.1")
+
+        client = Client(REMOTE_ADDR="10.0.0.1")
+        response = client.post(
+            reverse("clock_out"),
+            data=json.dumps({"employee_id": "000004", "pin": "0000"}),
+            content_type="application/json",
+            secure=True,
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "300")
+        self.assertIn("Too many failed attempts", json.loads(response.content)["error"])
+
+        auth_result, error = authenticate_pin("123456", "1234", "10.0.0.1")
+        self.assertEqual(auth_result, self.user)
+        self.assertIsNone(error)
+
+    def test_inactive_account_counts_as_failure(self):
+        """
+        Test that an inactive account is answered like a wrong PIN and counted.
+        """
+        self.user.is_active = False
+        self.user.save()
+
+        for _ in range(MAX_FAILED_ATTEMPTS_PER_EMPLOYEE):
+            self.assertEqual(authenticate_pin("123456", "1234")[1], "Incorrect PIN")
+        self.assertIn("Too many failed attempts", authenticate_pin("123456", "1234")[1])
+
+
+class BenchKioskTestCase(TestCase):
+    """
+    Test case for the bench_kiosk load harness.
+    """
+    def test_bench_kiosk_reports_and_cleans_up(self):
+        """
+        Test that a small run reports every endpoint and removes its data.
+        """
+        User = get_user_model()
+        cache.clear()
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "bench.json")
+            call_command(
+                "bench_kiosk",
+                "--employees", "3",
+                "--concurrency", "1",
+                "--poll-every", "1",
+                "--output", output,
+                stdout=StringIO()
+            )
+            with open(output) as f:
+                report = json.load(f)
+
+        for endpoint in ("upload_image", "clock_in", "get_todays_entries", "clock_out"):
+            self.assertEqual(report["endpoints"][endpoint]["errors"], 0)
+        self.assertEqual(report["endpoints"]["clock_in"]["requests"], 3)
+        self.assertEqual(report["endpoints"]["get_todays_entries"]["requests"], 6)
+        self.assertGreater(report["endpoints"]["clock_in"]["queries_per_request"], 0)
+
+        self.assertFalse(User.objects.filter(employee_id__startswith="9").exists())
+        self.assertFalse(TimeEntry.objects.exists())
+        self.assertFalse(ScheduleGroup.objects.exists())
+
+    def test_bench_kiosk_refuses_existing_employee_ids(self):
+        """
+        Test that a run refuses to start if a real user has a benchmark employee ID.
+        """
+        user = get_user_model().objects.create_user(
+            employee_id="900001", username="900001", pin="1234"
+        )
+        entry = TimeEntry.objects.create(user=user, time_in=timezone.now())
+
+        with self.assertRaises(CommandError):
+            call_command("bench_kiosk", "--employees", "3", stdout=StringIO())
+
+        self.assertTrue(TimeEntry.objects.filter(pk=entry.pk).exists())
+        self.assertFalse(get_user_model().objects.filter(employee_id="900000").exists())
+        self.assertFalse(ScheduleGroup.objects.exists())
+
+
+class RequestMetricsTestCase(TestCase):
+    """
+    Test case for the request timing middleware and metrics endpoint.
+    """
+    def setUp(self):
+        """
+        Set up a guard and a staff user, and clear recorded metrics.
+        """
+        User = get_user_model()
+        self.guard = User.objects.create_user(
+            employee_id="123456",
+            username="123456",
+            password="1234",
+            first_name="Guard",
+            surname="User",
+            is_guard=True,
+        )
+        self.staff = User.objects.create_user(
+            employee_id="654321",
+            username="654321",
+            password="1234",
+            first_name="Staff",
+            surname="User",
+            is_staff=True,
+        )
+        self.client = Client()
+        reset_metrics()
+
+    def tearDown(self):
+        reset_metrics()
+
+    def test_server_timing_header(self):
+        """
+        Test that responses carry query count, DB time and handling time.
+        """
+        self.client.force_login(self.guard)
+        response = self.client.get(reverse("get_todays_entries"), secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+;desc="Middleware, view and rendering"$'
+        )
+
+    def test_histograms_are_recorded_per_url_name(self):
+        """
+        Test that each request is counted under its URL name.
+        """
+        self.client.force_login(self.guard)
+        self.client.get(reverse("get_todays_entries"), secure=True)
+        self.client.get(reverse("get_todays_entries"), secure=True)
+
+        text = render_metrics()
+        self.assertIn('attendance_request_duration_seconds_count{view="get_todays_entries"} 2', text)
+        self.assertIn('attendance_request_queries_bucket{view="get_todays_entries",le="+Inf"} 2', text)
+        self.assertIn('attendance_response_size_bytes_count{view="get_todays_entries"} 2', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """
+        Test that bucket counts are cumulative and bounds are inclusive.
+        """
+        histogram = Histogram("test_metric", "Test metric.", (1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe("view", value)
+
+        lines = histogram.render()
+        self.assertIn('test_metric_bucket{view="view",le="1"} 2', lines)
+        self.assertIn('test_metric_bucket{view="view",le="5"} 3', lines)
+        self.assertIn('test_metric_bucket{view="view",le="+Inf"} 4', lines)
+        self.assertIn('test_metric_sum{view="view"} 14.5', lines)
+        self.assertIn('test_metric_count{view="view"} 4', lines)
+
+    def test_metrics_endpoint_is_staff_only(self):
+        """
+        Test that only staff users can read the metrics.
+        """
+        self.client.force_login(self.guard)
+        response = self.client.get(reverse("metrics"), secure=True)
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("metrics"), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn('attendance_request_duration_seconds_count{view="metrics"} 1', response.content.decode())
+
+
+class WorkDateTestCase(TestCase):
+    """
+    Test case for the stored work_date column.
+    """
+    def setUp(self):
+        """
+        Set up a user with a schedule.
+        """
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            employee_id="123456",
+            username="123456",
+            password="1234",
+            first_name="Test",
+            surname="User",
+        )
+
+    def test_work_date_follows_time_in(self):
+        """
+        Test that work_date is set on insert and updated when time_in changes.
+        """
+        entry = TimeEntry.objects.create(
+            user=self.user, time_in=datetime.datetime(2023, 5, 15, 23, 30)
+        )
+        self.assertEqual(entry.work_date, datetime.date(2023, 5, 15))
+
+        entry = TimeEntry.objects.get(pk=entry.pk)
+        entry.time_in = datetime.datetime(2023, 5, 16, 0, 15)
+        entry.save()
+        entry.refresh_from_db()
+        self.assertEqual(entry.work_date, datetime.date(2023, 5, 16))
+
+    def test_merged_duplicates_sum_their_intervals(self):
+        """
+        Test that merging duplicate entries totals their intervals without
+        the gaps between them, counting overlaps once.
+        """
+        merge = importlib.import_module("attendance.migrations.0006_timeentry_one_entry_per_day")
+        day = datetime.datetime(2023, 5, 15)
+        entries = [
+            TimeEntry(time_in=day.replace(hour=8), time_out=day.replace(hour=12)),
+            TimeEntry(time_in=day.replace(hour=11), time_out=day.replace(hour=12, minute=30)),
+            TimeEntry(time_in=day.replace(hour=13), time_out=day.replace(hour=17)),
+            TimeEntry(time_in=day.replace(hour=18)),
+        ]
+        self.assertEqual(merge.worked_hours(entries), 8.5)
+
+    def test_one_entry_per_day(self):
+        """
+        Test that a second entry for the same user and day is rejected.
+        """
+        TimeEntry.objects.create(
+            user=self.user, time_in=datetime.datetime(2023, 5, 15, 8, 0)
+        )
+
+        duplicate = TimeEntry(user=self.user, time_in=datetime.datetime(2023, 5, 15, 13, 0))
+        with self.assertRaises(ValidationError):
+            duplicate.full_clean(exclude=["work_date"])
+
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                duplicate.save()
+
+        # A different day is allowed
+        TimeEntry.objects.create(
+            user=self.user, time_in=datetime.datetime(2023, 5, 16, 8, 0)
+        )
+        self.assertEqual(TimeEntry.objects.filter(user=self.user).count(), 2)
+
+    def test_backfill_migration(self):
+        """
+        Test that the data migration fills work_date for existing entries.
+        """
+        from django.apps import apps
+        backfill = importlib.import_module(
+            "attendance.migrations.0005_backfill_timeentry_work_date"
+        )
+
+        entry = TimeEntry.objects.create(
+            user=self.user, time_in=datetime.datetime(2023, 5, 15, 8, 0)
+        )
+        TimeEntry.objects.filter(pk=entry.pk).update(work_date=None)
+
+        backfill.backfill_work_date(apps, None)
+
+        entry.refresh_from_db()
+        self.assertEqual(entry.work_date, datetime.date(2023, 5, 15))
+
+    def test_range_export_excludes_dates(self):
+        """
+        Test that excluded dates are left out of the range export.
+        """
+        for day in (15, 16, 17):
+            TimeEntry.objects.create(
+                user=self.user, time_in=datetime.datetime(2023, 5, day, 8, 0)
+            )
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+
+        with tempfile.TemporaryDirectory() as export_root, override_settings(EXPORT_ROOT=export_root):
+            response = self.client.get(reverse("export_time_entries_range"), {
+                "date_start": "2023-05-15",
+                "date_end": "2023-05-17",
+                "exclude_date": ["2023-05-16"],
+            }, secure=True)
+
+            self.assertEqual(response.status_code, 200)
+            workbook = load_workbook(BytesIO(b"".join(response.streaming_content)))
+        rows = list(workbook.active.iter_rows(min_row=2, values_only=True))
+        self.assertEqual(len(rows), 2)
+
+
+class CloseOpenShiftsTestCase(TestCase):
+    """
+    Test case for the close_open_shifts command.
+    """
+    def setUp(self):
+        """
+        Set up a day schedule group and an overnight schedule group.
+        """
+        User = get_user_model()
+        self.day_group = ScheduleGroup.objects.create(
+            name="Day Shift",
+            default_schedule=TimePreset.objects.create(
+                name="Day", start_time=datetime.time(8, 0),
+                end_time=datetime.time(17, 0), grace_period_minutes=5
+            )
+        )
+        self.night_group = ScheduleGroup.objects.create(
+            name="Night Shift",
+            default_schedule=TimePreset.objects.create(
+                name="Night", start_time=datetime.time(22, 0),
+                end_time=datetime.time(6, 0), grace_period_minutes=5
+            )
+        )
+        self.users = [
+            User.objects.create_user(
+                employee_id=employee_id,
+                username=employee_id,
+                password="1234",
+                first_name="Test",
+                surname=employee_id,
+                schedule_group=group,
+            )
+            for employee_id, group in (
+                ("100001", self.day_group),
+                ("100002", self.day_group),
+                ("100003", self.night_group),
+                ("100004", self.day_group),
+            )
+        ]
+
+    def test_closes_stale_shifts_at_schedule_end(self):
+        """
+        Test that open shifts are closed at their group's end time.
+        """
+        day_entry = TimeEntry.objects.create(
+            user=self.users[0], time_in=datetime.datetime(2023, 5, 15, 8, 0)
+        )
+        after_hours = TimeEntry.objects.create(
+            user=self.users[1], time_in=datetime.datetime(2023, 5, 15, 18, 0)
+        )
+        night_entry = TimeEntry.objects.create(
+            user=self.users[2], time_in=datetime.datetime(2023, 5, 15, 22, 10)
+        )
+        closed_entry = TimeEntry.objects.create(
+            user=self.users[3],
+            time_in=datetime.datetime(2023, 5, 15, 8, 0),
+            time_out=datetime.datetime(2023, 5, 15, 12, 0),
+            hours_worked=4.0,
+        )
+
+        out = StringIO()
+        call_command("close_open_shifts", stdout=out)
+        self.assertIn("Closed 2 open shifts", out.getvalue())
+        self.assertIn("skipped 1", out.getvalue())
+
+        day_entry.refresh_from_db()
+        self.assertEqual(day_entry.time_out, datetime.datetime(2023, 5, 15, 17, 0))
+        self.assertEqual(day_entry.hours_worked, 9.0)
+
+        night_entry.refresh_from_db()
+        self.assertEqual(night_entry.time_out, datetime.datetime(2023, 5, 16, 6, 0))
+        self.assertEqual(night_entry.hours_worked, 7.83)
+
+        after_hours.refresh_from_db()
+        self.assertIsNone(after_hours.time_out)
+
+        closed_entry.refresh_from_db()
+        self.assertEqual(closed_entry.time_out, datetime.datetime(2023, 5, 15, 12, 0))
+
+    def test_dry_run_does_not_write(self):
+        """
+        Test that a dry run reports without closing anything.
+        """
+        entry = TimeEntry.objects.create(
+            user=self.users[0], time_in=datetime.datetime(2023, 5, 15, 8, 0)
+        )
+
+        out = StringIO()
+        call_command("close_open_shifts", "--dry-run", stdout=out)
+        self.assertIn("Would close 1 open shifts", out.getvalue())
+
+        entry.refresh_from_db()
+        self.assertIsNone(entry.time_out)
+
+
+class DailyAttendanceSummaryTestCase(TestCase):
+    """
+    Test case for the incrementally maintained daily attendance summaries.
+    """
+    def setUp(self):
+        """
+        Set up users in a company and department with an 8:00 schedule.
+        """
+        User = get_user_model()
+        self.company = Company.objects.create(name="Test Company")
+        self.department = Department.objects.create(name="Test Department")
+        group = ScheduleGroup.objects.create(
+            name="Test Group",
+            default_schedule=TimePreset.objects.create(
+                name="Default", start_time=datetime.time(8, 0),
+                end_time=datetime.time(17, 0), grace_period_minutes=5
+            )
+        )
+        self.user = User.objects.create_user(
+            employee_id="123456", username="123456", password="1234",
+            first_name="Test", surname="User", company=self.company,
+            department=self.department, schedule_group=group,
+            pin="1234", if_first_login=False, is_staff=True,
+        )
+        self.other_user = User.objects.create_user(
+            employee_id="654321", username="654321", password="1234",
+            first_name="Other", surname="User", company=self.company,
+            schedule_group=group,
+        )
+        self.day = datetime.date(2023, 5, 15)
+        get_schedule_table()
+
+    def summary(self, department=True):
+        """
+        Get the summary counters for the test day and group.
+        """
+        rows = DailyAttendanceSummary.objects.filter(
+            date=self.day, company=self.company,
+            department=self.department if department else None,
+        )
+        return [
+            tuple(getattr(row, field) for field in COUNTER_FIELDS) for row in rows
+        ]
+
+    def test_entry_changes_update_summary(self):
+        """
+        Test that clock in, clock out, edits and deletes adjust the counts.
+        """
+        entry = TimeEntry.objects.create(
+            user=self.user, time_in=datetime.datetime(2023, 5, 15, 8, 20)
+        )
+        # present, late, early, total minutes late, open
+        self.assertEqual(self.summary(), [(1, 1, 0, 20, 1)])
+
+        entry = TimeEntry.objects.get(pk=entry.pk)
+        entry.time_out = datetime.datetime(2023, 5, 15, 17, 0)
+        entry.save()
+        self.assertEqual(self.summary(), [(1, 1, 0, 20, 0)])
+
+        entry.time_in = datetime.datetime(2023, 5, 15, 7, 45)
+        entry.save()
+        self.assertEqual(self.summary(), [(1, 0, 1, 0, 0)])
+
+        TimeEntry.objects.create(
+            user=self.other_user, time_in=datetime.datetime(2023, 5, 15, 8, 10)
+        )
+        self.assertEqual(self.summary(department=False), [(1, 1, 0, 10, 1)])
+
+        entry.delete()
+        self.assertEqual(self.summary(), [(0, 0, 0, 0, 0)])
+
+    def test_bulk_paths_match_rebuild(self):
+        """
+        Test that bulk ingestion and closing shifts keep the counts exact.
+        """
+        ingest_punches([
+            {"type": "clock_in", "employee_id": "123456", "pin": "1234",
+             "timestamp": "2023-05-15T08:30:00"},
+        ])
+        TimeEntry.objects.create(
+            user=self.other_user, time_in=datetime.datetime(2023, 5, 15, 7, 50)
+        )
+        ingest_punches([
+            {"type": "clock_out", "employee_id": "123456", "pin": "1234",
+             "timestamp": "2023-05-15T17:00:00"},
+        ])
+        call_command("close_open_shifts", stdout=StringIO())
+
+        incremental = sorted(self.summary() + self.summary(department=False))
+        self.assertEqual(incremental, [(1, 0, 1, 0, 0), (1, 1, 0, 30, 0)])
+
+        rebuild_summaries(self.day, self.day)
+        self.assertEqual(sorted(self.summary() + self.summary(department=False)), incremental)
+
+    def test_dashboard_reads_summary(self):
+        """
+        Test that the dashboard counts come from the summary rows.
+        """
+        now = timezone.now()
+        entry = TimeEntry.clock_in(self.user)
+        TimeEntry.clock_in(self.other_user)
+        entry.clock_out()
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("dashboard_data"), secure=True)
+        data = json.loads(response.content)
+
+        self.assertEqual(data["total_time_in"], 2)
+        self.assertEqual(data["total_time_out"], 1)
+        late = TimeEntry.objects.filter(work_date=now.date(), is_late=True).count()
+        self.assertEqual(data["late_count"], late)
+        self.assertEqual(len(data["top_late"]), late)
+
+
+
+class KeysetPaginationTestCase(TestCase):
+    """
+    Test case for cursor pagination of the admin logs and attendance list.
+    """
+    def setUp(self):
+        """
+        Set up a staff user, admin logs and employees, and clear cached totals.
+        """
+        User = get_user_model()
+        self.staff = User.objects.create_user(
+            employee_id="654321",
+            username="654321",
+            password="1234",
+            first_name="Staff",
+            surname="User",
+            is_staff=True,
+        )
+        AdminLog.objects.bulk_create(
+            AdminLog(user=self.staff, action="navigation", description=f"Log {index}")
+            for index in range(12)
+        )
+        for index in range(7):
+            User.objects.create_user(
+                employee_id=f"7000{index:02d}",
+                username=f"7000{index:02d}",
+                password="1234",
+                first_name="Page",
+                surname=f"User{index}",
+            )
+        self.client = Client()
+        self.client.force_login(self.staff)
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def get(self, name, **params):
+        response = self.client.get(reverse(name), params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_log_cursors_walk_both_directions(self):
+        """
+        Test that next and prev cursors cover every log once, newest first.
+        """
+        expected = list(
+            AdminLog.objects.order_by("-timestamp", "-id").values_list("description", flat=True)
+        )
+
+        pages = []
+        data = self.get("get_logs", limit=5)
+        self.assertIsNone(data["prev"])
+        while True:
+            pages.append([log["description"] for log in data["logs"]])
+            if not data["next"]:
+                break
+            data = self.get("get_logs", limit=5, cursor=data["next"])
+
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(sum(pages, []), expected)
+
+        data = self.get("get_logs", limit=5, cursor=data["prev"])
+        self.assertEqual([log["description"] for log in data["logs"]], pages[1])
+        data = self.get("get_logs", limit=5, cursor=data["prev"])
+        self.assertEqual([log["description"] for log in data["logs"]], pages[0])
+        self.assertIsNone(data["prev"])
+
+    def test_deep_pages_do_not_offset_or_recount(self):
+        """
+        Test that later pages use no OFFSET and reuse the cached total.
+        """
+        first = self.get("get_logs", limit=2)
+
+        cursor = first["next"]
+        counts = []
+        for _ in range(4):
+            with CaptureQueriesContext(connection) as queries:
+                data = self.get("get_logs", limit=2, cursor=cursor)
+            sql = [query["sql"].upper() for query in queries]
+            self.assertFalse(any("OFFSET" in statement for statement in sql))
+            self.assertFalse(any("COUNT(" in statement for statement in sql))
+            counts.append(len(queries))
+            cursor = data["next"]
+
+        self.assertEqual(len(set(counts)), 1)
+
+    def test_total_is_cached_unless_exact(self):
+        """
+        Test that totals come from the cache until an exact total is requested.
+        """
+        self.assertEqual(self.get("get_logs")["total"], 12)
+        AdminLog.objects.create(user=self.staff, action="navigation", description="Late log")
+
+        data = self.get("get_logs")
+        self.assertEqual((data["total"], data["total_is_exact"]), (12, False))
+
+        data = self.get("get_logs", total="exact")
+        self.assertEqual((data["total"], data["total_is_exact"]), (13, True))
+
+    def test_invalid_cursor(self):
+        """
+        Test that a malformed cursor is rejected.
+        """
+        for name in ("get_logs", "attendance_list_json"):
+            response = self.client.get(reverse(name), {"cursor": "not-a-cursor"}, secure=True)
+            self.assertEqual(response.status_code, 400)
+
+    def test_attendance_users_pages(self):
+        """
+        Test that the active user list pages through every user once.
+        """
+        params = {"attendance_type": "users-active", "search": "Page", "limit": 3}
+        employee_ids = []
+        data = self.get("attendance_list_json", **params)
+        while True:
+            employee_ids += [user["employee_id"] for user in data["attendance_list"]]
+            if not data["next"]:
+                break
+            data = self.get("attendance_list_json", cursor=data["next"], **params)
+
+        self.assertEqual(employee_ids, [f"7000{index:02d}" for index in range(7)])
+        self.assertEqual(data["total"], 7)
+
+
+class NameSearchTestCase(TestCase):
+    """
+    Test case for the normalized name search keys.
+    """
+    def setUp(self):
+        """
+        Set up a staff user and employees with accented and multi-word names.
+        """
+        User = get_user_model()
+        self.staff = User.objects.create_user(
+            employee_id="654321",
+            username="654321",
+            password="1234",
+            first_name="Staff",
+            surname="User",
+            is_staff=True,
+        )
+        self.jose = User.objects.create_user(
+            employee_id="100001",
+            username="100001",
+            password="1234",
+            first_name="José  Miguel",
+            surname="Dela Cruz",
+        )
+        self.other = User.objects.create_user(
+            employee_id="100002",
+            username="100002",
+            password="1234",
+            first_name="Maria",
+            surname="Santos",
+        )
+        self.client = Client()
+        self.client.force_login(self.staff)
+
+    def search(self, term):
+        return set(
+            get_user_model().objects.filter(name_search_q(term)).values_list("employee_id", flat=True)
+        )
+
+    def test_search_keys(self):
+        """
+        Test that both name orders are stored lowercased and accent-folded.
+        """
+        self.assertEqual(self.jose.search_name, "jose miguel dela cruz")
+        self.assertEqual(self.jose.search_name_reversed, "dela cruz jose miguel")
+        self.assertEqual(normalize_name("  ÉLODIE\tO'Brien "), "elodie o'brien")
+
+    def test_search_matches_prefix_of_either_order(self):
+        """
+        Test that a term matches the start of the first or surname-first name.
+        """
+        for term in ("jose", "JOSÉ MIG", "jose miguel dela", "dela cruz", "Dela Cruz José"):
+            self.assertEqual(self.search(term), {"100001"}, term)
+        self.assertEqual(self.search("santos m"), {"100002"})
+        self.assertEqual(self.search("cruz"), set())
+
+    def test_search_keys_follow_name_changes(self):
+        """
+        Test that saving a name change, also with update_fields, refreshes the keys.
+        """
+        self.other.surname = "Reyes"
+        self.other.save(update_fields=["surname"])
+
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.search_name, "maria reyes")
+        self.assertEqual(self.search("reyes"), {"100002"})
+
+    def test_attendance_list_uses_search_keys(self):
+        """
+        Test that the attendance list searches users and time logs by the keys.
+        """
+        TimeEntry.clock_in(self.jose)
+        TimeEntry.clock_in(self.other)
+
+        for attendance_type in ("users-active", "time-log"):
+            response = self.client.get(
+                reverse("attendance_list_json"),
+                {"attendance_type": attendance_type, "search": "dela cruz j"},
+                secure=True,
+            )
+            data = json.loads(response.content)
+            self.assertEqual(
+                [row["employee_id"] for row in data["attendance_list"]], ["100001"]
+            )
+
+    def test_backfill_migration(self):
+        """
+        Test that the data migration fills the keys of existing users.
+        """
+        from django.apps import apps
+        backfill = importlib.import_module("attendance.migrations.0010_customuser_search_name")
+
+        get_user_model().objects.filter(pk=self.jose.pk).update(search_name="", search_name_reversed="")
+        backfill.backfill_search_names(apps, None)
+
+        self.assertEqual(self.search("dela cruz"), {"100001"})
+
+
+class CompanyAliasTestCase(TestCase):
+    """
+    Test case for the company alias map and company filters.
+    """
+    def setUp(self):
+        """
+        Set up companies, a legacy company row named after an alias, and users.
+        """
+        invalidate_company_map()
+        self.asc = Company.objects.create(name="ASC")
+        self.legacy = Company.objects.create(name="AgriDOM")
+        self.gti = Company.objects.create(name="GTI")
+        CompanyAlias.objects.create(alias="AgriDOM", company=self.asc, logo="agridom4.png")
+
+        User = get_user_model()
+        self.staff = User.objects.create_user(
+            employee_id="654321", username="654321", password="1234", is_staff=True
+        )
+        for employee_id, company in (("100001", self.asc), ("100002", self.legacy), ("100003", self.gti)):
+            User.objects.create_user(
+                employee_id=employee_id,
+                username=employee_id,
+                password="1234",
+                first_name="Company",
+                surname=employee_id,
+                company=company,
+            )
+        self.client = Client()
+        self.client.force_login(self.staff)
+
+    def tearDown(self):
+        invalidate_company_map()
+
+    def test_resolve_groups_companies_sharing_a_name(self):
+        """
+        Test that a code, name or alias resolves to every company of its group.
+        """
+        group = sorted([self.asc.id, self.legacy.id])
+        self.assertEqual(resolve_company_ids("asc"), group)
+        self.assertEqual(resolve_company_ids(" AGRIDOM "), group)
+        self.assertEqual(resolve_company_ids("GTI"), [self.gti.id])
+        self.assertEqual(resolve_company_ids("Unknown"), [])
+
+    def test_resolve_is_cached_and_invalidated_on_save(self):
+        """
+        Test that lookups need no queries until an alias is added.
+        """
+        resolve_company_ids("ASC")
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_company_ids("GT"), [])
+
+        CompanyAlias.objects.create(alias="GT", company=self.gti)
+        self.assertEqual(resolve_company_ids("gt"), [self.gti.id])
+
+    def test_company_logo(self):
+        """
+        Test that logos come from aliases, for the alias and its company.
+        """
+        self.assertEqual(get_company_logo("AgriDOM"), "agridom4.png")
+        self.assertEqual(get_company_logo("asc"), "agridom4.png")
+        self.assertEqual(get_company_logo("GTI"), DEFAULT_COMPANY_LOGO)
+        self.assertEqual(get_company_logo(None), DEFAULT_COMPANY_LOGO)
+
+    def test_attendance_list_filters_by_company_ids(self):
+        """
+        Test that the attendance list filters on the resolved company IDs.
+        """
+        response = self.client.get(
+            reverse("attendance_list_json"),
+            {"attendance_type": "users-active", "attendance_company": "ASC"},
+            secure=True,
+        )
+        data = json.loads(response.content)
+
+        self.assertEqual(
+            sorted(user["employee_id"] for user in data["attendance_list"]),
+            ["100001", "100002"],
+        )
+
+
+class AttendanceQueryCountTestCase(TestCase):
+    """
+    Test case for the query counts of the views built on the shared query builder.
+    """
+    def setUp(self):
+        """
+        Set up a staff user and a company, and warm the process-wide caches.
+        """
+        self.company = Company.objects.create(name="Query Company")
+        self.staff = User.objects.create_user(
+            employee_id="654321", username="654321", password="1234", is_staff=True
+        )
+        self.client = Client()
+        self.client.force_login(self.staff)
+        self.today = timezone.now().date()
+        self.created = 0
+        cache.clear()
+        get_company_map()
+
+    def tearDown(self):
+        cache.clear()
+
+    def _create_entries(self, count):
+        """
+        Bulk create users of the company with a late, early or on-time entry today.
+        """
+        users = User.objects.bulk_create([
+            User(
+                employee_id=str(200000 + self.created + i),
+                username=str(200000 + self.created + i),
+                first_name=f"First{i}",
+                surname=f"Last{i}",
+                company=self.company,
+            )
+            for i in range(count)
+        ])
+        self.created += count
+        now = timezone.now()
+        TimeEntry.objects.bulk_create([
+            TimeEntry(
+                user=user,
+                time_in=now,
+                time_out=now if i % 2 else None,
+                hours_worked=8.0 if i % 2 else None,
+                work_date=self.today,
+                is_late=i % 3 == 0,
+                minutes_late=(i % 3 - 1) * 10,
+            )
+            for i, user in enumerate(users)
+        ])
+        rebuild_summaries(self.today, self.today)
+
+    def _count_queries(self, name, params):
+        """
+        Request a view and return the number of queries it ran.
+        """
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name), params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, name, params):
+        """
+        Assert that a view runs the same number of queries for 3 and 30 entries.
+        """
+        self._create_entries(3)
+        small = self._count_queries(name, params)
+        self._create_entries(27)
+        large = self._count_queries(name, params)
+        self.assertEqual(small, large, name)
+        return large
+
+    def test_attendance_list_time_log(self):
+        """
+        Test that the time log query count does not grow with its length.
+        """
+        self.assertConstantQueries(
+            "attendance_list_json",
+            {"attendance_type": "time-log", "attendance_company": "Query Company", "limit": 100},
+        )
+
+    def test_attendance_list_users(self):
+        """
+        Test that the user list query count does not grow with its length.
+        """
+        self.assertConstantQueries(
+            "attendance_list_json", {"attendance_type": "users-active", "limit": 100}
+        )
+
+    def test_dashboard_data(self):
+        """
+        Test that the dashboard query count does not grow with today's entries.
+        """
+        self.assertConstantQueries("dashboard_data", {})
+
+    def test_todays_entries(self):
+        """
+        Test that the kiosk list query count does not grow with today's entries.
+        """
+        self.assertConstantQueries("get_todays_entries", {})
+
+    def test_export_by_date(self):
+        """
+        Test that the date export does not query per row.
+        """
+        self.assertConstantQueries("export_time_entries_by_date", {"date": self.today.isoformat()})
+
+    def test_export_range(self):
+        """
+        Test that the range export does not query per row.
+        """
+        day = self.today.isoformat()
+        self.assertConstantQueries(
+            "export_time_entries_range", {"date_start": day, "date_end": day}
+        )
+
+    def test_export_by_date_filters_employee(self):
+        """
+        Test that the date export honours the employee_id filter.
+        """
+        self._create_entries(3)
+        response = self.client.get(
+            reverse("export_time_entries_by_date"),
+            {"date": self.today.isoformat(), "employee_id": "200001"},
+            secure=True,
+        )
+        sheet = load_workbook(BytesIO(b"".join(response.streaming_content))).active
+        rows = list(sheet.iter_rows(min_row=2, values_only=True))
+
+        self.assertEqual([row[1] for row in rows], ["200001"])
+        self.assertEqual(rows[0][4], "Query Company")
+
+    def test_export_streams_rows_in_chunks(self):
+        """
+        Test that the export is streamed and reads rows across several chunks.
+        """
+        self._create_entries(5)
+        with mock.patch("attendance.exports.EXPORT_CHUNK_SIZE", 2):
+            response = self.client.get(
+                reverse("export_time_entries_by_date"),
+                {"date": self.today.isoformat()},
+                secure=True,
+            )
+
+        self.assertTrue(response.streaming)
+        self.assertIn('filename="time_entries_', response["Content-Disposition"])
+        sheet = load_workbook(BytesIO(b"".join(response.streaming_content))).active
+        rows = list(sheet.iter_rows(values_only=True))
+
+        self.assertEqual(rows[0], tuple(EXPORT_HEADERS))
+        self.assertEqual(
+            [row[1] for row in rows[1:]], [str(200000 + i) for i in range(5)]
+        )
+        self.assertEqual(rows[1][5], self.today.isoformat())
+        self.assertEqual(rows[1][9], "Yes")
+
+    def _export(self, export_format):
+        """
+        Request a range export of today in the given format.
+        """
+        day = self.today.isoformat()
+        return self.client.get(
+            reverse("export_time_entries_range"),
+            {"date_start": day, "date_end": day, "format": export_format},
+            secure=True,
+        )
+
+    def test_csv_export(self):
+        """
+        Test that the CSV export streams a header and one line per entry.
+        """
+        self._create_entries(3)
+        with mock.patch("attendance.exports.EXPORT_CHUNK_SIZE", 2):
+            response = self._export("csv")
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], CSV_CONTENT_TYPE)
+        self.assertTrue(response["Content-Disposition"].endswith('.csv"'))
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ",".join(EXPORT_HEADERS))
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith(f"{TimeEntry.objects.earliest('id').id},200000,First0,Last0,Query Company,"))
+        self.assertTrue(lines[1].endswith(",Yes"))
+
+    def test_jsonl_export(self):
+        """
+        Test that the JSON Lines export streams one object per entry.
+        """
+        self._create_entries(2)
+        response = self._export("jsonl")
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], JSONL_CONTENT_TYPE)
+        records = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual([record["employee_id"] for record in records], ["200000", "200001"])
+        self.assertIs(records[0]["is_late"], True)
+        self.assertIsNone(records[0]["hours_worked"])
+        self.assertEqual(records[1]["hours_worked"], 8.0)
+
+    def test_invalid_export_format(self):
+        """
+        Test that an unknown export format is rejected.
+        """
+        self.assertEqual(self._export("pdf").status_code, 400)
+
+    def test_time_log_loads_only_listed_columns(self):
+        """
+        Test that the time log selects only its columns in one joined query.
+        """
+        self._create_entries(3)
+        spec = AttendanceFilter(work_date=self.today, is_active=True)
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(entry_rows(spec, TIME_LOG_COLUMNS))
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("image_path", queries[0]["sql"])
+        self.assertNotIn("pin", queries[0]["sql"])
+
+
+class RowSerializerTestCase(TestCase):
+    """
+    Test case for the values_list row serializers and JSON encoding.
+    """
+    def test_time_formatting_matches_strftime(self):
+        """
+        Test that the fast formatters match strftime for every minute of a day.
+        """
+        start = datetime.datetime(2024, 3, 9, 0, 0, 7)
+        for minute in range(0, 24 * 60):
+            value = start + datetime.timedelta(minutes=minute)
+            self.assertEqual(clock_time(value), value.strftime("%I:%M %p"))
+            self.assertEqual(date_time(value), value.strftime("%Y-%m-%d %H:%M:%S"))
+        self.assertIsNone(clock_time(None))
+        self.assertEqual(date_time(None), "")
+
+    def test_fast_json_response(self):
+        """
+        Test that responses decode to the same data.
+        """
+        data = {"name": "José", "rows": [1, 2.5, None, True], "nested": {"a": ""}}
+        response = FastJsonResponse(data)
+
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(json.loads(response.content), data)
+        self.assertEqual(json.loads(dumps(data)), data)
+
+    def test_kiosk_list_matches_instance_serialization(self):
+        """
+        Test that the row serializer produces the same kiosk list as
+        serializing model instances, and that bench_serialization runs.
+        Timings are reported by the bench_serialization command.
+        """
+        company = Company.objects.create(name="Bench Company")
+        users = User.objects.bulk_create([
+            User(
+                employee_id=str(300000 + i),
+                username=str(300000 + i),
+                first_name=f"First{i}",
+                surname=f"Last{i}",
+                company=company if i % 2 else None,
+            )
+            for i in range(20)
+        ])
+        now = timezone.now()
+        TimeEntry.objects.bulk_create([
+            TimeEntry(user=user, time_in=now, time_out=now if i % 3 else None, work_date=now.date())
+            for i, user in enumerate(users)
+        ])
+
+        work_date = now.date()
+        self.assertEqual(
+            json.loads(serialize_instances(work_date)), json.loads(serialize_rows(work_date))
+        )
+
+        out = StringIO()
+        call_command("bench_serialization", "--date", work_date.isoformat(), "--repeat", "1", stdout=out)
+        self.assertIn(f"20 entries on {work_date}", out.getvalue())
+
+    def test_kiosk_row(self):
+        """
+        Test that a kiosk row is formatted like the kiosk list expects.
+        """
+        time_in = datetime.datetime(2024, 3, 9, 13, 5)
+        row = ("100001", "Juan", "Cruz", None, time_in, None, "img.jpg", time_in)
+
+        self.assertEqual(len(row), len(KIOSK_COLUMNS))
+        self.assertEqual(kiosk_row(row), {
+            "employee_id": "100001",
+            "first_name": "Juan",
+            "surname": "Cruz",
+            "company": "",
+            "time_in": "01:05 PM",
+            "time_out": None,
+            "image_path": "img.jpg",
+        })
+
+
+class ExportJobTestCase(TestCase):
+    """
+    Test case for background export jobs.
+    """
+    def setUp(self):
+        """
+        Set up a staff user with entries on two days, and a temporary export root.
+        """
+        export_root = tempfile.TemporaryDirectory()
+        self.addCleanup(export_root.cleanup)
+        settings_override = override_settings(EXPORT_ROOT=export_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.staff = User.objects.create_user(
+            employee_id="300000", username="300000", password="1234", is_staff=True
+        )
+        self.client = Client()
+        self.client.force_login(self.staff)
+        for day in (1, 2, 3):
+            TimeEntry.objects.create(
+                user=self.staff, time_in=datetime.datetime(2024, 3, day, 8, 0)
+            )
+
+    def _submit(self, client=None, **params):
+        """
+        Submit an export job for 2024-03-01 to 2024-03-02 without running it.
+        """
+        data = {"date_start": "2024-03-01", "date_end": "2024-03-02", "format": "csv"}
+        data.update(params)
+        with mock.patch("attendance.jobs._get_executor") as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = (client or self.client).post(reverse("export_jobs"), data, secure=True)
+        return response, get_executor
+
+    def test_submit_queues_job(self):
+        """
+        Test that a submitted job is pending and queued once its transaction commits.
+        """
+        response, get_executor = self._submit()
+
+        self.assertEqual(response.status_code, 202)
+        data = json.loads(response.content)
+        job = ExportJob.objects.get(pk=data["id"])
+        self.assertEqual(job.status, "PENDING")
+        self.assertEqual(job.filename, "time_entries_None.csv")
+        self.assertEqual(job.filters["date_from"], "2024-03-01")
+        self.assertIsNone(data["download_url"])
+        get_executor.return_value.submit.assert_called_once_with(mock.ANY, job.pk)
+
+    def test_run_and_download(self):
+        """
+        Test that a job writes its file privately, reports its progress and can be downloaded.
+        """
+        response, _ = self._submit()
+        job_id = json.loads(response.content)["id"]
+
+        with mock.patch("attendance.exports.EXPORT_CHUNK_SIZE", 1):
+            self.assertTrue(run_export_job(job_id))
+        self.assertFalse(run_export_job(job_id))
+
+        status = json.loads(self.client.get(
+            reverse("export_job_status", args=[job_id]), secure=True
+        ).content)
+        self.assertEqual(status["status"], "DONE")
+        self.assertEqual((status["rows_written"], status["total_rows"]), (2, 2))
+
+        response = self.client.get(status["download_url"], secure=True)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ",".join(EXPORT_HEADERS))
+        self.assertEqual(len(lines), 3)
+
+        # Stored under a random name in the export root, not the public media root
+        job = ExportJob.objects.get(pk=job_id)
+        path = job.file.path
+        self.assertEqual(os.path.dirname(path), os.path.join(settings.EXPORT_ROOT, "exports"))
+        self.assertNotIn(job.filename, path)
+        self.assertRegex(os.path.basename(path), r"^[0-9a-f]{32}\.csv$")
+        job.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_failed_job(self):
+        """
+        Test that a job that raises is marked failed with its error.
+        """
+        response, _ = self._submit()
+        job_id = json.loads(response.content)["id"]
+
+        with mock.patch("attendance.jobs.write_export", side_effect=OSError("disk full")):
+            run_export_job(job_id)
+
+        job = ExportJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.error), ("FAILED", "disk full"))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_download_before_done(self):
+        """
+        Test that a job's file cannot be downloaded before it is done.
+        """
+        response, _ = self._submit()
+        job_id = json.loads(response.content)["id"]
+
+        response = self.client.get(reverse("export_job_download", args=[job_id]), secure=True)
+        self.assertEqual(response.status_code, 409)
+
+    def test_jobs_are_private(self):
+        """
+        Test that users cannot see other users' jobs.
+        """
+        response, _ = self._submit()
+        job_id = json.loads(response.content)["id"]
+
+        other = User.objects.create_user(employee_id="300001", username="300001", password="1234")
+        client = Client()
+        client.force_login(other)
+        response = client.get(reverse("export_job_status", args=[job_id]), secure=True)
+        self.assertEqual(response.status_code, 404)
+
+    def test_submit_requires_staff(self):
+        """
+        Test that users who are not staff cannot submit export jobs.
+        """
+        employee = User.objects.create_user(employee_id="300001", username="300001", password="1234")
+        client = Client()
+        client.force_login(employee)
+
+        response, get_executor = self._submit(client)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(ExportJob.objects.exists())
+        get_executor.assert_not_called()
+
+    def test_active_job_limit(self):
+        """
+        Test that a user cannot have more than MAX_ACTIVE_JOBS_PER_USER jobs in progress.
+        """
+        for _ in range(MAX_ACTIVE_JOBS_PER_USER):
+            self.assertEqual(self._submit()[0].status_code, 202)
+
+        response, get_executor = self._submit()
+        self.assertEqual(response.status_code, 429)
+        get_executor.assert_not_called()
+
+    def test_invalid_parameters(self):
+        """
+        Test that a job with invalid parameters is rejected.
+        """
+        response, _ = self._submit(format="pdf")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_command_runs_left_over_jobs(self):
+        """
+        Test that run_export_jobs requeues running jobs whose heartbeat stopped,
+        leaves running jobs with a recent heartbeat alone, and runs pending ones.
+        """
+        stale, _ = self._submit()
+        pending, _ = self._submit(format="jsonl")
+        alive, _ = self._submit(format="xlsx")
+        long_ago = timezone.now() - datetime.timedelta(hours=2)
+        ExportJob.objects.filter(pk=json.loads(stale.content)["id"]).update(
+            status="RUNNING", started_at=long_ago, updated_at=long_ago
+        )
+        ExportJob.objects.filter(pk=json.loads(alive.content)["id"]).update(
+            status="RUNNING", started_at=long_ago, updated_at=timezone.now()
+        )
+
+        out = StringIO()
+        call_command("run_export_jobs", stdout=out)
+
+        self.assertIn("Ran 2 export jobs; requeued 1 stale running jobs", out.getvalue())
+        self.assertEqual(
+            ExportJob.objects.get(pk=json.loads(alive.content)["id"]).status, "RUNNING"
+        )
+        self.assertEqual(
+            set(ExportJob.objects.exclude(status="RUNNING").values_list("status", flat=True)),
+            {"DONE"},
+        )
+
+    def test_running_job_limit(self):
+        """
+        Test that no more than MAX_RUNNING_JOBS jobs run at once, and a job
+        left pending is run once a running job finishes.
+        """
+        job_ids = []
+        for index in range(MAX_RUNNING_JOBS + 1):
+            user = User.objects.create_user(
+                employee_id=str(300010 + index), username=str(300010 + index), password="1234",
+                is_staff=True,
+            )
+            client = Client()
+            client.force_login(user)
+            job_ids.append(json.loads(self._submit(client)[0].content)["id"])
+        ExportJob.objects.filter(pk__in=job_ids[:MAX_RUNNING_JOBS]).update(
+            status="RUNNING", started_at=timezone.now(), updated_at=timezone.now()
+        )
+
+        self.assertFalse(run_export_job(job_ids[-1]))
+        self.assertEqual(ExportJob.objects.get(pk=job_ids[-1]).status, "PENDING")
+
+        ExportJob.objects.filter(pk=job_ids[0]).update(status="DONE")
+        self.assertTrue(run_next_export_job())
+        self.assertEqual(ExportJob.objects.get(pk=job_ids[-1]).status, "DONE")
+
+
+class ExportCacheTestCase(TestCase):
+    """
+    Test case for the disk cache of past range exports.
+    """
+    def setUp(self):
+        """
+        Set up a staff user with entries in a past month, and a temporary export root.
+        """
+        export_root = tempfile.TemporaryDirectory()
+        self.addCleanup(export_root.cleanup)
+        settings_override = override_settings(EXPORT_ROOT=export_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.staff = User.objects.create_user(
+            employee_id="400000", username="400000", password="1234", is_staff=True
+        )
+        self.client = Client()
+        self.client.force_login(self.staff)
+        self.entries = [
+            TimeEntry.objects.create(
+                user=self.staff, time_in=datetime.datetime(2024, 3, day, 8, 0)
+            )
+            for day in (1, 2, 3)
+        ]
+
+    def _export(self, **params):
+        """
+        Request a CSV range export of 2024-03-01 to 2024-03-03 and return its body.
+        """
+        data = {"date_start": "2024-03-01", "date_end": "2024-03-03", "format": "csv"}
+        data.update(params)
+        response = self.client.get(reverse("export_time_entries_range"), data, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def test_repeat_export_served_from_cache(self):
+        """
+        Test that a repeated past range export is served without being regenerated.
+        """
+        with mock.patch("attendance.exports.export_rows", wraps=export_rows) as rows:
+            first = self._export()
+            second = self._export()
+
+        self.assertEqual(first, second)
+        self.assertEqual(rows.call_count, 1)
+        self.assertEqual(len(os.listdir(get_cache_dir())), 1)
+
+    def test_edited_entry_regenerates_export(self):
+        """
+        Test that editing or deleting an entry in the range changes the cached export.
+        """
+        first = self._export()
+
+        entry = self.entries[1]
+        entry.time_out = datetime.datetime(2024, 3, 2, 17, 0)
+        entry.save()
+        edited = self._export()
+        self.assertNotEqual(first, edited)
+        self.assertIn(b"17:00:00", edited)
+
+        self.entries[2].delete()
+        self.assertEqual(len(self._export().splitlines()), 3)
+
+    def test_renamed_employee_regenerates_export(self):
+        """
+        Test that renaming an employee or their company changes the cached export.
+        """
+        company = Company.objects.create(name="Old Company")
+        self.staff.company = company
+        self.staff.save()
+        self.assertIn(b"Old Company", self._export())
+
+        self.staff.first_name = "Renamed"
+        self.staff.save()
+        self.assertIn(b"Renamed", self._export())
+
+        company.name = "New Company"
+        company.save()
+        self.assertIn(b"New Company", self._export())
+
+        # Saving fields that are not exported keeps the cached export
+        version = get_names_version()
+        self.staff.last_login = timezone.now()
+        self.staff.save(update_fields=["last_login"])
+        self.assertEqual(get_names_version(), version)
+
+    def test_miss_streamed_and_abandoned_export_not_cached(self):
+        """
+        Test that a CSV export is streamed on a cache miss and not cached if
+        the client disconnects before it is complete.
+        """
+        response = self.client.get(reverse("export_time_entries_range"), {
+            "date_start": "2024-03-01", "date_end": "2024-03-03", "format": "csv",
+        }, secure=True)
+
+        self.assertNotIsInstance(response, FileResponse)
+        self.assertEqual(next(response.streaming_content), ",".join(EXPORT_HEADERS).encode() + b"\r\n")
+        response.close()
+        self.assertEqual(os.listdir(get_cache_dir()), [])
+
+        self._export()
+        self.assertEqual(len(os.listdir(get_cache_dir())), 1)
+
+    def test_cache_key(self):
+        """
+        Test that the key ignores the order of excluded dates but not the format.
+        """
+        spec = AttendanceFilter(
+            date_from=datetime.date(2024, 3, 1), date_to=datetime.date(2024, 3, 3)
+        )
+        key = export_cache_key(spec._replace(exclude_dates=("2024-03-01", "2024-03-02")), "csv")
+
+        self.assertEqual(
+            key, export_cache_key(spec._replace(exclude_dates=("2024-03-02", "2024-03-01")), "csv")
+        )
+        self.assertNotEqual(key, export_cache_key(spec, "csv"))
+        self.assertNotEqual(key, export_cache_key(spec._replace(exclude_dates=("2024-03-01", "2024-03-02")), "jsonl"))
+
+    def test_open_range_not_cached(self):
+        """
+        Test that a range ending today is streamed and not cached.
+        """
+        today = timezone.now().date().isoformat()
+        response = self.client.get(reverse("export_time_entries_range"), {
+            "date_start": "2024-03-01", "date_end": today, "format": "csv",
+        }, secure=True)
+
+        self.assertNotIsInstance(response, FileResponse)
+        b"".join(response.streaming_content)
+        self.assertFalse(os.path.exists(get_cache_dir()))
+
+    def test_least_recently_used_evicted(self):
+        """
+        Test that eviction deletes the least recently used files first.
+        """
+        os.makedirs(get_cache_dir())
+        paths = []
+        for i, name in enumerate(["old.csv", "used.csv", "new.csv"]):
+            path = os.path.join(get_cache_dir(), name)
+            with open(path, "wb") as output:
+                output.write(b"x" * 100)
+            os.utime(path, (1000 + i, 1000 + i))
+            paths.append(path)
+        # Serving "old" makes it the most recently used
+        os.utime(paths[0], (2000, 2000))
+
+        self.assertEqual(evict_exports(max_bytes=200), 1)
+        self.assertEqual(sorted(os.listdir(get_cache_dir())), ["new.csv", "old.csv"])
+
+
+class InlinePool:
+    """
+    A process pool stand-in that runs each task when it is submitted.
+    """
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class ExportShardTestCase(TestCase):
+    """
+    Test case for sharded range exports.
+    """
+    def setUp(self):
+        """
+        Set up employees of two companies and one without a company, with
+        entries from January to March 2024, and a temporary export root.
+        """
+        export_root = tempfile.TemporaryDirectory()
+        self.addCleanup(export_root.cleanup)
+        settings_override = override_settings(EXPORT_ROOT=export_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        workers = mock.patch("attendance.export_shards.SHARD_WORKERS", 1)
+        workers.start()
+        self.addCleanup(workers.stop)
+
+        self.staff = User.objects.create_user(
+            employee_id="500000", username="500000", password="1234", is_staff=True
+        )
+        self.client = Client()
+        self.client.force_login(self.staff)
+
+        alpha = Company.objects.create(name="Alpha")
+        beta = Company.objects.create(name="Beta")
+        for employee_id, company, month in (
+            ("500001", alpha, 1), ("500001", alpha, 2), ("500002", beta, 2), ("500000", None, 3)
+        ):
+            user, _ = User.objects.get_or_create(
+                employee_id=employee_id, defaults={"username": employee_id, "company": company}
+            )
+            TimeEntry.objects.create(
+                user=user,
+                time_in=datetime.datetime(2024, month, 5, 8, 0),
+                time_out=datetime.datetime(2024, month, 5, 16, 30),
+                hours_worked=8.5,
+            )
+        get_company_map()
+
+    def _export(self, **params):
+        """
+        Request a sharded range export of January to March 2024 and open its zip.
+        """
+        data = {"date_start": "2024-01-01", "date_end": "2024-03-31", "format": "csv"}
+        data.update(params)
+        response = self.client.get(reverse("export_time_entries_range"), data, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response, zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+
+    def test_month_shards(self):
+        """
+        Test that a range is split into calendar months clipped to the range.
+        """
+        spec = AttendanceFilter(
+            date_from=datetime.date(2024, 1, 15), date_to=datetime.date(2024, 3, 10)
+        )
+        shards = month_shards(spec)
+
+        self.assertEqual([label for label, _ in shards], ["2024-01", "2024-02", "2024-03"])
+        self.assertEqual(
+            [(shard.date_from.day, shard.date_to.day) for _, shard in shards],
+            [(15, 31), (1, 29), (1, 10)],
+        )
+
+    def test_export_by_month(self):
+        """
+        Test that a month sharded export zips one file per month and a summary.
+        """
+        response, archive = self._export(shard="month")
+
+        self.assertEqual(response["Content-Type"], "application/zip")
+        self.assertIn("_by_month.zip", response["Content-Disposition"])
+        self.assertEqual(
+            archive.namelist(), ["2024-01.csv", "2024-02.csv", "2024-03.csv", "summary.csv"]
+        )
+        self.assertEqual(len(archive.read("2024-02.csv").decode().splitlines()), 3)
+
+        summary = list(csv.reader(archive.read("summary.csv").decode().splitlines()))
+        self.assertEqual(summary[0], ["Shard", "File", "Entries", "Employees", "Hours Worked", "Late"])
+        self.assertEqual(summary[2], ["2024-02", "2024-02.csv", "2", "2", "17.0", "0"])
+        self.assertEqual(summary[-1], ["Total", "", "4", "3", "34.0", "0"])
+
+    def test_export_by_company(self):
+        """
+        Test that a company sharded export has one file per company and one
+        for employees without a company, and that aliases share a file.
+        """
+        CompanyAlias.objects.create(alias="Beta", company=Company.objects.get(name="Alpha"))
+        get_company_map()
+
+        _, archive = self._export(shard="company", format="xlsx")
+
+        self.assertEqual(archive.namelist(), ["Alpha.xlsx", "No_Company.xlsx", "summary.csv"])
+        sheet = load_workbook(BytesIO(archive.read("Alpha.xlsx"))).active
+        self.assertEqual(sheet.max_row, 4)
+
+    def test_shards_run_in_pool(self):
+        """
+        Test that shards are submitted to the process pool when it has several workers.
+        """
+        pool = InlinePool()
+        with mock.patch("attendance.export_shards.SHARD_WORKERS", 4), \
+                mock.patch("attendance.export_shards._get_pool", return_value=pool), \
+                mock.patch("attendance.export_shards._write_shard_in_worker", write_shard):
+            _, archive = self._export(shard="month", date_start="2024-01-01", date_end="2024-02-29")
+
+        self.assertEqual(pool.submitted, 2)
+        self.assertEqual(archive.namelist(), ["2024-01.csv", "2024-02.csv", "summary.csv"])
+
+    def test_broken_pool_replaced(self):
+        """
+        Test that a pool broken by a dead worker is shut down and replaced
+        before the shards are submitted.
+        """
+        broken = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        with self.assertRaises(BrokenProcessPool):
+            broken.submit(os._exit, 1).result()
+
+        pool = InlinePool()
+        with mock.patch("attendance.export_shards.SHARD_WORKERS", 4), \
+                mock.patch("attendance.export_shards._pool", broken), \
+                mock.patch("attendance.export_shards.ProcessPoolExecutor", return_value=pool) as new_pool, \
+                mock.patch("attendance.export_shards._write_shard_in_worker", write_shard):
+            _, archive = self._export(shard="month", date_start="2024-01-01", date_end="2024-02-29")
+
+        new_pool.assert_called_once()
+        self.assertEqual(pool.submitted, 2)
+        self.assertEqual(archive.namelist(), ["2024-01.csv", "2024-02.csv", "summary.csv"])
+
+    def test_invalid_shard(self):
+        """
+        Test that an unknown shard type is rejected.
+        """
+        response = self.client.get(reverse("export_time_entries_range"), {
+            "date_start": "2024-01-01", "date_end": "2024-03-31", "shard": "week",
+        }, secure=True)
+        self.assertEqual(response.status_code, 400)
+
+    def test_range_export_requires_staff(self):
+        """
+        Test that anonymous users are redirected to log in and non-staff users
+        are refused, without starting a sharded export.
+        """
+        data = {"date_start": "2024-01-01", "date_end": "2024-03-31", "shard": "month"}
+        with mock.patch("attendance.views.sharded_response") as sharded:
+            response = Client().get(reverse("export_time_entries_range"), data, secure=True)
+            self.assertEqual(response.status_code, 302)
+            self.assertIn(reverse("login"), response["Location"])
+
+            employee = User.objects.get(employee_id="500001")
+            client = Client()
+            client.force_login(employee)
+            response = client.get(reverse("export_time_entries_range"), data, secure=True)
+            self.assertEqual(response.status_code, 403)
+
+            response = client.get(
+                reverse("export_time_entries_by_date"), {"date": "2024-01-05"}, secure=True
+            )
+            self.assertEqual(response.status_code, 403)
+        sharded.assert_not_called()
+
+    def test_sharded_job(self):
+        """
+        Test that an export job can be sharded.
+        """
+        with mock.patch("attendance.jobs._get_executor"):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse("export_jobs"), {
+                    "date_start": "2024-01-01", "date_end": "2024-03-31", "shard": "month",
+                }, secure=True)
+        job_id = json.loads(response.content)["id"]
+        run_export_job(job_id)
+
+        job = ExportJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.filename), ("DONE", "time_entries_None_by_month.zip"))
+        self.assertEqual(job.rows_written, 4)
+        with job.file.open("rb") as output:
+            self.assertEqual(len(zipfile.ZipFile(output).namelist()), 4)
+
+
+class TimesheetExportTestCase(TestCase):
+    """
+    Test case for the payroll timesheet export.
+    """
+    def setUp(self):
+        """
+        Set up two employees with late, early and on-time entries in March 2024.
+        """
+        self.staff = User.objects.create_user(
+            employee_id="600000", username="600000", password="1234", is_staff=True
+        )
+        self.client = Client()
+        self.client.force_login(self.staff)
+        company = Company.objects.create(name="Payroll Company")
+        self.first = User.objects.create_user(
+            employee_id="600001", username="600001", first_name="Ana", surname="Reyes", company=company
+        )
+        self.second = User.objects.create_user(
+            employee_id="600002", username="600002", first_name="Ben", surname="Cruz"
+        )
+        for user, day, hours, is_late, minutes_late in (
+            (self.first, 4, 8.0, True, 15),
+            (self.first, 5, 7.5, True, 5),
+            (self.first, 6, 8.25, False, -10),
+            (self.first, 8, 8.0, True, 30),
+            (self.second, 4, 8.0, False, 0),
+            (self.first, 29, 8.0, True, 60),
+        ):
+            entry = TimeEntry.objects.create(
+                user=user, time_in=datetime.datetime(2024, 3, day, 8, 0)
+            )
+            TimeEntry.objects.filter(pk=entry.pk).update(
+                hours_worked=hours, is_late=is_late, minutes_late=minutes_late
+            )
+
+    def _export(self, **params):
+        """
+        Request a timesheet of 2024-03-01 to 2024-03-15.
+        """
+        data = {"date_start": "2024-03-01", "date_end": "2024-03-15", "format": "csv"}
+        data.update(params)
+        return self.client.get(reverse("export_timesheet"), data, secure=True)
+
+    def test_timesheet_totals(self):
+        """
+        Test that the timesheet totals each employee's entries in the range.
+        """
+        response = self._export(exclude_date=["2024-03-08"])
+
+        self.assertTrue(response.streaming)
+        self.assertIn('filename="timesheet_2024-03-01_2024-03-15.csv"', response["Content-Disposition"])
+        rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows, [
+            TIMESHEET_HEADERS,
+            ["600001", "Ana", "Reyes", "Payroll Company", "3", "23.75", "2", "20", "1"],
+            ["600002", "Ben", "Cruz", "", "1", "8.0", "0", "0", "0"],
+        ])
+
+    def test_timesheet_is_one_grouped_query(self):
+        """
+        Test that the timesheet reads one row per employee from one grouped query.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self._export(format="jsonl")
+            records = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+        entry_queries = [query["sql"] for query in queries if TimeEntry._meta.db_table in query["sql"]]
+        self.assertEqual(len(entry_queries), 1)
+        self.assertIn("GROUP BY", entry_queries[0])
+        self.assertEqual(records[0]["days_present"], 4)
+        self.assertEqual(records[0]["total_minutes_late"], 50)
+
+    def test_timesheet_workbook(self):
+        """
+        Test that the timesheet can be exported as an Excel workbook.
+        """
+        response = self._export(format="xlsx", employee_id="600002")
+
+        sheet = load_workbook(BytesIO(b"".join(response.streaming_content))).active
+        self.assertEqual(sheet.title, "Timesheet")
+        self.assertEqual(list(sheet.iter_rows(min_row=2, values_only=True)), [
+            ("600002", "Ben", "Cruz", None, 1, 8, 0, 0, 0),
+        ])
+
+    def test_timesheet_cannot_be_sharded(self):
+        """
+        Test that a sharded timesheet is rejected.
+        """
+        self.assertEqual(self._export(shard="month").status_code, 400)
+
+    def test_timesheet_requires_staff_or_hr(self):
+        """
+        Test that anonymous users are redirected to log in, other employees
+        are refused and HR users can export.
+        """
+        self.client.logout()
+        response = self._export()
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse("login"), response["Location"])
+
+        self.client.force_login(self.first)
+        self.assertEqual(self._export().status_code, 403)
+
+        self.first.is_hr = True
+        self.first.save()
+        self.assertEqual(self._export().status_code, 200)
+
 if __name__ == '__main__':
     import unittest
     unittest.main()
\ No newline at end of file
@@ -10,7 +10,9 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('clock_in/', views.clock_in_view, name='clock_in'),
     path('clock_out/', views.clock_out_view, name='clock_out'),
+    path('bulk_punch/', views.bulk_punch_view, name='bulk_punch'),
     path('get_todays_entries/', views.get_todays_entries, name='get_todays_entries'),
+    path('attendance_events/', views.attendance_events, name='attendance_events'),
     path('custom_admin_page/', views.custom_admin_page, name='custom_admin_page'),
     path('upload_image/', views.upload_image, name='upload_image'),
     path('announcements/', views.announcements_list_create, name='announcements_list_create'),
@@ -23,10 +25,15 @@ urlpatterns = [
     path('attendance_list_json/', views.attendance_list_json, name='attendance_list_json'),
     path('dashboard-data/', views.dashboard_data, name='dashboard_data'),
     path('get_logs/', views.get_logs, name='get_logs'),
+    path('metrics/', views.metrics_view, name='metrics'),
     path('leaves/pending/', views.get_pending_leaves, name='get_pending_leaves'),
     path('leaves/process/', views.process_leave, name='process_leave'),
     path('export_time_entries_range/', views.export_time_entries_range, name='export_time_entries_range'),
     path('export_time_entries_by_date/', views.export_time_entries_by_date, name='export_time_entries_by_date'),
+    path('export_timesheet/', views.export_timesheet, name='export_timesheet'),
+    path('export_jobs/', views.export_jobs, name='export_jobs'),
+    path('export_jobs/<int:pk>/', views.export_job_status, name='export_job_status'),
+    path('export_jobs/<int:pk>/download/', views.export_job_download, name='export_job_download'),
     path('leaves/pending/', views.get_pending_leaves, name='get_pending_leaves'),
     path('leaves/process/', views.process_leave, name='process_leave'),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
@@ -2,31 +2,10 @@
 Utility functions and constants for the attendance app.
 """
 import datetime
+import unicodedata
 
-# Mapping: key is the code; value is a tuple (main, alias) that should match exactly what's stored in the database.
-COMPANY_CHOICES = {
-    'ASC': ('ASC', 'AgriDOM'),
-    'SFGCI': ('SFGCI', 'SFGC'),
-    'DJAS': ('DJAS', 'DSC'),
-    'FAC': ('FAC',),  # only one value; no alias
-    'GTI': ('GTI',),
-    'SMI': ('SMI',),
-}
-
-# Company logo mapping
-COMPANY_LOGO_MAPPING = {
-    "sfgc": "sfgroup.png",
-    "asc": "agridom4.png",
-    "sfgci": "sfgroup.png",
-    "smi": "sunfood.png",
-    "gti": "geniustech.png",
-    "fac": "farmtech.png",
-    "djas": "djas.png",
-    "agridom": "agridom4.png",
-    "dsc": "djas.png",
-    "default": "default_logo.png",
-
-}
+from django.db.models import Q
+from django.utils import timezone
 
 # Department mapping
 DEPARTMENT_CHOICES = {
@@ -85,6 +64,75 @@ def get_day_code(date):
     """
     return DAY_CODE_MAPPING[date.weekday()]
 
+def get_work_date(value=None):
+    """
+    Get the local calendar date (work day) of a datetime.
+
+    Args:
+        value (datetime, optional): An aware or naive local datetime. Defaults
+                                    to the current time.
+
+    Returns:
+        date: The date in the server's time zone.
+    """
+    value = value or timezone.now()
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
+
+def normalize_name(value):
+    """
+    Normalize a name or search term for matching.
+
+    Args:
+        value (str): The name or search term, or None.
+
+    Returns:
+        str: The value lowercased, with accents removed and whitespace
+             collapsed to single spaces.
+    """
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return " ".join(value.casefold().split())
+
+def get_name_search_keys(first_name, surname):
+    """
+    Build a user's name search keys.
+
+    Args:
+        first_name (str): The user's first name, or None.
+        surname (str): The user's surname, or None.
+
+    Returns:
+        tuple: The normalized "first surname" and "surname first" keys.
+    """
+    first_name, surname = normalize_name(first_name), normalize_name(surname)
+    return (
+        " ".join(filter(None, (first_name, surname))),
+        " ".join(filter(None, (surname, first_name))),
+    )
+
+def name_search_q(query, prefix=""):
+    """
+    Build a filter matching users whose name starts with a search term.
+
+    The term matches the start of either the "first surname" or the
+    "surname first" search key, so both "juan dela" and "dela cruz j" find
+    Juan Dela Cruz. The keys are already lowercase; istartswith compiles to a
+    plain LIKE 'term%' on MySQL, which can use the keys' indexes.
+
+    Args:
+        query (str): The search term.
+        prefix (str): The lookup path to the user, e.g. "user__".
+
+    Returns:
+        Q: The filter.
+    """
+    term = normalize_name(query)
+    return Q(**{f"{prefix}search_name__istartswith": term}) | Q(
+        **{f"{prefix}search_name_reversed__istartswith": term}
+    )
+
 def format_minutes(minutes):
     """
     Format minutes to display lateness or earliness.
@@ -102,22 +150,6 @@ def format_minutes(minutes):
     else:
         return "On time"
 
-def get_company_logo(company_name):
-    """
-    Retrieve the company logo filename based on the company name.
-
-    Args:
-        company_name (str): The name of the company.
-
-    Returns:
-        str: The filename of the company logo.  Returns a default logo if the company name is not found.
-    """
-    if not company_name:
-        return COMPANY_LOGO_MAPPING["default"]
-
-    company_name = company_name.strip().lower()
-    return COMPANY_LOGO_MAPPING.get(company_name, COMPANY_LOGO_MAPPING["default"])
-
 def create_default_time_preset(day_code):
     """
     Create a default TimePreset object for a given day code.
@@ -1,13 +1,15 @@
 import json
 import os
-from datetime import date, datetime, time, timedelta
-from io import BytesIO
+from datetime import datetime, timedelta
+from operator import itemgetter
 
 from django.contrib import messages
 from django.contrib.auth import login, logout
 from django.urls import reverse
 from .models import (
     CustomUser,
+    DailyAttendanceSummary,
+    ExportJob,
     TimeEntry,
     Announcement,
     AdminLog,
@@ -16,24 +18,83 @@ from .models import (
 from django.views.decorators.cache import never_cache
 from django.contrib.auth.decorators import login_required
 from django.core.files.base import ContentFile
+from django.core.handlers.asgi import ASGIRequest
 from django.core.files.storage import default_storage
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET, require_POST
 
-from django.db.models import Q
-from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.utils.dateparse import parse_date
-from openpyxl import Workbook
 
+from .auth_cache import FAILED_ATTEMPT_WINDOW, THROTTLED_MESSAGE, authenticate_pin, get_cached_user
+from .companies import get_company_logo
+from .events import broker, stream_events
+from .export_shards import SHARD_TYPES, sharded_response
+from .exports import EXPORT_FORMATS, export_response, timesheet_response
+from .jobs import ExportJobLimitError, submit_export_job
+from .metrics import PROMETHEUS_CONTENT_TYPE, render_metrics
+from .pagination import InvalidCursor, count_rows, get_page_size, keyset_page
+from .queries import (
+    ADMIN_LOG_COLUMNS,
+    DASHBOARD_COLUMNS,
+    LEAVE_COLUMNS,
+    TIME_LOG_COLUMNS,
+    AttendanceFilter,
+    entry_rows,
+    user_rows,
+)
+from .serializers import (
+    FastJsonResponse,
+    admin_log_row,
+    clock_time,
+    dashboard_row,
+    leave_row,
+    time_log_row,
+    user_row,
+)
+from .services import (
+    MAX_BULK_PUNCHES,
+    ClockInError,
+    clock_in_user,
+    get_attendance_list,
+    ingest_punches,
+)
 from .utils import (
-    COMPANY_CHOICES,
-    DEPARTMENT_CHOICES,
-    get_company_logo,
+    get_client_ip,
+    get_work_date,
     log_admin_action,
+    name_search_q,
 )
 
+
+def pin_error_response(error_message):
+    """
+    Build the response to a failed PIN authentication.
+
+    Args:
+        error_message (str): The error from authenticate_pin().
+
+    Returns:
+        JsonResponse: The error, with status 429 and a Retry-After header if
+                      the attempt was throttled.
+    """
+    response = JsonResponse({"success": False, "error": error_message})
+    if error_message == THROTTLED_MESSAGE:
+        response.status_code = 429
+        response["Retry-After"] = str(FAILED_ATTEMPT_WINDOW)
+    return response
+
+
 @never_cache
 def login_view(request):
     """
@@ -53,44 +114,35 @@ def login_view(request):
         employee_id = request.POST.get("employee_id")
         pin = request.POST.get("pin")
 
-        try:
-            # First check if user exists and is active
-            user = CustomUser.objects.get(employee_id=employee_id)
-
-            if not user.is_active:
-                return render(
-                    request, "login_page.html", {"error": "This account is inactive"}
-                )
+        auth_result, error_message = authenticate_pin(
+            employee_id, pin, get_client_ip(request)
+        )
 
-            # Try to authenticate
-            auth_result = CustomUser.authenticate_by_pin(employee_id, pin)
+        if auth_result:  # Successful login
+            user = (
+                auth_result
+                if isinstance(auth_result, CustomUser)
+                else auth_result["user"]
+            )
+            login(request, user)
+            log_admin_action(request, "login", f"Successfully logged in")
 
-            if auth_result:  # Successful login
-                user = (
-                    auth_result
-                    if isinstance(auth_result, CustomUser)
-                    else auth_result["user"]
-                )
-                login(request, user)
-                log_admin_action(request, "login", f"Successfully logged in")
-
-                if user.is_guard:
-                    return redirect("user_page")
-                elif user.is_staff or user.is_superuser:
-                    return redirect("custom_admin_page")
-                else:
-                    return render(
-                        request,
-                        "login_page.html",
-                        {"error": "You do not have permission to log in"},
-                    )
+            if user.is_guard:
+                return redirect("user_page")
+            elif user.is_staff or user.is_superuser:
+                return redirect("custom_admin_page")
             else:
-                return render(request, "login_page.html", {"error": "Incorrect PIN"})
-
-        except CustomUser.DoesNotExist:
-            return render(
-                request, "login_page.html", {"error": "Employee ID not found"}
-            )
+                return render(
+                    request,
+                    "login_page.html",
+                    {"error": "You do not have permission to log in"},
+                )
+        else:
+            response = render(request, "login_page.html", {"error": error_message})
+            if error_message == THROTTLED_MESSAGE:
+                response.status_code = 429
+                response["Retry-After"] = str(FAILED_ATTEMPT_WINDOW)
+            return response
 
     return render(request, "login_page.html")
 
@@ -117,11 +169,8 @@ def user_page(request):
         )
         return redirect("custom_admin_page")
 
-    now = timezone.now()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    today_end = today_start + timedelta(days=1)
     todays_entries = TimeEntry.objects.filter(
-        time_in__gte=today_start, time_in__lt=today_end
+        work_date=get_work_date()
     ).order_by("-last_modified")
 
     return render(
@@ -174,9 +223,12 @@ def clock_in_view(request):
     pin = data.get("pin")
     new_pin = data.get("new_pin")
     image_path = data.get("image_path")
+    since = data.get("since")
     first_login_check = data.get("first_login_check", False)
 
-    auth_result = CustomUser.authenticate_by_pin(employee_id, pin)
+    auth_result, error_message = authenticate_pin(
+        employee_id, pin, get_client_ip(request)
+    )
 
     # Handle first login cases
     if isinstance(auth_result, dict) and auth_result.get("status") == "first_login":
@@ -184,7 +236,7 @@ def clock_in_view(request):
             user = auth_result["user"]
             user.pin = new_pin
             user.if_first_login = False
-            user.save()
+            user.save(update_fields=["pin", "if_first_login"])
             return JsonResponse({"success": True, "message": "PIN updated successfully"})
         else:
             return JsonResponse({
@@ -205,81 +257,41 @@ def clock_in_view(request):
 
     # If authentication failed
     if not auth_result:
-        try:
-            CustomUser.objects.get(employee_id=employee_id)
-            error_message = "Incorrect PIN"
-        except CustomUser.DoesNotExist:
-            error_message = "Employee ID not found"
-        return JsonResponse({"success": False, "error": error_message})
+        return pin_error_response(error_message)
 
     # Authentication passed: get the user
     user = auth_result
 
-    # --- Prevent Multiple Clock-Ins in the Same Day ---
-    now = timezone.now()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    # Check if there is already a clock in entry for today for this user
-    if TimeEntry.objects.filter(user=user, time_in__gte=today_start).exists():
-        return JsonResponse({"success": False, "error": "You have already clocked in today"})
-
-    # --- Check for Previous Day Entry Without Clock-Out ---
-    yesterday_start = today_start - timedelta(days=1)
-    yesterday_end = today_start
-    yesterday_entry = TimeEntry.objects.filter(
-        user=user,
-        time_in__gte=yesterday_start,
-        time_in__lt=yesterday_end,
-        time_out__isnull=True
-    ).first()
-    warning_message = None
-    if yesterday_entry:
-        warning_message = "Clock in successful! However, you forgot to clock out yesterday."
-
-    # --- Proceed with Creating a New Clock-In Entry ---
-    entry = TimeEntry.clock_in(user)
-    if image_path:
-        entry.image_path = image_path
-        entry.save()
+    try:
+        entry, warning_message = clock_in_user(user, image_path=image_path)
+    except ClockInError as e:
+        return JsonResponse({"success": False, "error": str(e)})
 
     # Get the company logo using the utility function
     user_company = user.company.name if user.company else ""
     company_logo = get_company_logo(user_company)
 
-    # Fetch updated attendance list for today
-    today_end = today_start + timedelta(days=1)
-    todays_entries = TimeEntry.objects.filter(
-        time_in__gte=today_start, time_in__lt=today_end
-    ).order_by("-last_modified")
-
-    attendance_list = [
-        {
-            "employee_id": entry.user.employee_id,
-            "first_name": entry.user.first_name,
-            "surname": entry.user.surname,
-            "company": entry.user.company.name if entry.user.company else "",
-            "time_in": entry.time_in.strftime("%I:%M %p"),
-            "time_out": (entry.time_out.strftime("%I:%M %p") if entry.time_out else None),
-            "image_path": entry.image_path,
-        }
-        for entry in todays_entries
-    ]
+    # Fetch the attendance entries that changed since the client's cursor
+    changes = get_attendance_list(get_work_date(), since=since)
 
     response = {
         "success": True,
         "employee_id": user.employee_id,
         "first_name": user.first_name,
         "surname": user.surname,
-        "company": user.company.name if user.company else "",
-        "time_in": entry.time_in.strftime("%I:%M %p"),
+        "company": user_company,
+        "time_in": clock_time(entry.time_in),
         "time_out": None,
         "image_path": entry.image_path,
         "new_logo": company_logo,
-        "attendance_list": attendance_list,
+        "attendance_list": changes["entries"],
+        "cursor": changes["cursor"],
+        "full": changes["full"],
     }
     if warning_message:
         response["warning"] = warning_message
 
-    return JsonResponse(response)
+    return FastJsonResponse(response)
 
 
 @require_POST
@@ -299,52 +311,36 @@ def clock_out_view(request):
     data = json.loads(request.body)
     employee_id = data.get("employee_id")
     pin = data.get("pin")
+    since = data.get("since")
 
-    user = CustomUser.authenticate_by_pin(employee_id, pin)
+    user, error_message = authenticate_pin(employee_id, pin, get_client_ip(request))
+    if isinstance(user, dict):
+        error_message = "Please set your new PIN before clocking out"
+        user = None
 
     if user:
         try:
-            now = timezone.now()
-            today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            today_end = today_start + timedelta(days=1)
+            today = get_work_date()
 
-            open_entry = TimeEntry.objects.filter(
-                user=user,
-                time_out__isnull=True,
-                time_in__gte=today_start,
-                time_in__lt=today_end,
-            ).latest("time_in")
+            # Direct lookup on the unique (user, work_date) key
+            open_entry = TimeEntry.objects.get(
+                user=user, work_date=today, time_out__isnull=True
+            )
+            open_entry.user = user
 
             open_entry.clock_out()
 
-            time_in_formatted = open_entry.time_in.strftime("%I:%M %p")
-            time_out_formatted = open_entry.time_out.strftime("%I:%M %p")
+            time_in_formatted = clock_time(open_entry.time_in)
+            time_out_formatted = clock_time(open_entry.time_out)
 
             # Handle None company value
             user_company = user.company.name if user.company else ""
             company_logo = get_company_logo(user_company)
 
-            # Fetch updated attendance list
-            todays_entries = TimeEntry.objects.filter(
-                time_in__gte=today_start, time_in__lt=today_end
-            ).order_by("-last_modified")
+            # Fetch the attendance entries that changed since the client's cursor
+            changes = get_attendance_list(today, since=since)
 
-            attendance_list = [
-                {
-                    "employee_id": entry.user.employee_id,
-                    "first_name": entry.user.first_name,
-                    "surname": entry.user.surname,
-                    "company": entry.user.company.name if entry.user.company else "",
-                    "time_in": entry.time_in.strftime("%I:%M %p"),
-                    "time_out": (
-                        entry.time_out.strftime("%I:%M %p") if entry.time_out else None
-                    ),
-                    "image_path": entry.image_path,
-                }
-                for entry in todays_entries
-            ]
-
-            return JsonResponse(
+            return FastJsonResponse(
                 {
                     "success": True,
                     "employee_id": user.employee_id,
@@ -354,7 +350,9 @@ def clock_out_view(request):
                     "time_in": time_in_formatted,
                     "time_out": time_out_formatted,
                     "new_logo": company_logo,
-                    "attendance_list": attendance_list,
+                    "attendance_list": changes["entries"],
+                    "cursor": changes["cursor"],
+                    "full": changes["full"],
                 }
             )
         except TimeEntry.DoesNotExist:
@@ -366,12 +364,46 @@ def clock_out_view(request):
                 {"success": False, "error": f"An error occurred: {str(e)}"}
             )
     else:
-        try:
-            CustomUser.objects.get(employee_id=employee_id)
-            error_message = "Incorrect PIN"
-        except CustomUser.DoesNotExist:
-            error_message = "Employee ID not found"
-        return JsonResponse({"success": False, "error": error_message})
+        return pin_error_response(error_message)
+
+
+@require_POST
+def bulk_punch_view(request):
+    """
+    Handles buffered clock-in and clock-out punches from a kiosk.
+
+    Kiosks that lost their connection replay the punches they buffered in one
+    request instead of one clock_in/clock_out call per punch.
+
+    Args:
+        request: The HTTP request object containing a JSON body with an
+                 "events" list. Each event has "type" ("clock_in" or
+                 "clock_out"), "employee_id", "pin", "timestamp" (ISO 8601)
+                 and an optional "image_path".
+
+    Returns:
+        JsonResponse: A result for each event, in the order they were sent.
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"success": False, "error": "Invalid JSON"}, status=400)
+
+    events = data.get("events") if isinstance(data, dict) else None
+    if not isinstance(events, list):
+        return JsonResponse({"success": False, "error": "An events list is required"}, status=400)
+    if len(events) > MAX_BULK_PUNCHES:
+        return JsonResponse(
+            {"success": False, "error": f"At most {MAX_BULK_PUNCHES} events can be sent at once"},
+            status=400,
+        )
+
+    results = ingest_punches(events, get_client_ip(request))
+    response = JsonResponse({"success": True, "results": results})
+    # Other events in the batch may have succeeded, so only the header signals throttling
+    if any(result.get("error") == THROTTLED_MESSAGE for result in results):
+        response["Retry-After"] = str(FAILED_ATTEMPT_WINDOW)
+    return response
 
 
 @require_GET
@@ -380,42 +412,59 @@ def get_todays_entries(request):
     """
     Retrieves today's time entries.
 
-    Retrieves all time entries for the current day and returns them as a JSON
-    response.
+    Retrieves the time entries for the current day and returns them as a JSON
+    response. If a ``since`` cursor is given, only the entries created or
+    changed after it are returned.
+
+    Args:
+        request: The HTTP request object, optionally containing a ``since`` cursor.
+
+    Returns:
+        JsonResponse: A JSON response containing a list of time entries, the
+                      new cursor, and whether the list is a full refresh.
+    """
+    changes = get_attendance_list(get_work_date(), since=request.GET.get("since"))
+
+    return FastJsonResponse(
+        {
+            "entries": changes["entries"],
+            "cursor": changes["cursor"],
+            "full": changes["full"],
+        }
+    )
+
+
+@require_GET
+@login_required
+async def attendance_events(request):
+    """
+    Streams clock-in and clock-out events to kiosks as Server-Sent Events.
+
+    Each event carries the changed attendance row and its change cursor, so
+    kiosks can merge it into their table without polling get_todays_entries.
+    The stream sends keep-alive comments while idle.
+
+    Streaming requires an ASGI server. Under WSGI a 204 response is returned,
+    which tells the browser's EventSource to stop reconnecting so the kiosk
+    falls back to polling.
 
     Args:
         request: The HTTP request object.
 
     Returns:
-        JsonResponse: A JSON response containing a list of time entries.
+        StreamingHttpResponse: A text/event-stream response, or an empty 204
+                               response when not served over ASGI.
     """
-    now = timezone.now()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    today_end = today_start + timedelta(days=1)
-
-    # Make sure entries are ordered by last_modified in descending order
-    entries = TimeEntry.objects.filter(
-        time_in__gte=today_start, time_in__lt=today_end
-    ).order_by(
-        "-last_modified"
-    )  # This is correct
-
-    entries_data = []
-    for entry in entries:
-        entries_data.append(
-            {
-                "employee_id": entry.user.employee_id,
-                "first_name": entry.user.first_name,
-                "surname": entry.user.surname,
-                "company": entry.user.company.name if entry.user.company else "",
-                "time_in": entry.time_in.strftime("%I:%M %p"),
-                "time_out": (
-                    entry.time_out.strftime("%I:%M %p") if entry.time_out else None
-                ),
-            }
-        )
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
 
-    return JsonResponse({"entries": entries_data})
+    subscription = broker.subscribe()
+    response = StreamingHttpResponse(
+        stream_events(subscription), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
 @require_POST
@@ -435,9 +484,8 @@ def upload_image(request):
     employee_id = request.POST.get("employee_id")
 
     if image_data:
-        try:
-            user = CustomUser.objects.get(employee_id=employee_id)
-        except CustomUser.DoesNotExist:
+        user = get_cached_user(employee_id)
+        if user is None:
             return JsonResponse({"success": False, "error": "Employee ID not found"})
 
         # Get the current date
@@ -700,7 +748,9 @@ def attendance_list_json(request):
     API endpoint for retrieving attendance data.
 
     Retrieves attendance data based on various filter parameters and returns it
-    as a JSON response.
+    as a JSON response. Pages are requested with the opaque "next"/"prev"
+    cursors of the previous response; the total is served from a short-lived
+    cache unless "total=exact" is passed.
 
     Args:
         request: The HTTP request object containing filter parameters.
@@ -715,189 +765,63 @@ def attendance_list_json(request):
     search_query = request.GET.get("search", "").strip()
 
     # Pagination parameters
-    try:
-        page = int(request.GET.get("page", 1))
-        limit = int(request.GET.get("limit", 50))
-    except ValueError:
-        page = 1
-        limit = 50
+    cursor = request.GET.get("cursor")
+    limit = get_page_size(request.GET.get("limit"))
+    exact_total = request.GET.get("total") == "exact"
+
+    spec = AttendanceFilter(
+        company=company_code, department=department_code, search=search_query
+    )
 
-    # Base queries with appropriate filtering
     if attendance_type == "time-log":
-        # Only include time entries for today
-        today = date.today()
-        qs = (
-            TimeEntry.objects.select_related("user", "user__company", "user__position")
-            .filter(time_in__date=today, user__is_active=True)
-            .order_by("-last_modified")
+        # Only include today's time entries of active users
+        qs = entry_rows(
+            spec._replace(work_date=get_work_date(), is_active=True), TIME_LOG_COLUMNS
         )
 
-        # Apply company filter
-        if company_code != "all":
-            companies_to_filter = []
-            # Check if company_code is directly in COMPANY_CHOICES
-            if company_code in COMPANY_CHOICES:
-                companies_to_filter = COMPANY_CHOICES[company_code]
-            else:
-                # Check if company_code is an alias in any tuple
-                for key, names_tuple in COMPANY_CHOICES.items():
-                    if company_code in names_tuple:
-                        companies_to_filter = names_tuple
-                        break
-
-            if companies_to_filter:
-                query = Q()
-                for company_name in companies_to_filter:
-                    query |= Q(user__company__name__iexact=company_name)
-                qs = qs.filter(query)
-            else:
-                qs = qs.filter(user__company__name__iexact=company_code)
-
-        # Apply department filter
-        if department_code != "all":
-            if department_code in DEPARTMENT_CHOICES:
-                dept_name = DEPARTMENT_CHOICES[department_code]
-                qs = qs.filter(user__position__name=dept_name)
-            else:
-                qs = qs.filter(user__position__name=department_code)
-
-        # Apply search filter
-        if search_query:
-            # For more exact matching, try to match the complete name first
-            complete_name_query = (
-                Q(user__first_name__icontains=search_query)
-                | Q(user__surname__icontains=search_query)
-                | Q(user__first_name__iexact=search_query)
-                | Q(user__surname__iexact=search_query)
+        # Continue after the cursor, most recently modified first
+        try:
+            page, next_cursor, prev_cursor = keyset_page(
+                qs, ("-last_modified", "-id"), cursor, limit, key=itemgetter(0, 1)
             )
-
-            # Then try concatenated name (first_name + surname)
-            name_parts = search_query.split()
-            if len(name_parts) > 1:
-                # If we have multiple terms, try to match them exactly in order
-                first_name_candidates = [
-                    " ".join(name_parts[:i]) for i in range(1, len(name_parts))
-                ]
-                surname_candidates = [
-                    " ".join(name_parts[i:]) for i in range(1, len(name_parts))
-                ]
-
-                for first in first_name_candidates:
-                    for last in surname_candidates:
-                        if first and last:  # Ensure we don't have empty strings
-                            complete_name_query |= Q(
-                                user__first_name__iexact=first
-                            ) & Q(user__surname__iexact=last)
-
-            qs = qs.filter(complete_name_query)
-
-        # Get total count before pagination
-        total_count = qs.count()
-
-        # Apply pagination
-        start = (page - 1) * limit
-        end = page * limit
-        paginated_qs = qs[start:end]
+        except InvalidCursor:
+            return JsonResponse({"error": "Invalid cursor"}, status=400)
 
         # Format time-log data
-        attendance_list = [
-            {
-                "employee_id": entry.user.employee_id,
-                "name": f"{entry.user.first_name} {entry.user.surname}",
-                "time_in": entry.time_in.strftime("%Y-%m-%d %H:%M:%S"),
-                "time_out": (
-                    entry.time_out.strftime("%Y-%m-%d %H:%M:%S")
-                    if entry.time_out
-                    else ""
-                ),
-                "hours_worked": entry.hours_worked,
-            }
-            for entry in paginated_qs
-        ]
+        attendance_list = [time_log_row(row) for row in page]
 
     elif attendance_type in ["users-active", "users-inactive"]:
-        if attendance_type == "users-active":
-            qs = CustomUser.objects.filter(is_active=True).distinct()
-        else:  # users-inactive
-            qs = CustomUser.objects.filter(is_active=False).distinct()
-
-        # Apply company filter
-        if company_code != "all":
-            companies_to_filter = []
-            if company_code in COMPANY_CHOICES:
-                companies_to_filter = COMPANY_CHOICES[company_code]
-            else:
-                for key, names_tuple in COMPANY_CHOICES.items():
-                    if company_code in names_tuple:
-                        companies_to_filter = names_tuple
-                        break
-
-            if companies_to_filter:
-                query = Q()
-                for company_name in companies_to_filter:
-                    query |= Q(company__name__iexact=company_name)
-                qs = qs.filter(query)
-            else:
-                qs = qs.filter(company__name__iexact=company_code)
-
-        # Apply department filter
-        if department_code != "all":
-            qs = qs.filter(position__name=department_code)
-
-        # Apply search filter
-        if search_query:
-            # For more exact matching, try to match the complete name first
-            complete_name_query = (
-                Q(first_name__icontains=search_query)
-                | Q(surname__icontains=search_query)
-                | Q(first_name__iexact=search_query)
-                | Q(surname__iexact=search_query)
-            )
+        qs = user_rows(spec._replace(is_active=attendance_type == "users-active"))
 
-            # Then try concatenated name (first_name + surname)
-            name_parts = search_query.split()
-            if len(name_parts) > 1:
-                # If we have multiple terms, try to match them exactly in order
-                first_name_candidates = [
-                    " ".join(name_parts[:i]) for i in range(1, len(name_parts))
-                ]
-                surname_candidates = [
-                    " ".join(name_parts[i:]) for i in range(1, len(name_parts))
-                ]
-
-                for first in first_name_candidates:
-                    for last in surname_candidates:
-                        if first and last:  # Ensure we don't have empty strings
-                            complete_name_query |= Q(first_name__iexact=first) & Q(
-                                surname__iexact=last
-                            )
-
-            qs = qs.filter(complete_name_query)
-
-        # Get total count before pagination
-        total_count = qs.count()
-
-        # Apply pagination
-        start = (page - 1) * limit
-        end = page * limit
-        paginated_qs = qs[start:end]
+        # Continue after the cursor, in creation order
+        try:
+            page, next_cursor, prev_cursor = keyset_page(
+                qs, ("id",), cursor, limit, key=itemgetter(slice(0, 1))
+            )
+        except InvalidCursor:
+            return JsonResponse({"error": "Invalid cursor"}, status=400)
 
         # Format user data
-        attendance_list = [
-            {
-                "employee_id": user.employee_id,
-                "name": f"{user.first_name} {user.surname}",
-            }
-            for user in paginated_qs
-        ]
+        attendance_list = [user_row(row) for row in page]
     else:
-        attendance_list = []
-        total_count = 0
-
-    return JsonResponse({
+        return JsonResponse({
+            "attendance_list": [],
+            "attendance_type": attendance_type,
+            "total": 0,
+            "total_is_exact": True,
+            "next": None,
+            "prev": None,
+        })
+
+    total_count, total_is_exact = count_rows(qs, exact=exact_total)
+
+    return FastJsonResponse({
         "attendance_list": attendance_list,
         "attendance_type": attendance_type,
-        "total": total_count
+        "total": total_count,
+        "total_is_exact": total_is_exact,
+        "next": next_cursor,
+        "prev": prev_cursor,
     })
 
 
@@ -907,8 +831,9 @@ def dashboard_data(request):
     """
     API endpoint for retrieving dashboard data.
 
-    Retrieves data for the admin dashboard, including today's time entries,
-    top late employees, and top early birds.
+    Retrieves data for the admin dashboard: today's clock-in, clock-out and
+    late counts from the daily attendance summaries, and the top late
+    employees and top early birds.
 
     Args:
         request: The HTTP request object.
@@ -916,66 +841,35 @@ def dashboard_data(request):
     Returns:
         JsonResponse: A JSON response containing dashboard data.
     """
-    now = timezone.now()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    today_end = today_start + timedelta(days=1)
-
-    # Get all entries for today
-    todays_entries = TimeEntry.objects.filter(
-        time_in__gte=today_start, time_in__lt=today_end
-    ).select_related("user", "user__company", "user__schedule_group")
-
-    processed_entries = []
-    late_count = 0
+    today = get_work_date()
 
-    for entry in todays_entries:
-        user = entry.user
-        time_in_local = entry.time_in
-
-        # Get user name or default to ID
-        first_name = user.first_name or ""
-        surname = user.surname or ""
-        full_name = f"{first_name} {surname}".strip()
-        if not full_name:
-            full_name = f"User {user.employee_id}"
+    totals = DailyAttendanceSummary.objects.filter(date=today).aggregate(
+        present=Coalesce(Sum("present_count"), 0),
+        late=Coalesce(Sum("late_count"), 0),
+        open=Coalesce(Sum("open_shifts"), 0),
+    )
 
-        # Use the stored minutes_late value
-        if entry.is_late:
-            late_count += 1
+    todays_entries = entry_rows(AttendanceFilter(work_date=today), DASHBOARD_COLUMNS)
 
-        processed_entries.append(
-            {
-                "employee_id": user.employee_id,
-                "name": full_name,
-                "company": user.company.name if user.company else "",
-                "time_in": time_in_local.strftime("%I:%M %p"),
-                "time_out": (
-                    entry.time_out.strftime("%I:%M %p") if entry.time_out else None
-                ),
-                "minutes_diff": entry.minutes_late,  # Use the stored value
-                "is_late": entry.is_late,
-            }
-        )
-
-    # Sort entries - late ones by how late they are (descending)
-    late_entries = sorted(
-        [e for e in processed_entries if e["is_late"]],
-        key=lambda x: x["minutes_diff"],
-        reverse=True,
-    )[:5]
+    # Late ones by how late they are (descending)
+    late_entries = [
+        dashboard_row(row)
+        for row in todays_entries.filter(is_late=True).order_by("-minutes_late")[:5]
+    ]
 
-    # Sort entries - early ones by how early they are (most early first)
-    early_entries = sorted(
-        [e for e in processed_entries if e["minutes_diff"] < 0],  # Only include truly early entries
-        key=lambda x: x["minutes_diff"],  # Ascending order for negative numbers puts most negative (most early) first
-    )[:5]
+    # Early ones by how early they are (most early first)
+    early_entries = [
+        dashboard_row(row)
+        for row in todays_entries.filter(minutes_late__lt=0).order_by("minutes_late")[:5]
+    ]
 
-    return JsonResponse(
+    return FastJsonResponse(
         {
-            "today_entries": processed_entries,
+            "total_time_in": totals["present"],
+            "total_time_out": totals["present"] - totals["open"],
             "top_late": late_entries,
             "top_early": early_entries,
-            "late_count": late_count,
+            "late_count": totals["late"],
         }
     )
 
@@ -987,7 +881,9 @@ def get_logs(request):
     API endpoint for retrieving admin logs.
 
     Retrieves admin logs based on various filter parameters and returns them as a
-    JSON response.
+    JSON response. Pages are requested with the opaque "next"/"prev" cursors of
+    the previous response; the total is served from a short-lived cache unless
+    "total=exact" is passed.
 
     Args:
         request: The HTTP request object containing filter parameters.
@@ -1004,22 +900,18 @@ def get_logs(request):
     date_range = request.GET.get("date_range", "")
 
     # Pagination parameters
-    try:
-        page = int(request.GET.get("page", 1))
-        limit = int(request.GET.get("limit", 50))
-    except ValueError:
-        page = 1
-        limit = 50
+    cursor = request.GET.get("cursor")
+    limit = get_page_size(request.GET.get("limit"))
+    exact_total = request.GET.get("total") == "exact"
 
     # Base query
-    logs_query = AdminLog.objects.all()
+    logs_query = AdminLog.objects.values_list(*ADMIN_LOG_COLUMNS)
 
     # Apply filters
     if search_query:
         logs_query = logs_query.filter(
             Q(description__icontains=search_query) |
-            Q(user__first_name__icontains=search_query) |
-            Q(user__surname__icontains=search_query) |
+            name_search_q(search_query, prefix="user__") |
             Q(user__employee_id__icontains=search_query)
         )
 
@@ -1039,41 +931,67 @@ def get_logs(request):
         month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         logs_query = logs_query.filter(timestamp__gte=month_start)
 
-    # Calculate pagination
-    start = (page - 1) * limit
-    end = page * limit
+    # Continue after the cursor, newest first
+    try:
+        logs, next_cursor, prev_cursor = keyset_page(
+            logs_query, ("-timestamp", "-id"), cursor, limit, key=itemgetter(1, 0)
+        )
+    except InvalidCursor:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+    action_labels = dict(AdminLog.ACTION_CHOICES)
+    log_data = [admin_log_row(row, action_labels) for row in logs]
 
-    # Get paginated logs
-    logs = logs_query[start:end]
+    total_count, total_is_exact = count_rows(logs_query, exact=exact_total)
 
-    log_data = [
-        {
-            "user": f"{log.user.first_name} {log.user.surname}",
-            "employee_id": log.user.employee_id,
-            "action": log.get_action_display(),
-            "description": log.description,
-            "timestamp": log.timestamp.strftime("%Y-%m-%d %I:%M %p"),
-            "ip_address": log.ip_address or "Unknown",
-        }
-        for log in logs
-    ]
+    return FastJsonResponse({
+        "logs": log_data,
+        "total": total_count,
+        "total_is_exact": total_is_exact,
+        "next": next_cursor,
+        "prev": prev_cursor,
+    })
+
+
+@login_required
+@require_GET
+def metrics_view(request):
+    """
+    Exposes the per-URL request histograms in Prometheus text format.
+
+    Only staff and superusers may read the metrics.
+
+    Args:
+        request: The HTTP request object.
+
+    Returns:
+        HttpResponse: The metrics in Prometheus text exposition format.
+    """
+    if not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({"error": "Permission denied"}, status=403)
 
-    return JsonResponse({"logs": log_data, "total": logs_query.count()})
+    return HttpResponse(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
 
 
+@login_required
 @require_GET
 def export_time_entries_by_date(request):
     """
-    API endpoint for exporting time entries to Excel by date.
+    API endpoint for exporting time entries by date.
 
-    Exports time entries for a specific date to an Excel file.
+    Exports time entries for a specific date, optionally for one employee, to
+    an Excel file, or to a streamed CSV or JSON Lines file when the format
+    parameter is "csv" or "jsonl". Only staff and superusers may export.
 
     Args:
         request: The HTTP request object containing the date parameter.
 
     Returns:
-        HttpResponse: An Excel file containing the time entries.
+        HttpResponse: A file containing the time entries.
     """
+    if not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({"error": "Permission denied"}, status=403)
+
     date_str = request.GET.get("date")
     if not date_str:
         return HttpResponse("Date parameter is required.", status=400)
@@ -1082,150 +1000,252 @@ def export_time_entries_by_date(request):
     if not selected_date:
         return HttpResponse("Invalid date format.", status=400)
 
-    start_datetime = datetime.combine(selected_date, time.min)
-    end_datetime = datetime.combine(selected_date, time.max)
-
-    qs = TimeEntry.objects.filter(
-        time_in__gte=start_datetime,
-        time_in__lte=end_datetime
-    ).order_by("time_in")
-
-    employee_id = request.GET.get("employee_id")
-    if employee_id:
-        # Remove the int conversion to match the behavior of your date range export
-        qs = qs.filter(user__employee_id=employee_id)
-
-    # Create Excel workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Time Entries"
-    headers = [
-        "ID",
-        "Employee ID",
-        "First Name",
-        "Surname",
-        "Company",
-        "Date",
-        "Time In",
-        "Time Out",
-        "Hours Worked",
-        "Is Late"
-    ]
-    ws.append(headers)
-    for entry in qs:
-        row = [
-            entry.id,
-            entry.user.employee_id,
-            entry.user.first_name,
-            entry.user.surname,
-            entry.user.company.name if entry.user.company else "",
-            entry.time_in.strftime("%Y-%m-%d"),
-            entry.time_in.strftime("%H:%M:%S"),
-            entry.time_out.strftime("%H:%M:%S") if entry.time_out else "",
-            entry.hours_worked,
-            "Yes" if entry.is_late else "No"
-        ]
-        ws.append(row)
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    filename = f"time_entries_{date_str}.xlsx"
-    response = HttpResponse(
-        output,
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    export_format = request.GET.get("format", "xlsx")
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponse("Invalid export format.", status=400)
+
+    spec = AttendanceFilter(
+        work_date=selected_date, employee_id=request.GET.get("employee_id")
     )
-    response["Content-Disposition"] = f"attachment; filename={filename}"
+    name = f"time_entries_{date_str}"
+    response = export_response(spec, name, export_format)
 
-    log_admin_action(request, "Excel Export", f"Exported {filename}")
-    log_admin_action(request, "excel_export", f"Exported {filename}")
+    log_admin_action(request, "Excel Export", f"Exported {name}.{export_format}")
     return response
 
-@require_GET
-def export_time_entries_range(request):
-    """
-    API endpoint for exporting time entries to Excel by date range.
 
-    Exports time entries for a specific date range to an Excel file.
+def parse_range_export(params):
+    """
+    Parse the parameters of a date range export.
 
     Args:
-        request: The HTTP request object containing the start and end date parameters.
+        params (QueryDict): The date_start and date_end, and the optional
+                            format, shard, employee_id and exclude_date
+                            parameters.
 
     Returns:
-        HttpResponse: An Excel file containing the time entries.
+        tuple: (spec, name, export_format, shard); the AttendanceFilter of
+               the entries, the filename without extension, the format, and
+               how to split the export ("" for one file).
+
+    Raises:
+        ValueError: If a parameter is missing or invalid.
     """
-    date_start_str = request.GET.get("date_start")
-    date_end_str = request.GET.get("date_end")
+    date_start_str = params.get("date_start")
+    date_end_str = params.get("date_end")
     if not date_start_str or not date_end_str:
-        return HttpResponse("Start date and End date parameters are required.", status=400)
+        raise ValueError("Start date and End date parameters are required.")
 
     date_start = parse_date(date_start_str)
     date_end = parse_date(date_end_str)
     if not date_start or not date_end:
-        return HttpResponse("Invalid date format.", status=400)
+        raise ValueError("Invalid date format.")
+
+    export_format = params.get("format", "xlsx")
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError("Invalid export format.")
+
+    shard = params.get("shard", "")
+    if shard and shard not in SHARD_TYPES:
+        raise ValueError("Invalid shard type.")
+
+    # Optional excluded dates and employee id filter
+    employee_id = params.get("employee_id")
+    spec = AttendanceFilter(
+        date_from=date_start,
+        date_to=date_end,
+        exclude_dates=params.getlist("exclude_date"),
+        employee_id=employee_id,
+    )
+    return spec, f"time_entries_{employee_id}", export_format, shard
 
-    start_datetime = datetime.combine(date_start, time.min)
-    end_datetime = datetime.combine(date_end, time.max)
 
-    qs = TimeEntry.objects.filter(
-        time_in__gte=start_datetime,
-        time_in__lte=end_datetime
-    )
+@login_required
+@require_GET
+def export_time_entries_range(request):
+    """
+    API endpoint for exporting time entries by date range.
 
-    # Exclude dates if provided
-    excluded_dates = request.GET.getlist("exclude_date")
-    if excluded_dates:
-        qs = qs.exclude(time_in__date__in=excluded_dates)
-
-    # Optional employee id filter
-    employee_id = request.GET.get("employee_id")
-    if employee_id:
-        qs = qs.filter(user__employee_id=employee_id)
-
-    qs = qs.order_by("time_in")
-
-    # Create Excel workbook and sheet (code unchanged)
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Time Entries"
-    headers = [
-        "ID",
-        "Employee ID",
-        "First Name",
-        "Surname",
-        "Company",
-        "Date",
-        "Time In",
-        "Time Out",
-        "Hours Worked",
-        "Is Late"
-    ]
-    ws.append(headers)
-    for entry in qs:
-        row = [
-            entry.id,
-            entry.user.employee_id,
-            entry.user.first_name,
-            entry.user.surname,
-            entry.user.company.name if entry.user.company else "",
-            entry.time_in.strftime("%Y-%m-%d"),
-            entry.time_in.strftime("%H:%M:%S"),
-            entry.time_out.strftime("%H:%M:%S") if entry.time_out else "",
-            entry.hours_worked,
-            "Yes" if entry.is_late else "No"
-        ]
-        ws.append(row)
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    filename = f"time_entries_range_{date_start_str}_to_{date_end_str}.xlsx"
-    response = HttpResponse(
-        output,
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-    response["Content-Disposition"] = f"attachment; filename=time_entries_{employee_id}.xlsx"
-    log_admin_action(request, "Excel Export", f"Exported time_entries_{employee_id}.xlsx")
+    Exports time entries for a specific date range to an Excel file, or to a
+    streamed CSV or JSON Lines file when the format parameter is "csv" or
+    "jsonl". With shard=month or shard=company, the export is split into one
+    file per month or company, generated in parallel and zipped with a
+    summary. Long ranges should be exported with an export job instead.
+    Only staff and superusers may export.
+
+    Args:
+        request: The HTTP request object containing the start and end date parameters.
+
+    Returns:
+        HttpResponse: A file containing the time entries.
+    """
+    if not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({"error": "Permission denied"}, status=403)
+
+    try:
+        spec, name, export_format, shard = parse_range_export(request.GET)
+    except ValueError as exc:
+        return HttpResponse(str(exc), status=400)
+
+    if shard:
+        response = sharded_response(spec, name, export_format, shard)
+        name = f"{name}_by_{shard}"
+        export_format = "zip"
+    else:
+        response = export_response(spec, name, export_format)
+
+    log_admin_action(request, "Excel Export", f"Exported {name}.{export_format}")
     return response
 
+
+@login_required
+@require_GET
+def export_timesheet(request):
+    """
+    API endpoint for exporting a payroll timesheet by date range.
+
+    Exports one row per employee with their days present, hours worked, late
+    count, minutes late and early arrivals over the range, totalled in the
+    database. Takes the same parameters as export_time_entries_range, except
+    shard. Only staff, superusers and HR may export timesheets.
+
+    Args:
+        request: The HTTP request object containing the start and end date parameters.
+
+    Returns:
+        HttpResponse: A file containing the timesheet.
+    """
+    if not (request.user.is_staff or request.user.is_superuser or request.user.is_hr):
+        return JsonResponse({"error": "Permission denied"}, status=403)
+
+    try:
+        spec, _, export_format, shard = parse_range_export(request.GET)
+    except ValueError as exc:
+        return HttpResponse(str(exc), status=400)
+    if shard:
+        return HttpResponse("Timesheets cannot be split.", status=400)
+
+    name = f"timesheet_{spec.date_from}_{spec.date_to}"
+    response = timesheet_response(spec, name, export_format)
+
+    log_admin_action(request, "Excel Export", f"Exported {name}.{export_format}")
+    return response
+
+
+def export_job_data(job):
+    """
+    Get the status of an export job.
+
+    Args:
+        job (ExportJob): The job.
+
+    Returns:
+        dict: The job's status, progress and, once done, its download URL.
+    """
+    return {
+        "id": job.pk,
+        "status": job.status,
+        "filename": job.filename,
+        "rows_written": job.rows_written,
+        "total_rows": job.total_rows,
+        "error": job.error,
+        "status_url": reverse("export_job_status", args=[job.pk]),
+        "download_url": (
+            reverse("export_job_download", args=[job.pk]) if job.status == "DONE" else None
+        ),
+    }
+
+
+def get_export_job(request, pk):
+    """
+    Get an export job of the current user; superusers can see every job.
+
+    Args:
+        request: The HTTP request object.
+        pk (int): The job ID.
+
+    Returns:
+        ExportJob: The job.
+
+    Raises:
+        Http404: If there is no such job visible to the user.
+    """
+    jobs = ExportJob.objects.all()
+    if not request.user.is_superuser:
+        jobs = jobs.filter(requested_by=request.user)
+    return get_object_or_404(jobs, pk=pk)
+
+
+@login_required
+@require_POST
+def export_jobs(request):
+    """
+    API endpoint for submitting a background date range export.
+
+    Takes the same parameters as export_time_entries_range. The export is
+    generated by the export worker pool; poll the returned status_url and
+    download the file from download_url once the job is done. Only staff and
+    superusers may submit exports.
+
+    Args:
+        request: The HTTP request object containing the export parameters.
+
+    Returns:
+        JsonResponse: The pending job, with status 202.
+    """
+    if not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({"error": "Permission denied"}, status=403)
+
+    try:
+        spec, name, export_format, shard = parse_range_export(request.POST)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    try:
+        job = submit_export_job(spec, name, export_format, request.user, shard=shard)
+    except ExportJobLimitError as exc:
+        return JsonResponse({"error": str(exc)}, status=429)
+    log_admin_action(request, "Excel Export", f"Queued {job.filename}")
+    return JsonResponse(export_job_data(job), status=202)
+
+
+@login_required
+@require_GET
+def export_job_status(request, pk):
+    """
+    API endpoint for polling an export job.
+
+    Args:
+        request: The HTTP request object.
+        pk (int): The job ID.
+
+    Returns:
+        JsonResponse: The job's status and progress.
+    """
+    return JsonResponse(export_job_data(get_export_job(request, pk)))
+
+
+@login_required
+@require_GET
+def export_job_download(request, pk):
+    """
+    API endpoint for downloading a finished export job's file.
+
+    Args:
+        request: The HTTP request object.
+        pk (int): The job ID.
+
+    Returns:
+        FileResponse: The export file, or a JSON error with status 409 if
+                      the job is not done.
+    """
+    job = get_export_job(request, pk)
+    if job.status != "DONE":
+        return JsonResponse({"error": "Export is not ready", "status": job.status}, status=409)
+
+    log_admin_action(request, "Excel Export", f"Exported {job.filename}")
+    return FileResponse(job.file.open("rb"), as_attachment=True, filename=job.filename)
+
 @login_required
 def get_pending_leaves(request):
     """
@@ -1251,19 +1271,9 @@ def get_pending_leaves(request):
             leaves = Leave.objects.filter(employee__manager=user, status='PENDING')
 
         # Format the leave data
-        leave_data = []
-        for leave in leaves:
-            leave_data.append({
-                'id': leave.id,
-                'employee_name': f"{leave.employee.first_name} {leave.employee.surname}",
-                'start_date': leave.start_date.strftime('%Y-%m-%d'),
-                'end_date': leave.end_date.strftime('%Y-%m-%d'),
-                'duration': leave.get_duration(),
-                'leave_type': leave.leave_type.name if leave.leave_type else 'N/A',
-                'reason': leave.reason
-            })
+        leave_data = [leave_row(row) for row in leaves.values_list(*LEAVE_COLUMNS)]
 
-        return JsonResponse({'leaves': leave_data})
+        return FastJsonResponse({'leaves': leave_data})
     except Exception as e:
         # Log the error
         import traceback
@@ -1318,87 +1328,3 @@ def process_leave(request):
 
     return JsonResponse({'success': True})
 
-@require_GET
-def export_time_entries_by_date(request):
-    """
-    API endpoint for exporting time entries to Excel by date.
-
-    Exports time entries for a specific date to an Excel file.
-
-    Args:
-        request: The HTTP request object containing the date parameter.
-
-    Returns:
-        HttpResponse: An Excel file containing the time entries.
-    """
-    # Get the date parameter from the request (e.g. from your date picker)
-    date_str = request.GET.get("date")
-    if not date_str:
-        return HttpResponse("Date parameter is required.", status=400)
-
-    selected_date = parse_date(date_str)
-    if not selected_date:
-        return HttpResponse("Invalid date format.", status=400)
-
-    # Create datetime range for the selected date
-    start_datetime = datetime.combine(selected_date, time.min)
-    end_datetime = datetime.combine(selected_date, time.max)
-
-    # Filter time entries that fall within the selected date
-    qs = TimeEntry.objects.filter(
-        time_in__gte=start_datetime,
-        time_in__lte=end_datetime
-    ).order_by("time_in")
-
-    # Create an Excel workbook and worksheet
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Time Entries"
-
-    # Define headers for the Excel sheet
-    headers = [
-        "ID",
-        "Employee ID",
-        "First Name",
-        "Surname",
-        "Company",
-        "Date",
-        "Time In",
-        "Time Out",
-        "Hours Worked",
-        "Is Late"
-    ]
-    ws.append(headers)
-
-    # Populate rows with time entry data
-    for entry in qs:
-        row = [
-            entry.id,
-            entry.user.employee_id,
-            entry.user.first_name,
-            entry.user.surname,
-            entry.user.company.name if entry.user.company else "",
-            entry.time_in.strftime("%Y-%m-%d"),
-            entry.time_in.strftime("%H:%M:%S"),
-            entry.time_out.strftime("%H:%M:%S") if entry.time_out else "",
-            entry.hours_worked,
-            "Yes" if entry.is_late else "No"
-        ]
-        ws.append(row)
-
-    # Save the workbook to an in-memory output buffer
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    # Create the response with a dynamic filename
-    filename = f"time_entries_{date_str}.xlsx"
-    response = HttpResponse(
-        output,
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-    response["Content-Disposition"] = f"attachment; filename={filename}"
-
-    # Log the export action
-    log_admin_action(request, "Excel Export", f"Exported {filename}")
-    return response
\ No newline at end of file